@@ -0,0 +1,223 @@
+"""
+Measures event submission throughput, latency, CPU and memory for each way of
+sending events, against a FakePagerDuty running in a separate process so that
+its CPU isn't counted.
+
+    pip install -e .[async,fast]
+    python benchmarks/events.py --events 2000 --output results.json
+    python benchmarks/events.py --compare results.json
+
+Modes:
+
+    overhead    Alert.trigger() with a session that answers instantly, for the
+                client's own cost per event
+    sequential  Alert.trigger() in a loop
+    threaded    Alert.trigger() from a pool of threads
+    batched     Alert.send_many()
+    async       AsyncAlert.trigger() gathered under a semaphore (needs aiohttp)
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from pagerduty_api import Alert
+from pagerduty_api.base import create_session
+from pagerduty_api.metrics import MetricsAggregator
+from pagerduty_api.serializers import get_default_serializer
+from pagerduty_api.testing import EVENTS_V1_PATH
+from pagerduty_api.version import __version__
+
+SERVICE_KEY = '4baa5d20cfba466a5e075b02698f455c'
+REPORT_LINE = (
+    '{0:<12} {1[events_per_sec]:>9.1f} events/s  p50 {1[p50_ms]:7.3f}ms  p99 {1[p99_ms]:7.3f}ms  '
+    '{1[cpu_us_per_event]:7.1f}us CPU/event  {1[peak_memory_kib]:8.1f}KiB peak'
+)
+
+
+class NullResponse(object):
+    ok = True
+    status_code = 200
+    headers = {}
+
+    class elapsed(object):
+        @staticmethod
+        def total_seconds():
+            return 0.0
+
+    @staticmethod
+    def json():
+        return {'status': 'success', 'message': 'Event processed'}
+
+
+class NullSession(object):
+    def post(self, *args, **kwargs):
+        return NullResponse
+
+
+def start_server(latency):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'pagerduty_api.testing', '--port', '0', '--latency', str(latency)],
+        stdout=subprocess.PIPE, universal_newlines=True,
+    )
+    url = process.stdout.readline().split()[-1]
+    return process, url
+
+
+def trigger(alert, i):
+    return alert.trigger(description='Benchmark event {0}'.format(i), incident_key='bench/{0}'.format(i))
+
+
+def make_alert(cls, url, session, hooks):
+    alert = cls(service_key=SERVICE_KEY, session=session, hooks=hooks)
+    alert.URL = url + EVENTS_V1_PATH
+    return alert
+
+
+def run_overhead(url, count, workers, hooks):
+    alert = make_alert(Alert, url, NullSession(), hooks)
+    for i in range(count):
+        trigger(alert, i)
+
+
+def run_sequential(url, count, workers, hooks):
+    alert = make_alert(Alert, url, create_session(), hooks)
+    for i in range(count):
+        trigger(alert, i)
+
+
+def run_threaded(url, count, workers, hooks):
+    alert = make_alert(Alert, url, create_session(pool_maxsize=workers), hooks)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda i: trigger(alert, i), range(count)))
+
+
+def run_batched(url, count, workers, hooks):
+    alert = make_alert(Alert, url, create_session(pool_maxsize=workers), hooks)
+    events = [
+        {'event_type': 'trigger', 'description': 'Benchmark event {0}'.format(i), 'incident_key': 'bench/{0}'.format(i)}
+        for i in range(count)
+    ]
+    alert.send_many(events, max_workers=workers)
+
+
+def run_async(url, count, workers, hooks):
+    from pagerduty_api.aio import AsyncAlert, create_async_session
+
+    async def send_all():
+        session = create_async_session(limit=workers)
+        alert = make_alert(AsyncAlert, url, session, hooks)
+        semaphore = asyncio.Semaphore(workers)
+
+        async def send(i):
+            async with semaphore:
+                await trigger(alert, i)
+        try:
+            await asyncio.gather(*[send(i) for i in range(count)])
+        finally:
+            await session.close()
+
+    asyncio.run(send_all())
+
+
+MODES = {
+    'overhead': run_overhead,
+    'sequential': run_sequential,
+    'threaded': run_threaded,
+    'batched': run_batched,
+    'async': run_async,
+}
+
+
+def measure(run, url, count, workers, memory_count):
+    metrics = MetricsAggregator(max_samples=count)
+    start, cpu_start = time.perf_counter(), time.process_time()
+    run(url, count, workers, [metrics])
+    seconds, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+
+    tracemalloc.start()
+    try:
+        run(url, memory_count, workers, ())
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    snapshot = metrics.snapshot()
+    return {
+        'events': count,
+        'errors': snapshot['errors'],
+        'seconds': round(seconds, 4),
+        'events_per_sec': round(count / seconds, 1),
+        'p50_ms': round(snapshot['p50'] * 1000, 3),
+        'p99_ms': round(snapshot['p99'] * 1000, 3),
+        'cpu_us_per_event': round(cpu / count * 1e6, 1),
+        'peak_memory_kib': round(peak / 1024.0, 1),
+    }
+
+
+def compare(results, previous):
+    print('\nChange from {0}:'.format(previous['meta'].get('version')))
+    for mode, result in results.items():
+        before = previous['results'].get(mode)
+        if not before:
+            continue
+        changes = [
+            '{0} {1:+.1%}'.format(name, (result[name] - before[name]) / before[name])
+            for name in ('events_per_sec', 'p99_ms', 'cpu_us_per_event', 'peak_memory_kib') if before.get(name)
+        ]
+        print('{0:<12} {1}'.format(mode, ', '.join(changes)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--memory-events', type=int, default=200, help='events sent while tracing memory')
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0, help='seconds the server waits per event')
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=list(MODES))
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a JSON file of earlier results to compare with')
+    args = parser.parse_args()
+
+    process, url = start_server(args.latency)
+    results = {}
+    try:
+        for mode in args.modes:
+            try:
+                results[mode] = measure(MODES[mode], url, args.events, args.workers, args.memory_events)
+            except ImportError as e:
+                print('{0:<12} skipped: {1}'.format(mode, e))
+                continue
+            print(REPORT_LINE.format(mode, results[mode]))
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = {
+        'meta': {
+            'version': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'serializer': type(get_default_serializer()).__name__,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'events': args.events,
+            'workers': args.workers,
+            'latency': args.latency,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares sending many concurrent events over pooled HTTP/1.1 connections with
+multiplexing them over one HTTP/2 connection, against a FakePagerDuty running
+in a separate process that answers both after a fixed latency.
+
+    pip install -e .[http2]
+    python benchmarks/http2.py --events 2000 --concurrency 50 --latency 0.02
+
+HTTP/2 saves sockets and TLS handshakes rather than client CPU, so on a local
+server without TLS the pooled HTTP/1.1 transports may well be as fast.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+from pagerduty_api import Alert
+from pagerduty_api.base import create_session
+from pagerduty_api.transports import HTTP2Transport, HTTPClientTransport, RequestsTransport
+from pagerduty_api.testing import EVENTS_V1_PATH
+
+SERVICE_KEY = '4baa5d20cfba466a5e075b02698f455c'
+
+
+def start_server(latency):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'pagerduty_api.testing', '--port', '0', '--latency', str(latency), '--http2'],
+        stdout=subprocess.PIPE, universal_newlines=True,
+    )
+    url = process.stdout.readline().split()[-1]
+    return process, url
+
+
+def run(name, transport, url, events, concurrency):
+    alert = Alert(service_key=SERVICE_KEY, transport=transport)
+    alert.URL = url + EVENTS_V1_PATH
+    # Opens the connections before timing
+    warm_up = [{'event_type': 'trigger', 'description': 'Warm up', 'incident_key': str(i)} for i in range(concurrency)]
+    alert.send_many(warm_up, max_workers=concurrency)
+
+    batch = [{'event_type': 'trigger', 'description': 'Benchmark', 'incident_key': str(i)} for i in range(events)]
+    start = time.perf_counter()
+    results = alert.send_many(batch, max_workers=concurrency)
+    elapsed = time.perf_counter() - start
+    transport.close()
+
+    failed = sum(1 for result in results if not result.ok)
+    print('{0:<20} {1:>8.1f} events/s  {2:>5} failed'.format(name, events / elapsed, failed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50, help='events in flight at once')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds the server waits per event')
+    args = parser.parse_args()
+
+    process, url = start_server(args.latency)
+    try:
+        transports = [
+            ('requests (HTTP/1.1)', RequestsTransport(create_session(pool_maxsize=args.concurrency))),
+            ('http.client (HTTP/1.1)', HTTPClientTransport(pool_maxsize=args.concurrency)),
+            ('httpx (HTTP/2)', HTTP2Transport(max_streams=args.concurrency, prior_knowledge=True)),
+        ]
+        for name, transport in transports:
+            run(name, transport, url, args.events, args.concurrency)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    main()
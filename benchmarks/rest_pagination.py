@@ -0,0 +1,42 @@
+"""
+Compares serial, prefetching and parallel listing of incidents against a local
+FakePagerDuty that answers every page after a fixed latency.
+
+    pip install -e .
+    python benchmarks/rest_pagination.py --incidents 5000 --latency 0.05 --workers 8
+"""
+import argparse
+import time
+
+from pagerduty_api.base import create_session
+from pagerduty_api.rest import Incidents
+from pagerduty_api.testing import FakePagerDuty
+
+
+def run(name, incidents, **kwargs):
+    start = time.perf_counter()
+    listed = sum(1 for _ in incidents.list(**kwargs))
+    elapsed = time.perf_counter() - start
+    print('{0:<24} {1:>6} incidents in {2:6.2f}s'.format(name, listed, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--incidents', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the server waits per page')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    with FakePagerDuty(latency=args.latency) as server:
+        server.add('incidents', [{'id': 'P{0}'.format(i)} for i in range(args.incidents)])
+        incidents = server.point(Incidents(api_key='benchmark', session=create_session(pool_maxsize=args.workers)))
+
+        run('serial', incidents, page_size=args.page_size, prefetch=False)
+        run('prefetch', incidents, page_size=args.page_size)
+        run('parallel (ordered)', incidents, page_size=args.page_size, workers=args.workers)
+        run('parallel (as completed)', incidents, page_size=args.page_size, workers=args.workers, ordered=False)
+
+
+if __name__ == '__main__':
+    main()
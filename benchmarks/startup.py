@@ -0,0 +1,63 @@
+"""
+Measures the startup cost of a short-lived script for each transport: the time
+to ``import pagerduty_api``, then to send one ``Alert.trigger()`` to a local
+FakePagerDuty, each in a fresh interpreter.
+
+    pip install -e .
+    python benchmarks/startup.py --runs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from pagerduty_api.testing import EVENTS_V1_PATH, FakePagerDuty
+
+TRANSPORTS = ('requests', 'urllib3', 'http.client')
+
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import pagerduty_api
+imported = time.perf_counter()
+alert = pagerduty_api.Alert(service_key='4baa5d20cfba466a5e075b02698f455c')
+alert.URL = sys.argv[1]
+alert.trigger(description='Startup benchmark')
+triggered = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'trigger_ms': (triggered - imported) * 1000,
+    'modules': len(sys.modules),
+    'requests_imported': 'requests' in sys.modules,
+}))
+'''
+
+
+def measure(transport, url, runs):
+    env = dict(os.environ, PAGERDUTY_API_TRANSPORT=transport)
+    results = [
+        json.loads(subprocess.check_output([sys.executable, '-c', SCRIPT, url], env=env))
+        for _ in range(runs)
+    ]
+    import_ms = statistics.median(result['import_ms'] for result in results)
+    trigger_ms = statistics.median(result['trigger_ms'] for result in results)
+    print('{0:<12} import {1:6.1f}ms  first trigger {2:6.1f}ms  total {3:6.1f}ms  {4:4} modules{5}'.format(
+        transport, import_ms, trigger_ms, import_ms + trigger_ms, results[0]['modules'],
+        '' if results[0]['requests_imported'] else '  (requests not imported)',
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='interpreters started per transport')
+    args = parser.parse_args()
+
+    with FakePagerDuty() as server:
+        for transport in TRANSPORTS:
+            measure(transport, server.url + EVENTS_V1_PATH, args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures how many signed webhook deliveries a second one core can verify, parse
+and batch, through WebhookReceiver.receive() and its WSGI app, with and without
+an IncidentTracker.
+
+    pip install -e .[fast]
+    python benchmarks/webhooks.py --deliveries 20000
+"""
+import argparse
+import io
+import json
+import time
+
+from pagerduty_api.tracker import IncidentTracker
+from pagerduty_api.webhooks import WebhookReceiver, sign
+
+SECRET = 'benchmark-secret'
+
+
+def make_deliveries(count, incidents):
+    deliveries = []
+    for i in range(count):
+        body = json.dumps({'event': {
+            'id': '01{0:08d}'.format(i),
+            'event_type': ('incident.triggered', 'incident.acknowledged', 'incident.resolved')[i % 3],
+            'resource_type': 'incident',
+            'occurred_at': '2020-01-01T00:00:00.000Z',
+            'agent': {'id': 'PUSER', 'type': 'user_reference'},
+            'data': {
+                'id': 'PINC{0}'.format(i % incidents),
+                'type': 'incident',
+                'title': 'web{0} cannot reach redis'.format(i % incidents),
+                'status': 'triggered',
+                'incident_key': 'web{0}'.format(i % incidents),
+                'service': {'id': 'PWEB', 'type': 'service_reference'},
+                'assignees': [{'id': 'PUSER', 'type': 'user_reference'}],
+                'urgency': 'high',
+            },
+        }}).encode('utf-8')
+        deliveries.append((body, sign(body, SECRET)))
+    return deliveries
+
+
+def run(name, deliveries, handle):
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for body, signature in deliveries:
+        handle(body, signature)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    print('{0:<16} {1:>9.0f} deliveries/s  {2:6.1f}us CPU/delivery'.format(
+        name, len(deliveries) / elapsed, cpu / len(deliveries) * 1e6
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deliveries', type=int, default=20000)
+    parser.add_argument('--incidents', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    deliveries = make_deliveries(args.deliveries, args.incidents)
+
+    receiver = WebhookReceiver(secrets=[SECRET], callback=lambda batch: None, batch_size=args.batch_size)
+    run('receive', deliveries, receiver.receive)
+    receiver.close()
+
+    receiver = WebhookReceiver(
+        secrets=[SECRET], callback=lambda batch: None, batch_size=args.batch_size, tracker=IncidentTracker()
+    )
+    run('receive+tracker', deliveries, receiver.receive)
+    receiver.close()
+
+    receiver = WebhookReceiver(secrets=[SECRET], callback=lambda batch: None, batch_size=args.batch_size)
+
+    def wsgi(body, signature):
+        environ = {
+            'REQUEST_METHOD': 'POST', 'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body),
+            'HTTP_X_PAGERDUTY_SIGNATURE': signature,
+        }
+        receiver.wsgi(environ, lambda status, headers: None)
+
+    run('wsgi', deliveries, wsgi)
+    receiver.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,3 @@
 # flake8: noqa
 from .alerts import Alert
+from .alerts_v2 import AlertV2
@@ -0,0 +1,299 @@
+"""
+A local agent process that sends the events of many worker processes, so that
+they share one connection pool, deduplicator and rate limiter.
+
+Run it with ``python -m pagerduty_api.agent --socket /run/pagerduty/agent.sock``
+and send events to it with :class:`AgentAlert` or :class:`AgentAlertV2`.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+
+from .alerts import Alert
+from .alerts_v2 import AlertV2
+from .dedup import EventDeduplicator
+from .dispatcher import AlertDispatcher, OverflowPolicies
+from .events import EventResource
+from .exceptions import DispatcherException, PagerDutyAPIServerException
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/tmp/pagerduty-agent.sock'
+
+
+def get_socket_path(path=None):
+    """
+    :rtype: str
+    :return: The given path, else the PAGERDUTY_AGENT_SOCKET environment variable,
+            else ``DEFAULT_SOCKET_PATH``
+    """
+    return path or os.environ.get('PAGERDUTY_AGENT_SOCKET') or DEFAULT_SOCKET_PATH
+
+
+class AlertAgent(object):
+    """
+    Receives events over a Unix socket and sends them from a background
+    :class:`AlertDispatcher <pagerduty_api.dispatcher.AlertDispatcher>`.
+
+    Events for every service go through one resource per Events API, so they
+    share its session, deduplicator, rate limiter and circuit breaker.
+    """
+    RESOURCES = {
+        'alert': Alert,
+        'alert_v2': AlertV2,
+    }
+
+    def __init__(self, path=None, workers=4, max_queue_size=10000, overflow=OverflowPolicies.BLOCK, mode=0o600,
+                 **resource_kwargs):
+        """
+        :type path: str
+        :param path: The Unix socket to listen on. See :func:`get_socket_path`
+
+        :type workers: int
+        :param workers: The number of threads sending events, per Events API
+
+        :type max_queue_size: int
+        :param max_queue_size: The most events waiting to be sent, per Events API
+
+        :type overflow: str
+        :param overflow: One of the :class:`OverflowPolicies <pagerduty_api.dispatcher.OverflowPolicies>`
+
+        :type mode: int
+        :param mode: The permissions of the socket file
+
+        Any other keyword arguments (such as ``deduplicator``, ``rate_limiter`` and
+        ``retry_policy``) are passed to the resources that send the events.
+        """
+        self.path = get_socket_path(path)
+        self.resources = dict(
+            (kind, cls(None, **resource_kwargs)) for kind, cls in self.RESOURCES.items()
+        )
+        self.dispatchers = dict(
+            (kind, AlertDispatcher(resource, workers, max_queue_size, overflow))
+            for kind, resource in self.resources.items()
+        )
+        self._thread = None
+
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            os.unlink(self.path)
+        # The socket is created with the umask's permissions, so narrow it rather
+        # than chmod after binding, when other users could already connect
+        umask = os.umask(0o777 & ~mode)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.path, _AgentHandler)
+        finally:
+            os.umask(umask)
+        self._server.daemon_threads = True
+        self._server.agent = self
+
+    def serve_forever(self):
+        """
+        Receives events until :meth:`close` is called from another thread
+        """
+        self._server.serve_forever(poll_interval=0.1)
+
+    def start(self):
+        """
+        Receives events on a background thread
+
+        :rtype: :class:`AlertAgent`
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name='pagerduty-agent', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=None):
+        """
+        Stops receiving events, sends the ones already queued and removes the socket
+
+        :type timeout: float
+        :param timeout: The most seconds to wait for queued events, per Events API
+
+        :rtype: bool
+        :return: True if every queued event was sent in time
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        return all([dispatcher.close(timeout) for dispatcher in self.dispatchers.values()])
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def handle(self, message):
+        """
+        Queues the event of a message from a client, waiting for it to be sent if
+        the client asked to
+
+        :rtype: dict
+        :return: The reply to the client
+        """
+        try:
+            kind, data = message['kind'], message['event']
+            if kind not in self.dispatchers:
+                raise ValueError('Unknown resource {0}'.format(kind))
+
+            future = self.dispatchers[kind].submit(data)
+            if message.get('wait'):
+                return {'response': future.result()}
+
+            resource = self.resources[kind]
+            return {'response': {
+                'status': 'queued',
+                'message': 'Event queued by the agent',
+                resource.INCIDENT_KEY_FIELD: data.get(resource.INCIDENT_KEY_FIELD),
+            }}
+        except Exception as e:
+            return {
+                'error': str(e) or e.__class__.__name__,
+                'server_error': isinstance(e, PagerDutyAPIServerException),
+                'status_code': getattr(e, 'status_code', None),
+            }
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                message = json.loads(line.decode('utf-8'))
+            except ValueError:
+                reply = {'error': 'Invalid message', 'server_error': False, 'status_code': None}
+            else:
+                reply = self.server.agent.handle(message)
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+
+class AgentEventResource(EventResource):
+    """
+    A base class for event resources that hand their events to an
+    :class:`AlertAgent` instead of sending them to PagerDuty.
+
+    A connection to the agent is opened per thread and per process, so resources
+    can be created before a server forks its workers.
+    """
+    AGENT_KIND = None
+
+    def __init__(self, socket_path=None, wait=False, agent_timeout=5, *args, **kwargs):
+        """
+        :type socket_path: str
+        :param socket_path: The agent's Unix socket. See :func:`get_socket_path`
+
+        :type wait: bool
+        :param wait: If True, methods wait for the agent to send the event and
+                return PagerDuty's response. Otherwise they return as soon as the
+                agent has queued it, with a ``queued`` status
+
+        :type agent_timeout: float
+        :param agent_timeout: Seconds to wait for the agent to reply. Ignored when waiting for events to be sent
+
+        Any other arguments are passed on to :class:`EventResource <pagerduty_api.events.EventResource>`
+        """
+        super(AgentEventResource, self).__init__(*args, **kwargs)
+        self.socket_path = get_socket_path(socket_path)
+        self.wait = wait
+        self.agent_timeout = agent_timeout
+        self._local = threading.local()
+
+    def _deliver(self, data):
+        message = b''.join([
+            b'{"kind":', json.dumps(self.AGENT_KIND).encode('utf-8'),
+            b',"wait":', b'true' if self.wait else b'false',
+            b',"event":', self._encode(data), b'}\n',
+        ])
+        try:
+            connection = self._connection()
+            connection.sendall(message)
+            line = self._local.reader.readline()
+        except (OSError, socket.timeout) as e:
+            self._disconnect()
+            raise DispatcherException('Could not reach the PagerDuty agent at {0}: {1}'.format(self.socket_path, e))
+        if not line:
+            self._disconnect()
+            raise DispatcherException('The PagerDuty agent at {0} closed the connection'.format(self.socket_path))
+
+        reply = json.loads(line.decode('utf-8'))
+        if 'error' not in reply:
+            return reply['response']
+        if reply['server_error']:
+            raise PagerDutyAPIServerException(reply['error'], status_code=reply['status_code'])
+        raise DispatcherException(reply['error'])
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(None if self.wait else self.agent_timeout)
+        connection.connect(self.socket_path)
+        self._local.connection = connection
+        self._local.reader = connection.makefile('rb')
+        self._local.pid = os.getpid()
+        return connection
+
+    def _disconnect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            self._local.reader.close()
+            connection.close()
+        self._local.connection = None
+
+
+class AgentAlert(Alert, AgentEventResource):
+    """
+    An :class:`Alert <pagerduty_api.Alert>` whose events are sent by an :class:`AlertAgent`
+    """
+    AGENT_KIND = 'alert'
+
+
+class AgentAlertV2(AlertV2, AgentEventResource):
+    """
+    An :class:`AlertV2 <pagerduty_api.alerts_v2.AlertV2>` whose events are sent by an :class:`AlertAgent`
+    """
+    AGENT_KIND = 'alert_v2'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sends PagerDuty events for local worker processes')
+    parser.add_argument('--socket', help='the Unix socket to listen on')
+    parser.add_argument('--workers', type=int, default=4, help='threads sending events per Events API')
+    parser.add_argument('--max-queue-size', type=int, default=10000)
+    parser.add_argument('--dedup-window', type=float, default=0, help='seconds repeats are suppressed for')
+    parser.add_argument('--rate', type=float, help='events a second per service key')
+    parser.add_argument('--retries', type=int, default=3, help='the most attempts per event')
+    args = parser.parse_args()
+
+    agent = AlertAgent(
+        args.socket, workers=args.workers, max_queue_size=args.max_queue_size,
+        deduplicator=EventDeduplicator(window=args.dedup_window) if args.dedup_window else None,
+        rate_limiter=RateLimiter(per_key_rate=args.rate) if args.rate else None,
+        retry_policy=RetryPolicy(max_attempts=args.retries),
+    )
+    signal.signal(signal.SIGTERM, lambda *args: threading.Thread(target=agent._server.shutdown).start())
+    print('PagerDuty agent listening on {0}'.format(agent.path), flush=True)
+    try:
+        agent.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.close()
+
+
+if __name__ == '__main__':
+    main()
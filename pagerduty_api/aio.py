@@ -0,0 +1,305 @@
+"""
+Asyncio versions of the PagerDuty resources. These need python 3.5+ and aiohttp::
+
+    pip install pagerduty-api[async]
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+import aiohttp
+
+from .alerts import Alert
+from .alerts_v2 import AlertV2
+from .base import DEFAULT_POOL_MAXSIZE, Resource
+from .batch import EventResult, group_by_key
+from .events import EventResource
+from .exceptions import PagerDutyAPIServerException
+from .metrics import RequestInfo, emit
+
+LOG = logging.getLogger(__name__)
+
+# One shared session per event loop, since aiohttp sessions can't cross loops
+_default_sessions = weakref.WeakKeyDictionary()
+
+
+def create_async_session(limit=DEFAULT_POOL_MAXSIZE, limit_per_host=0, keepalive_timeout=15):
+    """
+    Creates a connection-pooled aiohttp session. Must be called with a running event loop.
+
+    :type limit: int
+    :param limit: The maximum number of open connections
+
+    :type limit_per_host: int
+    :param limit_per_host: The maximum number of open connections to one host. 0 is unlimited
+
+    :type keepalive_timeout: float
+    :param keepalive_timeout: Seconds an idle connection is kept alive. If None,
+            every connection is closed after its response
+
+    :rtype: :class:`aiohttp.ClientSession`
+    """
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        force_close=keepalive_timeout is None,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+def get_default_async_session():
+    """
+    Returns the session shared by async resources on the running event loop,
+    creating it on first use
+
+    :rtype: :class:`aiohttp.ClientSession`
+    """
+    loop = asyncio.get_running_loop()
+    session = _default_sessions.get(loop)
+    if session is None or session.closed:
+        session = _default_sessions[loop] = create_async_session()
+    return session
+
+
+async def close_default_async_session():
+    """
+    Closes the shared session of the running event loop, if there is one
+    """
+    session = _default_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+def _client_timeout(timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    return aiohttp.ClientTimeout(total=timeout)
+
+
+class AsyncResource(Resource):
+    """
+    A base class for API resources sent with asyncio
+    """
+    @property
+    def session(self):
+        return self._session or get_default_async_session()
+
+    async def _post(self, url, data=None, headers=None):
+        """
+        A coroutine for posting things. It will also encode your 'data' parameter with
+        the resource's serializer
+
+        :returns: The response of your post
+        :rtype: dict
+
+        :raises: This will raise a
+            :class:`PagerDutyAPIServerException<pagerduty_api.exceptions.PagerDutyAPIServerException>`
+            if there is an error from Pager Duty, or if it can't be reached, once
+            the retry policy gives up
+        """
+        info = RequestInfo.for_payload(url, data)
+        if data is not None:
+            data = self._encode(data)
+            info.bytes_sent = len(data)
+
+        emit(self.hooks, 'before_request', info)
+        start = time.time()
+        try:
+            response = await self._post_with_retries(info, start, url, data, headers)
+        except BaseException as e:
+            # Any failure ends the request for the hooks, including cancellation and unwrapped errors
+            self._finish_request(info, start, e)
+            raise
+        self._finish_request(info, start)
+        return response
+
+    async def _post_with_retries(self, info, start, url, data, headers):
+        timeout = _client_timeout(self.timeout)
+        while True:
+            info.attempts += 1
+            info.status_code = None
+            retry_after = None
+            probe = self._enter_circuit(info, start)
+            attempt_start = time.time()
+            try:
+                async with self.session.post(url, data=data, headers=headers, timeout=timeout) as response:
+                    info.status_code = response.status
+                    info.ttfb = time.time() - attempt_start
+                    if response.status < 400:
+                        return await response.json(content_type=None)
+                    message = '{}: {}'.format(response.status, await response.text())
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                message = str(e) or e.__class__.__name__
+            finally:
+                self._exit_circuit(probe, info.status_code, attempt_start)
+
+            await asyncio.sleep(self._retry_delay(info, start, message, retry_after))
+
+
+class AsyncEventResource(EventResource, AsyncResource):
+    """
+    A base class for event resources sent with asyncio
+    """
+    async def send_many(self, events, max_workers=DEFAULT_POOL_MAXSIZE):
+        """
+        Sends many events concurrently. See
+        :meth:`EventResource.send_many <pagerduty_api.events.EventResource.send_many>`
+
+        :rtype: list of :class:`EventResult <pagerduty_api.batch.EventResult>`
+        :return: One result per event, in the same order as ``events``
+        """
+        events = list(events)
+        built = [self._build_quietly(event) for event in events]
+        results = [None] * len(events)
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def run(indexes):
+            for index in indexes:
+                try:
+                    async with semaphore:
+                        response = await self._send_built(built[index])
+                    results[index] = EventResult(events[index], response=response)
+                except Exception as e:
+                    results[index] = EventResult(events[index], exception=e)
+
+        await asyncio.gather(*[run(group) for group in group_by_key(built, self._incident)])
+        return results
+
+    async def replay_spool(self, batch_size=100, max_workers=DEFAULT_POOL_MAXSIZE):
+        """
+        Sends the events waiting in the spool. See
+        :meth:`EventResource.replay_spool <pagerduty_api.events.EventResource.replay_spool>`
+
+        The spool's file work runs on a thread, while the events are sent on the event loop.
+        """
+        loop = asyncio.get_running_loop()
+
+        def send(data):
+            return asyncio.run_coroutine_threadsafe(self._deliver(data), loop).result()
+
+        return await loop.run_in_executor(
+            None, lambda: self.spool.replay(send, batch_size, max_workers, is_retryable=self._is_spoolable)
+        )
+
+    async def _send(self, data):
+        allowed, previous = self._track(data)
+        if not allowed:
+            return self._redundant_response(data)
+        if self._suppress(data):
+            return self._suppressed_response(data)
+        try:
+            if self.spool is not None and self.spool.has_pending(self._identity(data)[:2]):
+                response = await self._run_blocking(self._spool_behind_pending, data)
+                if response is not None:
+                    return response
+            return await self._deliver(data)
+        except PagerDutyAPIServerException as e:
+            if self.spool is not None:
+                response = await self._run_blocking(self._divert, data, e)
+            else:
+                response = self._divert(data, e)
+            if response is not None:
+                return response
+            self._rollback(data, previous)
+            raise
+        except Exception:
+            self._rollback(data, previous)
+            raise
+
+    async def _run_blocking(self, func, *args):
+        # The spool writes and syncs files, so it is used from a thread rather than the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _deliver(self, data):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(data[self.ROUTING_KEY_FIELD])
+        return await self._post(url=self._url(data), data=data, headers=self.headers)
+
+
+class AsyncAlert(Alert, AsyncEventResource):
+    """
+    An :class:`Alert <pagerduty_api.Alert>` whose methods are coroutines.
+
+    Payloads and exceptions are the same as :class:`Alert <pagerduty_api.Alert>`.
+    All async alerts on an event loop share one connection pool unless given a
+    ``session`` from :func:`create_async_session`.
+    """
+    send_many = AsyncEventResource.send_many
+
+    async def trigger(self, description, incident_key=None, client=None, client_url=None, details=None):
+        """
+        Triggers a PagerDuty Alert. See :meth:`Alert.trigger <pagerduty_api.Alert.trigger>`
+        """
+        data = self._trigger_data(
+            description, incident_key=incident_key, client=client, client_url=client_url, details=details
+        )
+        self.incident_key = data['incident_key']
+        LOG.info('Triggering PagerDuty incident {0}'.format(self.incident_key))
+
+        return await self._send(data)
+
+    async def acknowledge(self, incident_key=None, description=None, details=None):
+        """
+        Acknowledges a PagerDuty Alert. See :meth:`Alert.acknowledge <pagerduty_api.Alert.acknowledge>`
+        """
+        data = self._acknowledge_data(incident_key=incident_key, description=description, details=details)
+        LOG.info('Acknowledging PagerDuty incident {0}'.format(data['incident_key']))
+
+        return await self._send(data)
+
+    async def resolve(self, incident_key=None, description=None, details=None):
+        """
+        Resolves a PagerDuty Alert. See :meth:`Alert.resolve <pagerduty_api.Alert.resolve>`
+        """
+        data = self._resolve_data(incident_key=incident_key, description=description, details=details)
+        LOG.info('Resolving PagerDuty incident {0}'.format(data['incident_key']))
+
+        return await self._send(data)
+
+
+class AsyncAlertV2(AlertV2, AsyncEventResource):
+    """
+    An :class:`AlertV2 <pagerduty_api.alerts_v2.AlertV2>` whose methods are coroutines.
+    """
+    send_many = AsyncEventResource.send_many
+
+    async def trigger(self, summary, source, **kwargs):
+        """
+        Triggers an alert. See :meth:`AlertV2.trigger <pagerduty_api.alerts_v2.AlertV2.trigger>`
+        """
+        data = self._trigger_data(summary, source, **kwargs)
+        self.dedup_key = data['dedup_key']
+        LOG.info('Triggering PagerDuty alert {0}'.format(self.dedup_key))
+
+        return await self._send(data)
+
+    async def acknowledge(self, dedup_key=None):
+        """
+        Acknowledges an alert. See :meth:`AlertV2.acknowledge <pagerduty_api.alerts_v2.AlertV2.acknowledge>`
+        """
+        data = self._acknowledge_data(dedup_key=dedup_key)
+        LOG.info('Acknowledging PagerDuty alert {0}'.format(data['dedup_key']))
+
+        return await self._send(data)
+
+    async def resolve(self, dedup_key=None):
+        """
+        Resolves an alert. See :meth:`AlertV2.resolve <pagerduty_api.alerts_v2.AlertV2.resolve>`
+        """
+        data = self._resolve_data(dedup_key=dedup_key)
+        LOG.info('Resolving PagerDuty alert {0}'.format(data['dedup_key']))
+
+        return await self._send(data)
+
+    async def change(self, summary, **kwargs):
+        """
+        Sends a change event. See :meth:`AlertV2.change <pagerduty_api.alerts_v2.AlertV2.change>`
+        """
+        data = self._change_data(summary, **kwargs)
+        LOG.info('Sending PagerDuty change event {0}'.format(summary))
+
+        return await self._send(data)
@@ -1,7 +1,8 @@
 import hashlib
 import logging
 
-from .base import Resource
+from .base import DEFAULT_POOL_MAXSIZE
+from .events import EventResource
 from .exceptions import IncidentKeyException
 
 LOG = logging.getLogger(__name__)
@@ -13,7 +14,7 @@ class AlertTypes(object):
     ACKNOWLEDGE = 'acknowledge'
 
 
-class Alert(Resource):
+class Alert(EventResource):
     """
     An interface for interacting with PagerDuty alerts.
 
@@ -28,7 +29,12 @@ class Alert(Resource):
         :type service_key: str
         :param service_key: Service API Key is a unique ID generated in
                 PagerDuty for a Generic API Service
+
+        Any other arguments (such as ``deduplicator``, ``session`` and ``timeout``)
+        are passed on to :class:`EventResource <pagerduty_api.events.EventResource>`,
+        so many alerts can share one connection pool.
         """
+        super(Alert, self).__init__(*args, **kwargs)
         self.service_key = service_key
         self.incident_key = None
 
@@ -70,30 +76,15 @@ class Alert(Resource):
 
         """
 
-        if not incident_key:
-            m = hashlib.md5()
-            m.update(description.encode())
-            incident_key = m.hexdigest()
+        data = self._trigger_data(
+            description, incident_key=incident_key, client=client, client_url=client_url, details=details
+        )
 
         # The incident key is set for future operations
-        self.incident_key = incident_key
-
-        data = {
-            'service_key': self.service_key,
-            'event_type': AlertTypes.TRIGGER,
-            'description': description,
-            'incident_key': self.incident_key,
-            'client': client,
-            'client_url': client_url,
-            'details': details
-        }
-        LOG.info('Triggering PagerDuty incident {0}'.format(incident_key))
+        self.incident_key = data['incident_key']
+        LOG.info('Triggering PagerDuty incident {0}'.format(self.incident_key))
 
-        return self._post(
-            url=self.URL,
-            data=data,
-            headers=self.headers
-        )
+        return self._send(data)
 
     def acknowledge(self, incident_key=None, description=None, details=None):
         """
@@ -128,25 +119,10 @@ class Alert(Resource):
                 }
 
         """
-        incident_key = incident_key or self.incident_key
+        data = self._acknowledge_data(incident_key=incident_key, description=description, details=details)
+        LOG.info('Acknowledging PagerDuty incident {0}'.format(data['incident_key']))
 
-        if incident_key is None:
-            raise IncidentKeyException()
-
-        data = {
-            'service_key': self.service_key,
-            'event_type': AlertTypes.ACKNOWLEDGE,
-            'description': description,
-            'incident_key': incident_key,
-            'details': details
-        }
-        LOG.info('Acknowledging PagerDuty incident {0}'.format(incident_key))
-
-        return self._post(
-            url=self.URL,
-            data=data,
-            headers=self.headers
-        )
+        return self._send(data)
 
     def resolve(self, incident_key=None, description=None, details=None):
         """
@@ -181,22 +157,106 @@ class Alert(Resource):
                 }
 
         """
+        data = self._resolve_data(incident_key=incident_key, description=description, details=details)
+        LOG.info('Resolving PagerDuty incident {0}'.format(data['incident_key']))
+
+        return self._send(data)
+
+    def build_event(self, event_type, service_key=None, **kwargs):
+        """
+        Builds the payload for an event without sending it.
+
+        :type event_type: str
+        :param event_type: One of the :class:`AlertTypes`
+
+        :type service_key: str
+        :param service_key: The service to send the event to. Defaults to the
+                alert's service key
+
+        The remaining keyword arguments are those of :meth:`trigger`,
+        :meth:`acknowledge` or :meth:`resolve`.
+
+        :raises: A ``ValueError`` for an unknown event type, or an
+                :class:`IncidentKeyException <pagerduty_api.exceptions.IncidentKeyException>`
+                if an acknowledge or resolve has no incident key
+
+        :rtype: dict
+        """
+        builders = {
+            AlertTypes.TRIGGER: self._trigger_data,
+            AlertTypes.ACKNOWLEDGE: self._acknowledge_data,
+            AlertTypes.RESOLVE: self._resolve_data,
+        }
+        if event_type not in builders:
+            raise ValueError('Unknown event type {0}'.format(event_type))
+
+        data = builders[event_type](**kwargs)
+        if service_key:
+            data['service_key'] = service_key
+        return data
+
+    def send_many(self, events, max_workers=DEFAULT_POOL_MAXSIZE):
+        """
+        Sends many events concurrently over the alert's connection pool.
+
+        Each event is a dict with an ``event_type`` of ``trigger``, ``acknowledge``
+        or ``resolve`` and the keyword arguments of the matching method. An event
+        may also carry its own ``service_key`` to send it to another service.
+
+            ::
+
+                alert.send_many([
+                    {'event_type': 'trigger', 'description': 'web01 is down', 'incident_key': 'web01'},
+                    {'event_type': 'resolve', 'incident_key': 'web02'},
+                    {'event_type': 'trigger', 'description': 'Disk full', 'service_key': 'a1b2c3'},
+                ])
+
+        Unlike the single event methods, a failing event doesn't raise. The
+        exception is recorded on its result and the rest of the batch is still sent.
+
+        :type events: list
+        :param events: The events to send
+
+        :type max_workers: int
+        :param max_workers: The most events in flight at once
+
+        :rtype: list of :class:`EventResult <pagerduty_api.batch.EventResult>`
+        :return: One result per event, in the same order as ``events``
+        """
+        return super(Alert, self).send_many(events, max_workers)
+
+    def _trigger_data(self, description, incident_key=None, client=None, client_url=None, details=None):
+        if not incident_key:
+            m = hashlib.md5()
+            m.update(description.encode())
+            incident_key = m.hexdigest()
+
+        return {
+            'service_key': self.service_key,
+            'event_type': AlertTypes.TRIGGER,
+            'description': description,
+            'incident_key': incident_key,
+            'client': client,
+            'client_url': client_url,
+            'details': details
+        }
+
+    def _acknowledge_data(self, incident_key=None, description=None, details=None):
+        return self._update_data(AlertTypes.ACKNOWLEDGE, incident_key, description, details)
+
+    def _resolve_data(self, incident_key=None, description=None, details=None):
+        return self._update_data(AlertTypes.RESOLVE, incident_key, description, details)
+
+    def _update_data(self, event_type, incident_key, description, details):
         incident_key = incident_key or self.incident_key
 
         if incident_key is None:
             raise IncidentKeyException()
 
-        data = {
+        return {
             'service_key': self.service_key,
-            'event_type': AlertTypes.RESOLVE,
+            'event_type': event_type,
             'description': description,
             'incident_key': incident_key,
             'details': details
         }
-        LOG.info('Resolving PagerDuty incident {0}'.format(incident_key))
-
-        return self._post(
-            url=self.URL,
-            data=data,
-            headers=self.headers
-        )
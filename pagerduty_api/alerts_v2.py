@@ -0,0 +1,317 @@
+import hashlib
+import logging
+
+from .base import DEFAULT_POOL_MAXSIZE
+from .events import EventResource
+from .exceptions import IncidentKeyException
+
+LOG = logging.getLogger(__name__)
+
+
+class EventActions(object):
+    TRIGGER = 'trigger'
+    ACKNOWLEDGE = 'acknowledge'
+    RESOLVE = 'resolve'
+    CHANGE = 'change'
+
+
+class Severities(object):
+    CRITICAL = 'critical'
+    ERROR = 'error'
+    WARNING = 'warning'
+    INFO = 'info'
+
+
+class AlertV2(EventResource):
+    """
+    An interface for PagerDuty's `Events API v2`_.
+
+    Instantiate with an integration (routing) key. Events are sent through the
+    same connection pool, retry policy, deduplicator, rate limiter and spool
+    machinery as :class:`Alert <pagerduty_api.Alert>`.
+
+    .. _Events API v2: https://developer.pagerduty.com/docs/events-api-v2/overview/
+    """
+    URL = 'https://events.pagerduty.com/v2/enqueue'
+    CHANGE_URL = 'https://events.pagerduty.com/v2/change/enqueue'
+    ROUTING_KEY_FIELD = 'routing_key'
+    INCIDENT_KEY_FIELD = 'dedup_key'
+    EVENT_TYPE_FIELD = 'event_action'
+
+    def __init__(self, routing_key, *args, **kwargs):
+        """
+        :type routing_key: str
+        :param routing_key: The integration key of an Events API v2 integration
+
+        Any other arguments (such as ``deduplicator``, ``session`` and ``timeout``)
+        are passed on to :class:`EventResource <pagerduty_api.events.EventResource>`
+        """
+        super(AlertV2, self).__init__(*args, **kwargs)
+        self.routing_key = routing_key
+        self.dedup_key = None
+
+    def trigger(self, summary, source, severity=Severities.ERROR, dedup_key=None, timestamp=None, component=None,
+                group=None, class_=None, custom_details=None, images=None, links=None, client=None, client_url=None):
+        """
+        Triggers an alert.
+
+        :type summary: str
+        :param summary: A summary of the alert, used as its title. 1024 characters max
+
+        :type source: str
+        :param source: The unique location of the affected system, such as a hostname
+
+        :type severity: str
+        :param severity: One of the :class:`Severities`
+
+        :type dedup_key: str
+        :param dedup_key: A unique ID to de-duplicate alerts. If no key is present,
+                an MD5 hash of the summary is used, so later events can refer to it
+
+        :type timestamp: str
+        :param timestamp: When the problem was detected, as an ISO 8601 string. Optional
+
+        :type component: str
+        :param component: The part of the source that is responsible. Optional
+
+        :type group: str
+        :param group: A cluster or grouping of sources. Optional
+
+        :type class_: str
+        :param class_: The class or type of the event. Optional
+
+        :type custom_details: dict
+        :param custom_details: Additional details about the event. Optional
+
+        :type images: list
+        :param images: Images to show with the alert, as dicts with ``src``, and
+                optionally ``href`` and ``alt``. Optional
+
+        :type links: list
+        :param links: Links to show with the alert, as dicts with ``href`` and
+                optionally ``text``. Optional
+
+        :rtype: dict
+        :return: The JSON response of the API
+
+            ::
+
+                {
+                    "status": "success",
+                    "message": "Event processed",
+                    "dedup_key": "srv01/HTTP"
+                }
+
+        """
+        data = self._trigger_data(
+            summary, source, severity=severity, dedup_key=dedup_key, timestamp=timestamp, component=component,
+            group=group, class_=class_, custom_details=custom_details, images=images, links=links, client=client,
+            client_url=client_url
+        )
+        self.dedup_key = data['dedup_key']
+        LOG.info('Triggering PagerDuty alert {0}'.format(self.dedup_key))
+
+        return self._send(data)
+
+    def acknowledge(self, dedup_key=None):
+        """
+        Acknowledges an alert.
+
+        :type dedup_key: str
+        :param dedup_key: The key of the alert. If None, the key of the last
+                alert triggered is used
+
+        :raises: An :class:`IncidentKeyException <pagerduty_api.exceptions.IncidentKeyException>`
+                if there is no dedup key
+
+        :rtype: dict
+        :return: The JSON response of the API
+        """
+        data = self._acknowledge_data(dedup_key=dedup_key)
+        LOG.info('Acknowledging PagerDuty alert {0}'.format(data['dedup_key']))
+
+        return self._send(data)
+
+    def resolve(self, dedup_key=None):
+        """
+        Resolves an alert.
+
+        :type dedup_key: str
+        :param dedup_key: The key of the alert. If None, the key of the last
+                alert triggered is used
+
+        :raises: An :class:`IncidentKeyException <pagerduty_api.exceptions.IncidentKeyException>`
+                if there is no dedup key
+
+        :rtype: dict
+        :return: The JSON response of the API
+        """
+        data = self._resolve_data(dedup_key=dedup_key)
+        LOG.info('Resolving PagerDuty alert {0}'.format(data['dedup_key']))
+
+        return self._send(data)
+
+    def change(self, summary, source=None, timestamp=None, custom_details=None, links=None):
+        """
+        Sends a `change event`_, such as a deploy, to the service's timeline.
+
+        .. _change event: https://developer.pagerduty.com/docs/events-api-v2/send-change-events/
+
+        :type summary: str
+        :param summary: A summary of the change. 1024 characters max
+
+        :type source: str
+        :param source: The system that made the change. Optional
+
+        :type timestamp: str
+        :param timestamp: When the change happened, as an ISO 8601 string. Optional
+
+        :type custom_details: dict
+        :param custom_details: Additional details about the change. Optional
+
+        :type links: list
+        :param links: Links about the change, as dicts with ``href`` and
+                optionally ``text``. Optional
+
+        :rtype: dict
+        :return: The JSON response of the API
+        """
+        data = self._change_data(
+            summary, source=source, timestamp=timestamp, custom_details=custom_details, links=links
+        )
+        LOG.info('Sending PagerDuty change event {0}'.format(summary))
+
+        return self._send(data)
+
+    def build_event(self, event_action, routing_key=None, **kwargs):
+        """
+        Builds the payload for an event without sending it.
+
+        :type event_action: str
+        :param event_action: One of the :class:`EventActions`
+
+        :type routing_key: str
+        :param routing_key: The integration to send the event to. Defaults to the
+                resource's routing key
+
+        The remaining keyword arguments are those of :meth:`trigger`,
+        :meth:`acknowledge`, :meth:`resolve` or :meth:`change`.
+
+        :raises: A ``ValueError`` for an unknown event action, or an
+                :class:`IncidentKeyException <pagerduty_api.exceptions.IncidentKeyException>`
+                if an acknowledge or resolve has no dedup key
+
+        :rtype: dict
+        """
+        builders = {
+            EventActions.TRIGGER: self._trigger_data,
+            EventActions.ACKNOWLEDGE: self._acknowledge_data,
+            EventActions.RESOLVE: self._resolve_data,
+            EventActions.CHANGE: self._change_data,
+        }
+        if event_action not in builders:
+            raise ValueError('Unknown event action {0}'.format(event_action))
+
+        data = builders[event_action](**kwargs)
+        if routing_key:
+            data['routing_key'] = routing_key
+        return data
+
+    def send_many(self, events, max_workers=DEFAULT_POOL_MAXSIZE):
+        """
+        Sends many events concurrently over the resource's connection pool.
+
+        Each event is a dict with an ``event_action`` of ``trigger``,
+        ``acknowledge``, ``resolve`` or ``change`` and the keyword arguments of the
+        matching method. An event may also carry its own ``routing_key``.
+
+        :rtype: list of :class:`EventResult <pagerduty_api.batch.EventResult>`
+        :return: One result per event, in the same order as ``events``
+        """
+        return super(AlertV2, self).send_many(events, max_workers)
+
+    def _identity(self, data):
+        if 'event_action' not in data:
+            return data.get('routing_key'), None, EventActions.CHANGE
+        return super(AlertV2, self)._identity(data)
+
+    def _url(self, data):
+        return self.URL if 'event_action' in data else self.CHANGE_URL
+
+    def _description(self, data):
+        return (data.get('payload') or {}).get('summary')
+
+    def _details(self, data):
+        return (data.get('payload') or {}).get('custom_details') or {}
+
+    def _summary_data(self, routing_key, incident_key, description, details):
+        return self.build_event(
+            EventActions.TRIGGER, routing_key=routing_key, summary=description, source='pagerduty-api rollup',
+            dedup_key=incident_key, custom_details=details,
+        )
+
+    def _coalesce(self, data, repeats):
+        if 'payload' in data:
+            data['payload']['custom_details'] = dict(
+                data['payload'].get('custom_details') or {}, suppressed_events=repeats
+            )
+
+    def _trigger_data(self, summary, source, severity=Severities.ERROR, dedup_key=None, timestamp=None,
+                      component=None, group=None, class_=None, custom_details=None, images=None, links=None,
+                      client=None, client_url=None):
+        if not dedup_key:
+            m = hashlib.md5()
+            m.update(summary.encode())
+            dedup_key = m.hexdigest()
+
+        payload = {
+            'summary': summary,
+            'source': source,
+            'severity': severity,
+            'timestamp': timestamp,
+            'component': component,
+            'group': group,
+            'class': class_,
+            'custom_details': custom_details,
+        }
+        return {
+            'routing_key': self.routing_key,
+            'event_action': EventActions.TRIGGER,
+            'dedup_key': dedup_key,
+            'payload': dict((key, value) for key, value in payload.items() if value is not None),
+            'images': images,
+            'links': links,
+            'client': client,
+            'client_url': client_url,
+        }
+
+    def _acknowledge_data(self, dedup_key=None):
+        return self._update_data(EventActions.ACKNOWLEDGE, dedup_key)
+
+    def _resolve_data(self, dedup_key=None):
+        return self._update_data(EventActions.RESOLVE, dedup_key)
+
+    def _update_data(self, event_action, dedup_key):
+        dedup_key = dedup_key or self.dedup_key
+
+        if dedup_key is None:
+            raise IncidentKeyException()
+
+        return {
+            'routing_key': self.routing_key,
+            'event_action': event_action,
+            'dedup_key': dedup_key,
+        }
+
+    def _change_data(self, summary, source=None, timestamp=None, custom_details=None, links=None):
+        payload = {
+            'summary': summary,
+            'source': source,
+            'timestamp': timestamp,
+            'custom_details': custom_details,
+        }
+        return {
+            'routing_key': self.routing_key,
+            'payload': dict((key, value) for key, value in payload.items() if value is not None),
+            'links': links,
+        }
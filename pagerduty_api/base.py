@@ -1,44 +1,279 @@
-import json
+import logging
 import os
+import threading
+import time
 
-import requests
+from pagerduty_api.exceptions import (
+    CircuitOpenException, ConfigurationException, PagerDutyAPIServerException, TransportException,
+)
+from pagerduty_api.metrics import RequestInfo, emit
+from pagerduty_api.retry import NO_RETRY
+from pagerduty_api.serializers import get_default_serializer
+from pagerduty_api.transports import RequestsTransport, get_default_transport, get_transport
 
-from pagerduty_api.exceptions import ConfigurationException, PagerDutyAPIServerException
+LOG = logging.getLogger(__name__)
+
+# (connect, read) timeouts in seconds used when a resource doesn't specify its own
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# Shared by every request, so it must never be changed
+JSON_HEADERS = {
+    'Content-type': 'application/json',
+}
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def create_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                   pool_block=False, keep_alive=True):
+    """
+    Creates a connection-pooled session that can be shared between resources and threads
+
+    :type pool_connections: int
+    :param pool_connections: The number of host pools to cache
+
+    :type pool_maxsize: int
+    :param pool_maxsize: The maximum number of connections kept alive per host
+
+    :type pool_block: bool
+    :param pool_block: If True, callers wait for a free connection instead of
+            opening a throwaway one when the pool is exhausted
+
+    :type keep_alive: bool
+    :param keep_alive: If False, every connection is closed after its response
+
+    :rtype: :class:`requests.Session`
+    """
+    # Imported here so that importing the package doesn't pay for requests
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def get_default_session():
+    """
+    Returns the process wide session used by resources that weren't given one,
+    creating it on first use
+
+    :rtype: :class:`requests.Session`
+    """
+    global _default_session
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = create_session()
+    return _default_session
 
 
 class Resource(object):
     """
     A base class for API resources
     """
+    timeout = DEFAULT_TIMEOUT
+    retry_policy = NO_RETRY
+    hooks = ()
+    circuit_breaker = None
+
+    def __init__(self, session=None, timeout=None, retry_policy=None, serializer=None, hooks=None,
+                 circuit_breaker=None, transport=None, *args, **kwargs):
+        """
+        :type session: :class:`requests.Session`
+        :param session: The session to send requests with, through a
+                :class:`RequestsTransport <pagerduty_api.transports.RequestsTransport>`
+
+        :type timeout: float or tuple
+        :param timeout: A (connect, read) timeout in seconds. Defaults to
+                ``DEFAULT_TIMEOUT``
+
+        :type retry_policy: :class:`RetryPolicy <pagerduty_api.retry.RetryPolicy>`
+        :param retry_policy: When to retry failed requests. By default they aren't retried
+
+        :type serializer: :class:`JSONSerializer <pagerduty_api.serializers.JSONSerializer>`
+        :param serializer: Encodes request bodies. If None, the serializer from
+                :func:`get_default_serializer <pagerduty_api.serializers.get_default_serializer>` is used
+
+        :type hooks: list
+        :param hooks: :class:`RequestHooks <pagerduty_api.metrics.RequestHooks>` called
+                around every request, such as a :class:`MetricsAggregator <pagerduty_api.metrics.MetricsAggregator>`
+
+        :type circuit_breaker: :class:`CircuitBreaker <pagerduty_api.breaker.CircuitBreaker>`
+        :param circuit_breaker: If given, every attempt goes through it, and fails
+                fast while PagerDuty is failing
+
+        :type transport: :class:`Transport <pagerduty_api.transports.Transport>` or str
+        :param transport: The transport to send requests with, or the name of a
+                shared one, such as ``http.client``. If neither it nor a ``session``
+                is given, the transport from
+                :func:`get_default_transport <pagerduty_api.transports.get_default_transport>` is used
+        """
+        self._session = session
+        if isinstance(transport, str):
+            transport = get_transport(transport)
+        elif transport is None and session is not None:
+            transport = RequestsTransport(session)
+        self._transport = transport
+        if timeout is not None:
+            self.timeout = timeout
+        if retry_policy is not None:
+            self.retry_policy = retry_policy
+        self._serializer = serializer
+        if hooks is not None:
+            self.hooks = list(hooks)
+        if circuit_breaker is not None:
+            self.circuit_breaker = circuit_breaker
+
+    @property
+    def session(self):
+        return self._session or get_default_session()
+
+    @property
+    def transport(self):
+        return self._transport or get_default_transport()
+
+    @property
+    def serializer(self):
+        return self._serializer or get_default_serializer()
+
     @property
     def headers(self):
-        return {
-            'Content-type': 'application/json',
-        }
+        return JSON_HEADERS
+
+    def _encode(self, data):
+        return self.serializer.dumps(data)
 
     def _post(self, *args, **kwargs):
         """
-        A wrapper for posting things. It will also json encode your 'data' parameter
+        A wrapper for posting things. It will also encode your 'data' parameter with
+        the resource's serializer
 
         :returns: The response of your post
         :rtype: dict
 
         :raises: This will raise a
             :class:`PagerDutyAPIServerException<pagerduty_api.exceptions.PagerDutyAPIServerException>`
-            if there is an error from Pager Duty
+            if there is an error from Pager Duty, or if it can't be reached, once
+            the retry policy gives up
+        """
+        return self._request('post', *args, **kwargs)
+
+    def _get(self, *args, **kwargs):
+        """
+        A wrapper for getting things. See :meth:`_post`
+
+        :returns: The response of your get
+        :rtype: dict
+        """
+        return self._request('get', *args, **kwargs)
+
+    def _request(self, method, *args, **kwargs):
+        return self._response(method, *args, **kwargs).json()
+
+    def _response(self, method, url=None, **kwargs):
         """
+        Sends a request through the retry policy and hooks, returning the
+        transport's response rather than its decoded body
+        """
+        info = RequestInfo.for_payload(url, kwargs.get('data'))
         if 'data' in kwargs:
-            kwargs['data'] = json.dumps(kwargs['data'], sort_keys=True)
-        response = requests.post(*args, **kwargs)
-        if not response.ok:
-            raise PagerDutyAPIServerException('{}: {}'.format(response.status_code, response.text))
-        return response.json()
+            kwargs['data'] = self._encode(kwargs['data'])
+            info.bytes_sent = len(kwargs['data'])
+        kwargs.setdefault('timeout', self.timeout)
+
+        emit(self.hooks, 'before_request', info)
+        start = time.time()
+        try:
+            response = self._request_with_retries(method, info, start, url, kwargs)
+        except BaseException as e:
+            # Any failure ends the request for the hooks, including cancellation and unwrapped errors
+            self._finish_request(info, start, e)
+            raise
+        self._finish_request(info, start)
+        return response
+
+    def _request_with_retries(self, method, info, start, url, kwargs):
+        transport = self.transport
+        while True:
+            info.attempts += 1
+            info.status_code = None
+            retry_after = None
+            probe = self._enter_circuit(info, start)
+            attempt_start = time.time()
+            try:
+                response = transport.request(method, url, **kwargs)
+                info.status_code = response.status_code
+            except TransportException as e:
+                message = str(e)
+            finally:
+                self._exit_circuit(probe, info.status_code, attempt_start)
+
+            if info.status_code is not None:
+                info.ttfb = response.elapsed.total_seconds()
+                if response.ok:
+                    return response
+                message = '{}: {}'.format(response.status_code, response.text)
+                retry_after = response.headers.get('Retry-After')
 
+            time.sleep(self._retry_delay(info, start, message, retry_after))
 
-class AuthorizedResource(object):
+    def _enter_circuit(self, info, start):
+        """
+        Asks the circuit breaker to send an attempt, returning whether it is a probe
+        """
+        if self.circuit_breaker is None:
+            return False
+        try:
+            return self.circuit_breaker.acquire()
+        except CircuitOpenException as e:
+            e.attempts = info.attempts - 1
+            e.elapsed = time.time() - start
+            raise
+
+    def _exit_circuit(self, probe, status_code, attempt_start):
+        if self.circuit_breaker is not None:
+            failed = status_code is None or status_code >= 500
+            self.circuit_breaker.record(failed, time.time() - attempt_start, probe)
+
+    def _retry_delay(self, info, start, message, retry_after):
+        """
+        Returns how long to wait before retrying a failed attempt, or raises
+        if the retry policy gives up
+        """
+        elapsed = time.time() - start
+        delay = None
+        if self.retry_policy.is_retryable(info.status_code):
+            delay = self.retry_policy.next_delay(info.attempts, elapsed, retry_after)
+        if delay is None:
+            raise PagerDutyAPIServerException(
+                message, status_code=info.status_code, attempts=info.attempts, elapsed=elapsed
+            )
+
+        LOG.warning('PagerDuty request failed ({0}), retrying in {1:.2f}s'.format(message, delay))
+        return delay
+
+    def _finish_request(self, info, start, exception=None):
+        info.total = time.time() - start
+        info.exception = exception
+        if self.circuit_breaker is not None:
+            info.circuit_state = self.circuit_breaker.state
+        emit(self.hooks, 'on_error' if exception else 'after_response', info)
+
+
+class AuthorizedResource(Resource):
     """
     A base class for authorized API resources
     """
+    BASE_URL = 'https://api.pagerduty.com'
+
     def __init__(self, api_key=None, *args, **kwargs):
         """
         :type api_key: str
@@ -47,13 +282,25 @@ class AuthorizedResource(object):
         :raises: If the api_key parameter is not present, and no environment
             variable is present, a :class:`ConfigurationException <pagerduty_api.exceptions.ConfigurationException>`
             is raised.
+
+        Any other arguments (such as ``session`` and ``timeout``) are passed on to
+        :class:`Resource`
         """
+        super(AuthorizedResource, self).__init__(*args, **kwargs)
         self.api_key = api_key or os.environ.get('PAGERDUTY_API_KEY')
 
         if not self.api_key:
             raise ConfigurationException('PAGERDUTY_API_KEY not present in environment!')
 
-        self.headers = {
+        self._headers = {
             'Content-type': 'application/json',
-            'Authorization': 'Token token={}'.format(api_key)
+            'Accept': 'application/vnd.pagerduty+json;version=2',
+            'Authorization': 'Token token={}'.format(self.api_key)
         }
+
+    @property
+    def headers(self):
+        return self._headers
+
+    def _url(self, path):
+        return '{0}/{1}'.format(self.BASE_URL, path.lstrip('/'))
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import DEFAULT_POOL_MAXSIZE
+
+
+class EventResult(object):
+    """
+    The outcome of sending one event as part of a batch
+    """
+    __slots__ = ('event', 'response', 'exception')
+
+    def __init__(self, event, response=None, exception=None):
+        """
+        :type event: dict
+        :param event: The event as it was passed in
+
+        :type response: dict
+        :param response: The JSON response of the API, if the event was sent
+
+        :type exception: Exception
+        :param exception: The error raised while building or sending the event
+        """
+        self.event = event
+        self.response = response
+        self.exception = exception
+
+    @property
+    def ok(self):
+        return self.exception is None
+
+    def __repr__(self):
+        if self.ok:
+            return '<EventResult ok {0!r}>'.format(self.response)
+        return '<EventResult failed {0!r}>'.format(self.exception)
+
+
+def group_by_key(events, key=None):
+    """
+    Groups events that must be sent one after another
+
+    :type events: list
+    :param events: The events to send
+
+    :type key: callable
+    :param key: Returns an event's ordering key, such as its incident, or None
+            if it can be sent at any time
+
+    :rtype: list of list
+    :return: The indexes of the events in each group, in input order. Events
+            with the same key share a group; every other event has its own
+    """
+    groups = []
+    by_key = {}
+    for index, event in enumerate(events):
+        group_key = None if key is None else key(event)
+        if group_key is None:
+            groups.append([index])
+        elif group_key in by_key:
+            by_key[group_key].append(index)
+        else:
+            groups.append(by_key.setdefault(group_key, [index]))
+    return groups
+
+
+def send_concurrently(send, events, max_workers=DEFAULT_POOL_MAXSIZE, key=None):
+    """
+    Calls ``send`` for each event on a bounded thread pool
+
+    :type send: callable
+    :param send: Called with a single event, returning the API response
+
+    :type events: list
+    :param events: The events to send
+
+    :type max_workers: int
+    :param max_workers: The most events in flight at once. Keep this at or below
+            the session's pool size so every worker gets a kept-alive connection.
+
+    :type key: callable
+    :param key: Returns an event's ordering key, or None. Events with the same
+            key are sent one after another in input order, and only events with
+            different keys are sent at once
+
+    :rtype: list of :class:`EventResult`
+    :return: One result per event, in the same order as ``events``
+    """
+    events = list(events)
+    results = [None] * len(events)
+
+    def run(indexes):
+        for index in indexes:
+            try:
+                results[index] = EventResult(events[index], response=send(events[index]))
+            except Exception as e:
+                results[index] = EventResult(events[index], exception=e)
+
+    groups = group_by_key(events, key)
+    if max_workers <= 1 or len(groups) <= 1:
+        for group in groups:
+            run(group)
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+        list(executor.map(run, groups))
+    return results
@@ -0,0 +1,170 @@
+import collections
+import threading
+import time
+
+from .exceptions import CircuitOpenException
+
+
+class CircuitStates(object):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker(object):
+    """
+    Stops sending requests to PagerDuty while it is failing, so callers fail
+    fast instead of each waiting out timeouts and retries.
+
+    The circuit starts closed. Once at least ``min_requests`` of the last
+    ``window_size`` attempts finished, and ``failure_rate`` of them failed, it
+    opens and every attempt raises a
+    :class:`CircuitOpenException <pagerduty_api.exceptions.CircuitOpenException>`.
+    After ``cool_down`` seconds it is half-open and lets ``probes`` attempts
+    through: if they all succeed it closes, and if any fails it opens again.
+
+    An attempt fails if it can't connect, times out, gets a 5xx response or, with
+    ``slow_call_duration``, takes at least that long. The breaker is thread-safe
+    and can be shared between resources.
+    """
+    def __init__(self, failure_rate=0.5, min_requests=10, window_size=20, slow_call_duration=None, cool_down=30,
+                 probes=1, clock=time.monotonic):
+        """
+        :type failure_rate: float
+        :param failure_rate: The share of failed attempts, between 0 and 1, that opens the circuit
+
+        :type min_requests: int
+        :param min_requests: The fewest attempts in the window before the circuit can open
+
+        :type window_size: int
+        :param window_size: The number of recent attempts the failure rate is taken over
+
+        :type slow_call_duration: float
+        :param slow_call_duration: If given, attempts taking at least this many
+                seconds count as failures
+
+        :type cool_down: float
+        :param cool_down: Seconds the circuit stays open before probing
+
+        :type probes: int
+        :param probes: The attempts let through while half-open, all of which
+                must succeed to close the circuit
+
+        :type clock: callable
+        :param clock: Returns the current time in seconds
+        """
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.slow_call_duration = slow_call_duration
+        self.cool_down = cool_down
+        self.probes = probes
+        self.clock = clock
+        self.rejected = 0
+        self.opened = 0
+
+        self._state = CircuitStates.CLOSED
+        self._outcomes = collections.deque(maxlen=window_size)
+        self._opened_at = None
+        self._probes_started = 0
+        self._probes_passed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        The :class:`CircuitStates` of the circuit. An open circuit whose cool down
+        is over reads as half-open
+        """
+        with self._lock:
+            if self._state == CircuitStates.OPEN and self.clock() - self._opened_at >= self.cool_down:
+                return CircuitStates.HALF_OPEN
+            return self._state
+
+    def acquire(self):
+        """
+        Asks to send an attempt
+
+        :raises: A :class:`CircuitOpenException <pagerduty_api.exceptions.CircuitOpenException>`
+                if the circuit is open, or half-open with every probe already sent
+
+        :rtype: bool
+        :return: Whether the attempt is a probe, to pass to :meth:`record`
+        """
+        with self._lock:
+            now = self.clock()
+            if self._state == CircuitStates.OPEN and now - self._opened_at >= self.cool_down:
+                self._state = CircuitStates.HALF_OPEN
+                self._probes_started = self._probes_passed = 0
+
+            if self._state == CircuitStates.CLOSED:
+                return False
+            if self._state == CircuitStates.HALF_OPEN and self._probes_started < self.probes:
+                self._probes_started += 1
+                return True
+
+            self.rejected += 1
+            retry_in = max(self._opened_at + self.cool_down - now, 0)
+        raise CircuitOpenException('The PagerDuty circuit is open', retry_in=retry_in)
+
+    def record(self, failed, duration, probe=False):
+        """
+        Records how an attempt went
+
+        :type failed: bool
+        :param failed: Whether it couldn't connect, timed out or got a 5xx response
+
+        :type duration: float
+        :param duration: Seconds the attempt took
+
+        :type probe: bool
+        :param probe: What :meth:`acquire` returned for the attempt
+        """
+        failed = failed or (self.slow_call_duration is not None and duration >= self.slow_call_duration)
+        with self._lock:
+            if probe:
+                self._record_probe(failed)
+            elif self._state == CircuitStates.CLOSED:
+                self._outcomes.append(failed)
+                failures = sum(self._outcomes)
+                if len(self._outcomes) >= self.min_requests and failures >= self.failure_rate * len(self._outcomes):
+                    self._open()
+
+    def reset(self):
+        """
+        Closes the circuit and forgets recent attempts
+        """
+        with self._lock:
+            self._state = CircuitStates.CLOSED
+            self._outcomes.clear()
+
+    def snapshot(self):
+        """
+        :rtype: dict
+        :return: The state, the failure rate of recent attempts and the counts of
+                rejected attempts and times opened, for exporting to a metrics system
+        """
+        state = self.state
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                'state': state,
+                'failure_rate': sum(outcomes) / float(len(outcomes)) if outcomes else 0.0,
+                'rejected': self.rejected,
+                'opened': self.opened,
+            }
+
+    def _record_probe(self, failed):
+        if self._state != CircuitStates.HALF_OPEN:
+            return
+        if failed:
+            self._open()
+            return
+        self._probes_passed += 1
+        if self._probes_passed >= self.probes:
+            self._state = CircuitStates.CLOSED
+            self._outcomes.clear()
+
+    def _open(self):
+        self._state = CircuitStates.OPEN
+        self._opened_at = self.clock()
+        self.opened += 1
@@ -0,0 +1,172 @@
+import collections
+import threading
+import time
+
+# Returned by a fetch when the server answered 304 Not Modified
+NOT_MODIFIED = object()
+
+
+class _Flight(object):
+    """
+    A fetch in progress that concurrent misses for the same key wait on.
+    An invalidated fetch still answers its waiters but isn't cached
+    """
+    __slots__ = ('done', 'value', 'exception', 'invalidated')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.exception = None
+        self.invalidated = False
+
+
+class ResponseCache(object):
+    """
+    A read-through cache for REST lookups that rarely change, such as services,
+    escalation policies and users.
+
+    Entries live for a time to live per namespace (a REST resource uses its
+    ``PATH``), and the least recently used are evicted once the cache is full.
+    An expired entry that came with an ETag is revalidated with
+    ``If-None-Match`` rather than fetched again. Concurrent misses for the same
+    key share a single fetch.
+
+    Cached values are shared between callers, so they must be treated as
+    read-only. The cache is thread-safe and can be shared between resources.
+    """
+    def __init__(self, ttl=300, ttls=None, max_size=1000, clock=time.monotonic):
+        """
+        :type ttl: float
+        :param ttl: Seconds an entry is fresh for
+
+        :type ttls: dict
+        :param ttls: Seconds an entry is fresh for by namespace, such as
+                ``{'oncalls': 60}``. Namespaces that aren't given use ``ttl``
+
+        :type max_size: int
+        :param max_size: The most entries kept. The least recently used are
+                evicted first
+
+        :type clock: callable
+        :param clock: Returns the current time in seconds
+        """
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+        # (namespace, key) -> [value, etag, expires_at], least recently used first
+        self._entries = collections.OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, namespace, key, fetch):
+        """
+        Returns the cached value for a key, fetching it on a miss
+
+        :type namespace: str
+        :param namespace: The group the key belongs to, which sets its time to live
+
+        :type key: hashable
+        :param key: The key within the namespace
+
+        :type fetch: callable
+        :param fetch: Called with the cached ETag (or None) and returns a
+                ``(value, etag)`` tuple, or ``(NOT_MODIFIED, etag)`` if the
+                cached value is still current. Exceptions are raised to every
+                caller waiting on the fetch, and nothing is cached
+
+        :rtype: object
+        """
+        entry_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[2] > self.clock():
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return entry[0]
+
+            flight = self._flights.get(entry_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[entry_key] = _Flight()
+                self.misses += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.exception is not None:
+                raise flight.exception
+            return flight.value
+
+        try:
+            flight.value = self._fetch(namespace, entry_key, entry, fetch, flight)
+        except Exception as e:
+            flight.exception = e
+            raise
+        finally:
+            with self._lock:
+                # An invalidated flight may already have been replaced by a newer fetch
+                if self._flights.get(entry_key) is flight:
+                    del self._flights[entry_key]
+            flight.done.set()
+        return flight.value
+
+    def _fetch(self, namespace, entry_key, entry, fetch, flight):
+        etag = entry[1] if entry is not None else None
+        value, etag = fetch(etag)
+        if value is NOT_MODIFIED:
+            value = entry[0]
+            self.revalidated += 1
+
+        with self._lock:
+            if flight.invalidated:
+                return value
+            self._entries[entry_key] = [value, etag, self.clock() + self.ttls.get(namespace, self.ttl)]
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, namespace=None, match=None):
+        """
+        Forgets cached entries, such as after changing the objects they hold.
+        Fetches in progress for the same keys aren't cached when they finish
+
+        :type namespace: str
+        :param namespace: Only forget entries in this namespace. If None, every
+                namespace is cleared
+
+        :type match: callable
+        :param match: If given, only forget entries whose key it returns True for
+
+        :rtype: int
+        :return: The number of entries forgotten
+        """
+        def matches(entry_key):
+            return (namespace is None or entry_key[0] == namespace) and (match is None or match(entry_key[1]))
+
+        with self._lock:
+            forgotten = [entry_key for entry_key in self._entries if matches(entry_key)]
+            for entry_key in forgotten:
+                del self._entries[entry_key]
+            self._invalidate_flights([entry_key for entry_key in self._flights if matches(entry_key)])
+        return len(forgotten)
+
+    def clear(self):
+        """
+        Forgets every cached entry, and keeps fetches in progress from being cached
+        """
+        with self._lock:
+            self._entries.clear()
+            self._invalidate_flights(list(self._flights))
+
+    def _invalidate_flights(self, entry_keys):
+        # Misses from now on start a fetch of their own rather than wait on a stale one
+        for entry_key in entry_keys:
+            self._flights.pop(entry_key).invalidated = True
@@ -0,0 +1,108 @@
+import collections
+import threading
+import time
+
+
+class EventDeduplicator(object):
+    """
+    Suppresses repeats of the same event for an incident within a time window.
+
+    An event is a repeat when the last event sent for its ``(service_key,
+    incident_key)`` had the same event type and was sent less than ``window``
+    seconds ago. A different event type, such as a resolve after a trigger, is
+    always let through.
+
+    The deduplicator is thread-safe and can be shared between alerts.
+    """
+    def __init__(self, window=60, max_size=10000, coalesce=False, clock=time.monotonic):
+        """
+        :type window: float
+        :param window: Seconds during which repeats of a sent event are suppressed.
+                Incidents are forgotten once their last event is this old
+
+        :type max_size: int
+        :param max_size: The most incidents remembered. The least recently sent
+                are forgotten first
+
+        :type coalesce: bool
+        :param coalesce: If True, resources add the number of repeats suppressed
+                before the next event sent for a remembered incident to its details,
+                as ``suppressed_events``
+
+        :type clock: callable
+        :param clock: Returns the current time in seconds
+        """
+        self.window = window
+        self.max_size = max_size
+        self.coalesce = coalesce
+        self.clock = clock
+        self.suppressed = 0
+
+        # (service_key, incident_key) -> [event_type, sent_at, repeats suppressed],
+        # ordered by sent_at so the oldest entries are always at the front
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def check(self, service_key, incident_key, event_type):
+        """
+        Records an event about to be sent
+
+        :type service_key: str
+        :param service_key: The service (or routing) key of the event
+
+        :type incident_key: str
+        :param incident_key: The incident (or dedup) key of the event
+
+        :type event_type: str
+        :param event_type: The type (or action) of the event
+
+        :rtype: tuple
+        :return: ``(send, repeats)``. ``send`` is False if the event is a repeat
+                that shouldn't be sent. ``repeats`` is the number of repeats
+                suppressed since the incident's last sent event
+        """
+        key = (service_key, incident_key)
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == event_type and now - entry[1] < self.window:
+                entry[2] += 1
+                self.suppressed += 1
+                return False, entry[2]
+
+            repeats = 0
+            if entry is not None:
+                del self._entries[key]
+                repeats = entry[2]
+
+            self._expire(now)
+            self._entries[key] = [event_type, now, 0]
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return True, repeats
+
+    def forget(self, service_key, incident_key):
+        """
+        Forgets the last event sent for an incident, so its next event goes through.
+        Used when sending a checked event failed.
+        """
+        with self._lock:
+            self._entries.pop((service_key, incident_key), None)
+
+    def clear(self):
+        """
+        Forgets every incident
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _expire(self, now):
+        while self._entries:
+            key = next(iter(self._entries))
+            if now - self._entries[key][1] < self.window:
+                return
+            del self._entries[key]
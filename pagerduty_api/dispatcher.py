@@ -0,0 +1,228 @@
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from .alerts import AlertTypes
+from .exceptions import DispatcherException
+
+LOG = logging.getLogger(__name__)
+
+
+class OverflowPolicies(object):
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+
+
+class AlertDispatcher(object):
+    """
+    Sends an :class:`Alert <pagerduty_api.Alert>`'s events from background worker
+    threads, so callers don't wait on PagerDuty.
+
+    Each method returns a :class:`concurrent.futures.Future` that resolves to the
+    JSON response of the API, or to the exception raised while sending. Events for
+    the same incident are sent one at a time, in the order they were queued.
+
+        ::
+
+            dispatcher = AlertDispatcher(Alert(service_key='4baa5d20cfba466a5e075b02698f455c'))
+            future = dispatcher.trigger(description='No data received')
+            ...
+            dispatcher.close()
+
+    """
+    def __init__(self, alert, workers=2, max_queue_size=1000, overflow=OverflowPolicies.BLOCK, block_timeout=None):
+        """
+        :type alert: :class:`Alert <pagerduty_api.Alert>`
+        :param alert: The alert that builds and sends the events
+
+        :type workers: int
+        :param workers: The number of worker threads sending events
+
+        :type max_queue_size: int
+        :param max_queue_size: The most events waiting to be sent
+
+        :type overflow: str
+        :param overflow: One of the :class:`OverflowPolicies`. What to do with a new
+                event when the queue is full: wait for room, drop the oldest waiting
+                event, or drop the new event. Dropped events fail their future with a
+                :class:`DispatcherException <pagerduty_api.exceptions.DispatcherException>`
+
+        :type block_timeout: float
+        :param block_timeout: With the ``block`` policy, the most seconds to wait for
+                room before dropping the new event. Waits forever if None
+        """
+        if overflow not in (OverflowPolicies.BLOCK, OverflowPolicies.DROP_OLDEST, OverflowPolicies.DROP_NEWEST):
+            raise ValueError('Unknown overflow policy {0}'.format(overflow))
+
+        self.alert = alert
+        self.max_queue_size = max_queue_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+        self._queue = collections.deque()
+        # The (service_key, incident_key) of events being sent, whose later events wait
+        self._sending = set()
+        self._unfinished = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+
+        self._workers = [
+            threading.Thread(target=self._work, name='pagerduty-dispatcher-{0}'.format(i))
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def trigger(self, description, incident_key=None, client=None, client_url=None, details=None):
+        """
+        Queues a trigger. See :meth:`Alert.trigger <pagerduty_api.Alert.trigger>`
+
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        data = self.alert.build_event(
+            AlertTypes.TRIGGER, description=description, incident_key=incident_key, client=client,
+            client_url=client_url, details=details
+        )
+        self.alert.incident_key = data['incident_key']
+        return self.submit(data)
+
+    def acknowledge(self, incident_key=None, description=None, details=None):
+        """
+        Queues an acknowledge. See :meth:`Alert.acknowledge <pagerduty_api.Alert.acknowledge>`
+
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        return self.submit(self.alert.build_event(
+            AlertTypes.ACKNOWLEDGE, incident_key=incident_key, description=description, details=details
+        ))
+
+    def resolve(self, incident_key=None, description=None, details=None):
+        """
+        Queues a resolve. See :meth:`Alert.resolve <pagerduty_api.Alert.resolve>`
+
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        return self.submit(self.alert.build_event(
+            AlertTypes.RESOLVE, incident_key=incident_key, description=description, details=details
+        ))
+
+    def submit(self, data):
+        """
+        Queues an event payload, as built by :meth:`Alert.build_event <pagerduty_api.Alert.build_event>`
+
+        :raises: A :class:`DispatcherException <pagerduty_api.exceptions.DispatcherException>`
+                if the dispatcher is closed
+
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise DispatcherException('The dispatcher is closed')
+
+            if len(self._queue) >= self.max_queue_size:
+                if self.overflow == OverflowPolicies.DROP_OLDEST:
+                    self._drop(self._queue.popleft()[1])
+                    self._unfinished -= 1
+                elif self.overflow == OverflowPolicies.DROP_NEWEST or not self._wait_for_room():
+                    self._drop(future)
+                    return future
+
+            self._queue.append((data, future))
+            self._unfinished += 1
+            self._not_empty.notify()
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued event has been sent
+
+        :type timeout: float
+        :param timeout: The most seconds to wait. Waits forever if None
+
+        :rtype: bool
+        :return: True if the queue drained in time
+        """
+        with self._lock:
+            return self._all_done.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def close(self, timeout=None):
+        """
+        Stops accepting events, sends the ones already queued and stops the workers
+
+        :type timeout: float
+        :param timeout: The most seconds to wait for queued events. Waits forever if None
+
+        :rtype: bool
+        :return: True if every queued event was sent in time
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+        deadline = None if timeout is None else time.time() + timeout
+        for worker in self._workers:
+            worker.join(None if deadline is None else max(deadline - time.time(), 0))
+        return not any(worker.is_alive() for worker in self._workers)
+
+    def _wait_for_room(self):
+        return self._not_full.wait_for(
+            lambda: self._closed or len(self._queue) < self.max_queue_size, self.block_timeout
+        ) and not self._closed
+
+    def _drop(self, future):
+        self.dropped += 1
+        future.set_exception(DispatcherException('The dispatcher queue is full'))
+        LOG.warning('Dropped PagerDuty event, the dispatcher queue is full')
+
+    def _next(self):
+        """
+        Returns the index of the oldest queued event whose incident isn't being sent, or None
+        """
+        for index, (data, future) in enumerate(self._queue):
+            if self.alert._incident(data) not in self._sending:
+                return index
+        return None
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._next() is not None or (self._closed and not self._queue))
+                if not self._queue:
+                    return
+                index = self._next()
+                data, future = self._queue[index]
+                del self._queue[index]
+                incident = self.alert._incident(data)
+                if incident is not None:
+                    self._sending.add(incident)
+                self._not_full.notify()
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(self.alert._send(data))
+                except Exception as e:
+                    future.set_exception(e)
+
+            with self._lock:
+                if incident is not None:
+                    self._sending.discard(incident)
+                    self._not_empty.notify()
+                self._unfinished -= 1
+                if not self._unfinished:
+                    self._all_done.notify_all()
@@ -0,0 +1,314 @@
+import logging
+
+from .base import DEFAULT_POOL_MAXSIZE, Resource
+from .batch import EventResult, send_concurrently
+from .exceptions import CircuitOpenException, ConfigurationException, PagerDutyAPIServerException, SpoolFullException
+
+LOG = logging.getLogger(__name__)
+
+
+class EventResource(Resource):
+    """
+    A base class for resources that send events to PagerDuty's Events APIs.
+
+    Events go through the resource's tracker, deduplicator, rate limiter and
+    spool, if it has them, before being posted. Subclasses build the payloads
+    and name the payload fields holding the routing key, incident key and event
+    type.
+    """
+    URL = None
+    ROUTING_KEY_FIELD = 'service_key'
+    INCIDENT_KEY_FIELD = 'incident_key'
+    EVENT_TYPE_FIELD = 'event_type'
+
+    def __init__(self, deduplicator=None, rate_limiter=None, spool=None, tracker=None, fallback=None, *args,
+                 **kwargs):
+        """
+        :type deduplicator: :class:`EventDeduplicator <pagerduty_api.dedup.EventDeduplicator>`
+        :param deduplicator: If given, repeats of a recently sent event are not
+                sent. Their methods return a response with a ``suppressed`` status
+
+        :type rate_limiter: :class:`RateLimiter <pagerduty_api.ratelimit.RateLimiter>`
+        :param rate_limiter: If given, every event takes a token for its routing
+                key before it is sent
+
+        :type spool: :class:`EventSpool <pagerduty_api.spool.EventSpool>`
+        :param spool: If given, events that fail because PagerDuty can't be reached,
+                is rate limiting or has a server error are spooled instead of
+                raising. Their methods return a response with a ``spooled`` status.
+                Send them later with :meth:`replay_spool`. A spool must only be
+                shared by resources of the same class
+
+        :type tracker: :class:`IncidentTracker <pagerduty_api.tracker.IncidentTracker>`
+        :param tracker: If given, the state of every incident is tracked, and
+                redundant acknowledges and resolves are not sent. Their methods
+                return a response with a ``redundant`` status
+
+        :type fallback: callable
+        :param fallback: If given, called with the payload of an event that
+                can't be sent because the resource's circuit breaker is open and
+                that isn't spooled, or that should be spooled behind the events of
+                its incident but the spool is full. What it returns is the event's
+                response. Use it to log the event or send it through another channel
+
+        Any other arguments (such as ``session`` and ``timeout``) are passed on to
+        :class:`Resource <pagerduty_api.base.Resource>`
+        """
+        super(EventResource, self).__init__(*args, **kwargs)
+        self.deduplicator = deduplicator
+        self.rate_limiter = rate_limiter
+        self.spool = spool
+        self.tracker = tracker
+        self.fallback = fallback
+        self._fragment = None
+
+    def build_event(self, *args, **kwargs):
+        """
+        Builds the payload for an event without sending it
+
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def send_many(self, events, max_workers=DEFAULT_POOL_MAXSIZE):
+        """
+        Sends many events concurrently over the resource's connection pool.
+
+        Each event is a dict of keyword arguments for :meth:`build_event`.
+        Unlike the single event methods, a failing event doesn't raise. The
+        exception is recorded on its result and the rest of the batch is still sent.
+        Events for the same incident are sent one after another, in the order given.
+
+        :type events: list
+        :param events: The events to send
+
+        :type max_workers: int
+        :param max_workers: The most events in flight at once
+
+        :rtype: list of :class:`EventResult <pagerduty_api.batch.EventResult>`
+        :return: One result per event, in the same order as ``events``
+        """
+        events = list(events)
+        built = [self._build_quietly(event) for event in events]
+        results = send_concurrently(self._send_built, built, max_workers, key=self._incident)
+        return [EventResult(event, result.response, result.exception) for event, result in zip(events, results)]
+
+    def resolve_all(self, max_workers=DEFAULT_POOL_MAXSIZE, **kwargs):
+        """
+        Resolves every incident the resource's tracker has open for its routing key
+
+        Any keyword arguments, such as a ``description``, are passed to
+        :meth:`build_event` for every resolve.
+
+        :raises: A :class:`ConfigurationException <pagerduty_api.exceptions.ConfigurationException>`
+                if the resource has no tracker
+
+        :rtype: list of :class:`EventResult <pagerduty_api.batch.EventResult>`
+        :return: One result per incident. See :meth:`send_many`
+        """
+        if self.tracker is None:
+            raise ConfigurationException('resolve_all() needs an IncidentTracker')
+
+        incident_keys = self.tracker.open_incidents(getattr(self, self.ROUTING_KEY_FIELD))
+        events = [
+            dict(kwargs, **{self.EVENT_TYPE_FIELD: 'resolve', self.INCIDENT_KEY_FIELD: incident_key})
+            for incident_key in incident_keys
+        ]
+        return self.send_many(events, max_workers)
+
+    def replay_spool(self, batch_size=100, max_workers=DEFAULT_POOL_MAXSIZE):
+        """
+        Sends the events waiting in the resource's spool, in the order they were
+        spooled. See :meth:`EventSpool.replay <pagerduty_api.spool.EventSpool.replay>`
+
+        :rtype: int
+        :return: The number of events sent
+        """
+        return self.spool.replay(self._deliver, batch_size, max_workers, is_retryable=self._is_spoolable)
+
+    def _identity(self, data):
+        return (
+            data.get(self.ROUTING_KEY_FIELD), data.get(self.INCIDENT_KEY_FIELD), data.get(self.EVENT_TYPE_FIELD)
+        )
+
+    def _url(self, data):
+        return self.URL
+
+    def _build_quietly(self, event):
+        """
+        Builds an event of a batch, returning the error instead if it can't be built
+        """
+        try:
+            return self.build_event(**event)
+        except Exception as e:
+            return e
+
+    def _send_built(self, data):
+        if isinstance(data, Exception):
+            raise data
+        return self._send(data)
+
+    def _incident(self, data):
+        """
+        :return: The ``(routing_key, incident_key)`` of a built event, or None
+                if it isn't about an incident
+        """
+        if isinstance(data, Exception):
+            return None
+        routing_key, incident_key, event_type = self._identity(data)
+        return None if incident_key is None else (routing_key, incident_key)
+
+    def _description(self, data):
+        return data.get('description')
+
+    def _details(self, data):
+        return data.get('details') or {}
+
+    def _summary_data(self, routing_key, incident_key, description, details):
+        """
+        Builds a trigger standing for many incidents, such as a rollup's summary
+        """
+        return self.build_event('trigger', description=description, details=details, **{
+            self.ROUTING_KEY_FIELD: routing_key, self.INCIDENT_KEY_FIELD: incident_key,
+        })
+
+    def _coalesce(self, data, repeats):
+        """
+        Records how many repeats of an event were suppressed on the next one sent
+        """
+        data['details'] = dict(data.get('details') or {}, suppressed_events=repeats)
+
+    def _send(self, data):
+        allowed, previous = self._track(data)
+        if not allowed:
+            return self._redundant_response(data)
+        if self._suppress(data):
+            return self._suppressed_response(data)
+        try:
+            response = self._spool_behind_pending(data)
+            if response is not None:
+                return response
+            return self._deliver(data)
+        except PagerDutyAPIServerException as e:
+            response = self._divert(data, e)
+            if response is not None:
+                return response
+            self._rollback(data, previous)
+            raise
+        except Exception:
+            self._rollback(data, previous)
+            raise
+
+    def _deliver(self, data):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(data[self.ROUTING_KEY_FIELD])
+        return self._post(
+            url=self._url(data),
+            data=data,
+            headers=self.headers
+        )
+
+    def _encode(self, data):
+        # The routing key is the same in nearly every payload, so it is only encoded once
+        serializer = self.serializer
+        if self._fragment is None or self._fragment[0] is not serializer:
+            fields = {self.ROUTING_KEY_FIELD: getattr(self, self.ROUTING_KEY_FIELD)}
+            self._fragment = (serializer, serializer.fragment(**fields))
+        return serializer.dumps(data, self._fragment[1])
+
+    def _track(self, data):
+        routing_key, incident_key, event_type = self._identity(data)
+        if self.tracker is None or incident_key is None:
+            return True, None
+
+        allowed, previous = self.tracker.transition(routing_key, incident_key, event_type)
+        if not allowed:
+            LOG.info('Skipped redundant PagerDuty {0} for incident {1}'.format(event_type, incident_key))
+        return allowed, previous
+
+    def _rollback(self, data, previous):
+        # Forgets what was recorded for an event that couldn't be sent
+        routing_key, incident_key, event_type = self._identity(data)
+        self._unsuppress(data)
+        if self.tracker is not None and incident_key is not None:
+            self.tracker.rollback(routing_key, incident_key, previous)
+
+    def _suppress(self, data):
+        routing_key, incident_key, event_type = self._identity(data)
+        if self.deduplicator is None or incident_key is None:
+            return False
+
+        send, repeats = self.deduplicator.check(routing_key, incident_key, event_type)
+        if send:
+            if repeats and self.deduplicator.coalesce:
+                self._coalesce(data, repeats)
+            return False
+        LOG.info('Suppressed duplicate PagerDuty {0} for incident {1}'.format(event_type, incident_key))
+        return True
+
+    def _unsuppress(self, data):
+        routing_key, incident_key, event_type = self._identity(data)
+        if self.deduplicator is not None and incident_key is not None:
+            self.deduplicator.forget(routing_key, incident_key)
+
+    def _is_spoolable(self, e):
+        return not isinstance(e, PagerDutyAPIServerException) or self.retry_policy.is_retryable(e.status_code)
+
+    def _spool_behind_pending(self, data):
+        """
+        Returns the response of an event spooled behind the spooled events of its
+        incident, to keep their order, or None if the incident has none
+        """
+        routing_key, incident_key, event_type = self._identity(data)
+        if self.spool is None or not self.spool.has_pending((routing_key, incident_key)):
+            return None
+        if self.spool.append(data, (routing_key, incident_key)):
+            return self._spooled_response(data)
+
+        # Sending it now would overtake the spooled events, so it can't be sent at all
+        if self.fallback is not None:
+            LOG.warning('PagerDuty spool is full, sending {0} for incident {1} to the fallback'.format(
+                event_type, incident_key
+            ))
+            return self.fallback(data)
+        raise SpoolFullException('The PagerDuty spool is full and incident {0} has spooled events'.format(incident_key))
+
+    def _divert(self, data, e):
+        """
+        Returns the response of a failed event taken by the spool or the fallback,
+        or None if neither took it
+        """
+        if self._spool_failed(data, e):
+            return self._spooled_response(data)
+        if self.fallback is not None and isinstance(e, CircuitOpenException):
+            LOG.warning('PagerDuty circuit is open, sending {0} to the fallback'.format(self._identity(data)[2]))
+            return self.fallback(data)
+        return None
+
+    def _spool_failed(self, data, e):
+        routing_key, incident_key, event_type = self._identity(data)
+        if self.spool is None or not self._is_spoolable(e) or not self.spool.append(data, (routing_key, incident_key)):
+            return False
+        LOG.warning('Spooled PagerDuty {0} for incident {1}: {2}'.format(event_type, incident_key, e))
+        return True
+
+    def _spooled_response(self, data):
+        return {
+            'status': 'spooled',
+            'message': 'Event spooled for delivery',
+            self.INCIDENT_KEY_FIELD: data.get(self.INCIDENT_KEY_FIELD),
+        }
+
+    def _redundant_response(self, data):
+        return {
+            'status': 'redundant',
+            'message': 'Incident is not in a state this event changes',
+            self.INCIDENT_KEY_FIELD: data.get(self.INCIDENT_KEY_FIELD),
+        }
+
+    def _suppressed_response(self, data):
+        return {
+            'status': 'suppressed',
+            'message': 'Duplicate event suppressed',
+            self.INCIDENT_KEY_FIELD: data.get(self.INCIDENT_KEY_FIELD),
+        }
@@ -8,12 +8,88 @@ class ConfigurationException(Exception):
 class PagerDutyAPIServerException(Exception):
     """
     An exception for Pager Duty server errors
+
+    :ivar status_code: The status of the last response, or None if the last
+            attempt couldn't connect or timed out
+    :ivar attempts: The number of times the request was sent
+    :ivar elapsed: Seconds spent on the request, including retries
     """
     message = 'There was an error from Pager Duty'
 
+    def __init__(self, *args, **kwargs):
+        self.status_code = kwargs.pop('status_code', None)
+        self.attempts = kwargs.pop('attempts', 1)
+        self.elapsed = kwargs.pop('elapsed', None)
+        super(PagerDutyAPIServerException, self).__init__(*args, **kwargs)
+
+
+class CircuitOpenException(PagerDutyAPIServerException):
+    """
+    An exception when a circuit breaker stops a request from being sent. It has
+    no ``status_code``, like a connection error, so spools take the event
+
+    :ivar retry_in: Seconds until the circuit will let a probe through
+    """
+    message = 'The circuit to Pager Duty is open'
+
+    def __init__(self, *args, **kwargs):
+        self.retry_in = kwargs.pop('retry_in', None)
+        super(CircuitOpenException, self).__init__(*args, **kwargs)
+
+
+class TransportException(Exception):
+    """
+    An exception when a transport can't reach PagerDuty or times out. Resources
+    retry it, then raise a :class:`PagerDutyAPIServerException` without a ``status_code``
+    """
+    message = 'Pager Duty could not be reached'
+
 
 class IncidentKeyException(Exception):
     """
     An exception when no Incident Key exists
     """
     message = 'There was not an Incident Key for the alert'
+
+
+class DispatcherException(Exception):
+    """
+    An exception when a dispatcher can't accept or deliver an event
+    """
+    message = 'The event was not dispatched'
+
+
+class RateLimitException(Exception):
+    """
+    An exception when a rate limiter refuses to wait for a token
+
+    :ivar wait: Seconds until a token would have been available
+    """
+    message = 'The client-side rate limit was exceeded'
+
+    def __init__(self, *args, **kwargs):
+        self.wait = kwargs.pop('wait', None)
+        super(RateLimitException, self).__init__(*args, **kwargs)
+
+
+class SpoolFullException(Exception):
+    """
+    An exception when an event for an incident with spooled events can't be
+    spooled behind them because the spool is full. It isn't sent either, since
+    it would overtake them
+    """
+    message = 'The event spool is full'
+
+
+class WebhookException(Exception):
+    """
+    An exception when a webhook delivery can't be parsed
+    """
+    message = 'The webhook payload is not valid'
+
+
+class WebhookSignatureException(WebhookException):
+    """
+    An exception when a webhook delivery isn't signed with a known secret
+    """
+    message = 'The webhook signature is not valid'
@@ -0,0 +1,185 @@
+import collections
+import logging
+import threading
+
+from .exceptions import CircuitOpenException
+
+LOG = logging.getLogger(__name__)
+
+
+class RequestInfo(object):
+    """
+    What is known about a request, passed to :class:`RequestHooks`.
+
+    Timings are in seconds and are None when the transport can't measure them.
+    ``circuit_state`` is the state of the resource's circuit breaker once the
+    request finished, if it has one.
+    """
+    __slots__ = (
+        'url', 'event_type', 'incident_key', 'bytes_sent', 'status_code', 'attempts', 'exception',
+        'dns', 'connect', 'ttfb', 'total', 'circuit_state',
+    )
+
+    def __init__(self, url=None, event_type=None, incident_key=None, bytes_sent=0):
+        self.url = url
+        self.event_type = event_type
+        self.incident_key = incident_key
+        self.bytes_sent = bytes_sent
+        self.status_code = None
+        self.attempts = 0
+        self.exception = None
+        self.dns = None
+        self.connect = None
+        self.ttfb = None
+        self.total = None
+        self.circuit_state = None
+
+    @property
+    def retries(self):
+        return max(self.attempts - 1, 0)
+
+    @classmethod
+    def for_payload(cls, url, data):
+        data = data if isinstance(data, dict) else {}
+        return cls(
+            url=url,
+            event_type=data.get('event_type') or data.get('event_action'),
+            incident_key=data.get('incident_key') or data.get('dedup_key'),
+        )
+
+
+class RequestHooks(object):
+    """
+    Callbacks around every request a resource sends. Subclass and override the
+    ones you need. Exceptions raised by hooks are logged and ignored.
+    """
+    def before_request(self, info):
+        """
+        Called before the first attempt of a request
+
+        :type info: :class:`RequestInfo`
+        """
+
+    def after_response(self, info):
+        """
+        Called once a request succeeds, with its status, timings and attempts
+
+        :type info: :class:`RequestInfo`
+        """
+
+    def on_error(self, info):
+        """
+        Called once a request has failed for good. ``info.exception`` holds the error
+
+        :type info: :class:`RequestInfo`
+        """
+
+
+def emit(hooks, name, info):
+    """
+    Calls the named callback of each hook, logging any exception
+    """
+    for hook in hooks:
+        try:
+            getattr(hook, name)(info)
+        except Exception:
+            LOG.exception('PagerDuty request hook {0}.{1} failed'.format(hook.__class__.__name__, name))
+
+
+class MetricsAggregator(RequestHooks):
+    """
+    Counts requests and keeps their latencies in process, ready to export.
+
+    Latencies of the last ``max_samples`` requests are kept for percentiles.
+    The aggregator is thread-safe and can be shared between resources.
+    """
+    def __init__(self, max_samples=10000):
+        """
+        :type max_samples: int
+        :param max_samples: The number of recent latencies used for percentiles
+        """
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets every count and latency
+        """
+        with self._lock:
+            self.requests = 0
+            self.successes = 0
+            self.errors = 0
+            self.retries = 0
+            self.bytes_sent = 0
+            self.in_flight = 0
+            self.by_event_type = collections.Counter()
+            self.by_status = collections.Counter()
+            self.short_circuited = 0
+            self.circuit_state = None
+            self._latencies = collections.deque(maxlen=self.max_samples)
+
+    def before_request(self, info):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.bytes_sent += info.bytes_sent
+            self.by_event_type[info.event_type] += 1
+
+    def after_response(self, info):
+        with self._lock:
+            self.successes += 1
+            self._finish(info)
+
+    def on_error(self, info):
+        with self._lock:
+            self.errors += 1
+            if isinstance(info.exception, CircuitOpenException):
+                self.short_circuited += 1
+            self._finish(info)
+
+    def percentile(self, percent):
+        """
+        :type percent: float
+        :param percent: Between 0 and 100
+
+        :rtype: float
+        :return: The latency in seconds that ``percent`` of recent requests were
+                faster than, or None if there were none
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = int(round(percent / 100.0 * (len(latencies) - 1)))
+        return latencies[index]
+
+    def snapshot(self):
+        """
+        :rtype: dict
+        :return: The counts and latency percentiles, for exporting to a metrics system
+        """
+        with self._lock:
+            counts = {
+                'requests': self.requests,
+                'successes': self.successes,
+                'errors': self.errors,
+                'retries': self.retries,
+                'bytes_sent': self.bytes_sent,
+                'in_flight': self.in_flight,
+                'by_event_type': dict(self.by_event_type),
+                'by_status': dict(self.by_status),
+                'short_circuited': self.short_circuited,
+                'circuit_state': self.circuit_state,
+            }
+        counts.update(p50=self.percentile(50), p95=self.percentile(95), p99=self.percentile(99))
+        return counts
+
+    def _finish(self, info):
+        self.in_flight -= 1
+        if info.circuit_state is not None:
+            self.circuit_state = info.circuit_state
+        self.retries += info.retries
+        self.by_status[info.status_code] += 1
+        if info.total is not None and not isinstance(info.exception, CircuitOpenException):
+            self._latencies.append(info.total)
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+
+from .exceptions import RateLimitException
+
+# Service keys' buckets are swept for idle ones once there are this many, and
+# after that once there are twice as many as the last sweep kept
+MIN_SWEEP_SIZE = 1024
+
+
+class TokenBucket(object):
+    """
+    A token bucket that refills at ``rate`` tokens a second up to ``capacity``.
+    Not thread-safe on its own; :class:`RateLimiter` guards its buckets.
+    """
+    __slots__ = ('rate', 'capacity', '_tokens', '_updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = now
+
+    def tokens(self, now):
+        return min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+
+    def wait_time(self, now):
+        return max(0.0, (1 - self.tokens(now)) / self.rate)
+
+    def full(self, now):
+        return self.tokens(now) >= self.capacity
+
+    def take(self, now):
+        # The balance may go negative, which reserves the token for a caller that waits
+        self._tokens = self.tokens(now) - 1
+        self._updated = now
+
+
+class RateLimiter(object):
+    """
+    Limits how fast events are sent, globally and per service key.
+
+    A send takes a token from the global bucket and from its service key's bucket.
+    When either is empty the caller waits for the token, or with ``block=False``
+    a :class:`RateLimitException <pagerduty_api.exceptions.RateLimitException>` is
+    raised. The limiter is thread-safe and can be shared between alerts.
+
+    A service key's bucket is forgotten once the key has been idle long enough
+    for it to refill, as a full bucket is no different from a new one.
+    """
+    def __init__(self, rate=None, capacity=None, per_key_rate=None, per_key_capacity=None, key_rates=None,
+                 block=True, max_wait=None, clock=time.monotonic):
+        """
+        :type rate: float
+        :param rate: Events a second across all service keys. Unlimited if None
+
+        :type capacity: float
+        :param capacity: The largest global burst. Defaults to ``rate``
+
+        :type per_key_rate: float
+        :param per_key_rate: Events a second for each service key. Unlimited if None
+
+        :type per_key_capacity: float
+        :param per_key_capacity: The largest burst for each service key. Defaults to ``per_key_rate``
+
+        :type key_rates: dict
+        :param key_rates: ``(rate, capacity)`` for specific service keys, overriding
+                ``per_key_rate`` and ``per_key_capacity``
+
+        :type block: bool
+        :param block: If False, raise instead of waiting for a token
+
+        :type max_wait: float
+        :param max_wait: The most seconds to wait for a token before raising. Waits
+                as long as needed if None
+
+        :type clock: callable
+        :param clock: Returns the current time in seconds
+        """
+        self.per_key_rate = per_key_rate
+        self.per_key_capacity = per_key_capacity or per_key_rate
+        self.key_rates = dict(key_rates or {})
+        self.block = block
+        self.max_wait = max_wait
+        self.clock = clock
+
+        self.throttled = 0
+        self.rejected = 0
+        self.waited = 0.0
+
+        self._global = TokenBucket(rate, capacity or rate, clock()) if rate else None
+        self._buckets = {}
+        self._sweep_at = MIN_SWEEP_SIZE
+        self._lock = threading.Lock()
+
+    def acquire(self, key=None):
+        """
+        Takes a token for a send, waiting for one if needed
+
+        :type key: str
+        :param key: The service key of the event
+
+        :raises: A :class:`RateLimitException <pagerduty_api.exceptions.RateLimitException>`
+                if a token isn't available and the limiter won't wait for it
+
+        :rtype: float
+        :return: Seconds waited
+        """
+        wait = self._reserve(key)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, key=None):
+        """
+        Takes a token for a send without blocking the event loop. See :meth:`acquire`
+        """
+        wait = self._reserve(key)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def tokens(self, key=None):
+        """
+        :type key: str
+        :param key: A service key, or None for the global bucket
+
+        :rtype: float
+        :return: Tokens available now, or None if that bucket is unlimited
+        """
+        with self._lock:
+            now = self.clock()
+            bucket = self._bucket(key, now) if key else self._global
+            return None if bucket is None else bucket.tokens(now)
+
+    def wait_time(self, key=None):
+        """
+        :type key: str
+        :param key: The service key of an event
+
+        :rtype: float
+        :return: Seconds until an event for the key could be sent
+        """
+        with self._lock:
+            now = self.clock()
+            return max([b.wait_time(now) for b in self._buckets_for(key, now)] or [0.0])
+
+    def _reserve(self, key):
+        with self._lock:
+            now = self.clock()
+            buckets = self._buckets_for(key, now)
+            wait = max([b.wait_time(now) for b in buckets] or [0.0])
+
+            if wait and (not self.block or (self.max_wait is not None and wait > self.max_wait)):
+                self.rejected += 1
+                raise RateLimitException(
+                    'Rate limit exceeded for {0}, next token in {1:.2f}s'.format(key or 'all keys', wait), wait=wait
+                )
+
+            for bucket in buckets:
+                bucket.take(now)
+            if wait:
+                self.throttled += 1
+                self.waited += wait
+            return wait
+
+    def _buckets_for(self, key, now):
+        buckets = [self._global] if self._global else []
+        bucket = self._bucket(key, now) if key else None
+        if bucket is not None:
+            buckets.append(bucket)
+        return buckets
+
+    def _bucket(self, key, now):
+        if key not in self._buckets:
+            if len(self._buckets) >= self._sweep_at:
+                self._sweep(now)
+            rate, capacity = self.key_rates.get(key, (self.per_key_rate, self.per_key_capacity))
+            self._buckets[key] = TokenBucket(rate, capacity or rate, now) if rate else None
+        return self._buckets[key]
+
+    def _sweep(self, now):
+        for key in [key for key, bucket in self._buckets.items() if bucket is None or bucket.full(now)]:
+            del self._buckets[key]
+        self._sweep_at = max(MIN_SWEEP_SIZE, 2 * len(self._buckets))
@@ -0,0 +1,556 @@
+"""
+Resources for PagerDuty's `REST API v2`_.
+
+.. _REST API v2: https://developer.pagerduty.com/api-reference/
+"""
+import calendar
+import datetime
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+
+from .base import DEFAULT_POOL_MAXSIZE, AuthorizedResource
+from .batch import send_concurrently
+from .cache import NOT_MODIFIED
+from .exceptions import ConfigurationException
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 100
+
+# The most incidents PagerDuty accepts in one bulk update or merge
+MAX_BULK_INCIDENTS = 250
+
+OPEN_STATUSES = ('triggered', 'acknowledged')
+
+
+def to_timestamp(value):
+    """
+    Converts a PagerDuty ISO 8601 time, a datetime or a number of seconds since
+    the epoch to seconds since the epoch. Naive times are taken to be UTC.
+
+    :rtype: float
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        return calendar.timegm(value.timetuple()) + value.microsecond / 1e6
+    return value.timestamp()
+
+
+def to_isoformat(timestamp):
+    """
+    Formats seconds since the epoch as a UTC time for PagerDuty's ``since`` and ``until``
+
+    :rtype: str
+    """
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+class BulkResult(object):
+    """
+    The outcome of a bulk operation on incidents. Incidents are sent in chunks,
+    and a chunk that fails marks every incident in it as failed.
+    """
+    __slots__ = ('succeeded', 'failed', 'incidents')
+
+    def __init__(self):
+        #: The IDs of the incidents that were changed
+        self.succeeded = []
+        #: The exception raised for each incident ID that wasn't changed
+        self.failed = {}
+        #: The incidents PagerDuty returned, after the change
+        self.incidents = []
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def add(self, result, collection):
+        """
+        Adds the :class:`EventResult <pagerduty_api.batch.EventResult>` of sending one chunk
+        """
+        if not result.ok:
+            self.failed.update((id, result.exception) for id in result.event)
+            return
+        self.succeeded.extend(result.event)
+        if collection in result.response:
+            self.incidents.extend(result.response[collection])
+        elif 'incident' in result.response:
+            self.incidents.append(result.response['incident'])
+
+    def __repr__(self):
+        return '<BulkResult {0} succeeded, {1} failed>'.format(len(self.succeeded), len(self.failed))
+
+
+class RestResource(AuthorizedResource):
+    """
+    A base class for REST API collections, such as incidents or services.
+
+    Subclasses set ``PATH``, the ``COLLECTION`` key that holds a page of
+    results and the ``SINGULAR`` key that holds one result.
+    """
+    PATH = None
+    COLLECTION = None
+    SINGULAR = None
+    CURSOR_PAGINATION = False
+
+    def __init__(self, api_key=None, rate_limiter=None, cache=None, *args, **kwargs):
+        """
+        :type rate_limiter: :class:`RateLimiter <pagerduty_api.ratelimit.RateLimiter>`
+        :param rate_limiter: If given, every page request takes a token from it,
+                keyed by the API key. Useful to keep parallel listing within
+                PagerDuty's REST rate limits.
+
+        :type cache: :class:`ResponseCache <pagerduty_api.cache.ResponseCache>`
+        :param cache: If given, responses are read through it, under this
+                resource's ``PATH``
+
+        Any other arguments are passed on to :class:`AuthorizedResource <pagerduty_api.base.AuthorizedResource>`
+        """
+        super(RestResource, self).__init__(api_key, *args, **kwargs)
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+
+    def get(self, id, **params):
+        """
+        Gets one object by its ID
+
+        :type id: str
+        :param id: The ID of the object
+
+        Any other keyword arguments are sent as query parameters, such as
+        ``include[]``.
+
+        :rtype: dict
+        """
+        response = self._fetch(self._url('{0}/{1}'.format(self.PATH, id)), params)
+        return response[self.SINGULAR] if self.SINGULAR else response
+
+    def list(self, page_size=DEFAULT_PAGE_SIZE, prefetch=True, workers=None, ordered=True, **params):
+        """
+        Lists objects, fetching pages lazily as they are iterated.
+
+        Only one page is held at a time (two with ``prefetch``), so memory stays
+        flat however many objects the query matches. Query parameters are passed
+        as keyword arguments; list parameters take their PagerDuty name, such as
+        ``**{'statuses[]': ['triggered', 'acknowledged']}``.
+
+        With ``workers``, the first page asks PagerDuty for the total count and the
+        remaining pages are fetched over a pool of that many threads, with at most
+        twice that many pages in memory. Collections that use cursor pagination
+        can't be split up, so they are always listed serially. Offsets are fixed up
+        front, so objects created or deleted while listing may be missed or repeated.
+
+        :type page_size: int
+        :param page_size: The number of objects fetched per request
+
+        :type prefetch: bool
+        :param prefetch: If True, the next page is fetched on a background
+                thread while the current one is consumed
+
+        :type workers: int
+        :param workers: If given, the number of pages fetched in parallel
+
+        :type ordered: bool
+        :param ordered: If False, parallel pages are yielded as they arrive
+                rather than in order
+
+        :rtype: generator of dict
+        """
+        return self._list(self.PATH, self.COLLECTION, params, page_size, prefetch, workers, ordered)
+
+    def _list(self, path, collection, params, page_size, prefetch, workers, ordered):
+        url = self._url(path)
+        params = dict(params, limit=page_size)
+        if self.CURSOR_PAGINATION:
+            return self._paginate(url, collection, params, prefetch)
+
+        params.setdefault('offset', 0)
+        if workers:
+            return self._paginate_parallel(url, collection, params, workers, ordered)
+        return self._paginate(url, collection, params, prefetch)
+
+    def invalidate(self, id=None):
+        """
+        Forgets this resource's cached responses, such as after changing one
+
+        :type id: str
+        :param id: Only forget the cached :meth:`get` of this object. If None,
+                every cached response of the resource is forgotten
+
+        :rtype: int
+        :return: The number of responses forgotten
+        """
+        if self.cache is None:
+            return 0
+        if id is None:
+            return self.cache.invalidate(self.PATH)
+        url = self._url('{0}/{1}'.format(self.PATH, id))
+        return self.cache.invalidate(self.PATH, lambda key: key[0] == url)
+
+    def _fetch(self, url, params):
+        if self.cache is not None:
+            key = (url, tuple(sorted(
+                (name, tuple(value) if isinstance(value, list) else value) for name, value in params.items()
+            )))
+            return self.cache.get(self.PATH, key, lambda etag: self._fetch_etag(url, params, etag))
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.api_key)
+        return self._get(url=url, params=params, headers=self.headers)
+
+    def _fetch_etag(self, url, params, etag):
+        """
+        Fetches a response for the cache, revalidating the cached one if it has an ETag
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.api_key)
+        headers = self.headers
+        if etag:
+            headers = dict(headers, **{'If-None-Match': etag})
+        response = self._response('get', url=url, params=params, headers=headers)
+        if response.status_code == 304:
+            return NOT_MODIFIED, etag
+        return response.json(), response.headers.get('ETag')
+
+    def _paginate(self, url, collection, params, prefetch, page=None):
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        future = None
+        try:
+            if page is None:
+                page = self._fetch(url, params)
+            while page is not None:
+                next_params = self._next_page_params(params, page)
+                if next_params is not None and executor is not None:
+                    future = executor.submit(self._fetch, url, next_params)
+
+                for item in page.get(collection, []):
+                    yield item
+
+                if next_params is None:
+                    page = None
+                elif future is not None:
+                    page, future = future.result(), None
+                else:
+                    page = self._fetch(url, next_params)
+                params = next_params
+        finally:
+            if future is not None:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _paginate_parallel(self, url, collection, params, workers, ordered):
+        first = self._fetch(url, dict(params, total='true'))
+        total = first.get('total')
+        if total is None:
+            # Not every collection can count itself, so carry on serially
+            for item in self._paginate(url, collection, params, True, page=first):
+                yield item
+            return
+
+        for item in first.get(collection, []):
+            yield item
+        if not first.get('more'):
+            return
+
+        offsets = range(params['offset'] + params['limit'], total, params['limit'])
+        for page in self._fetch_parallel(url, params, offsets, workers, ordered):
+            for item in page.get(collection, []):
+                yield item
+
+    def _fetch_parallel(self, url, params, offsets, workers, ordered):
+        offsets = iter(offsets)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
+        try:
+            while True:
+                for offset in islice(offsets, workers * 2 - len(pending)):
+                    pending.append(executor.submit(self._fetch, url, dict(params, offset=offset)))
+                if not pending:
+                    return
+
+                if ordered:
+                    future = pending.popleft()
+                else:
+                    future = next(as_completed(pending))
+                    pending.remove(future)
+                yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _next_page_params(self, params, page):
+        if self.CURSOR_PAGINATION:
+            if not page.get('next_cursor'):
+                return None
+            return dict(params, cursor=page['next_cursor'])
+
+        if not page.get('more'):
+            return None
+        return dict(params, offset=params['offset'] + params['limit'])
+
+
+class Incidents(RestResource):
+    """
+    Incidents. See the `incidents API docs`_
+
+    .. _incidents API docs: https://developer.pagerduty.com/api-reference/9d0b4b12e36f9-list-incidents
+    """
+    PATH = 'incidents'
+    COLLECTION = 'incidents'
+    SINGULAR = 'incident'
+
+    def __init__(self, api_key=None, rate_limiter=None, cache=None, from_email=None, *args, **kwargs):
+        """
+        :type from_email: str
+        :param from_email: The email address of the PagerDuty user that changes are
+                made as. Only needed by the bulk operations, which raise a
+                :class:`ConfigurationException <pagerduty_api.exceptions.ConfigurationException>`
+                without it.
+
+        Any other arguments are passed on to :class:`RestResource`
+        """
+        super(Incidents, self).__init__(api_key, rate_limiter, cache, *args, **kwargs)
+        self.from_email = from_email
+
+    def log_entries(self, id, page_size=DEFAULT_PAGE_SIZE, prefetch=True, workers=None, ordered=True, **params):
+        """
+        Lists the log entries of an incident lazily. See :meth:`RestResource.list`
+
+        :type id: str
+        :param id: The ID of the incident
+
+        :rtype: generator of dict
+        """
+        path = 'incidents/{0}/log_entries'.format(id)
+        return self._list(path, 'log_entries', params, page_size, prefetch, workers, ordered)
+
+    def select(self, service_ids=None, statuses=OPEN_STATUSES, older_than=None, **params):
+        """
+        Lists the IDs of the incidents matching a query, for the bulk operations.
+
+        Unless ``since``, ``until``, ``date_range`` or ``older_than`` is given,
+        incidents of any age are listed, rather than PagerDuty's default of the
+        last month.
+
+        :type service_ids: list of str
+        :param service_ids: If given, only incidents of these services
+
+        :type statuses: list of str
+        :param statuses: Only incidents with these statuses. Defaults to open ones
+
+        :type older_than: float
+        :param older_than: If given, only incidents created at least this many
+                seconds ago. It is sent as ``until``, so pass ``since`` as well to
+                choose how far back PagerDuty looks
+
+        Any other keyword arguments are sent as query parameters, such as
+        ``**{'urgencies[]': ['low']}``.
+
+        :rtype: list of str
+        """
+        if service_ids:
+            params['service_ids[]'] = list(service_ids)
+        if statuses:
+            params['statuses[]'] = list(statuses)
+        if older_than is not None:
+            params['until'] = to_isoformat(time.time() - older_than)
+        if not set(params) & {'since', 'until', 'date_range'}:
+            params['date_range'] = 'all'
+        return [incident['id'] for incident in self.list(**params)]
+
+    def update_many(self, changes, ids=None, chunk_size=MAX_BULK_INCIDENTS, max_workers=DEFAULT_POOL_MAXSIZE,
+                    **query):
+        """
+        Makes the same change to many incidents. They are sent in chunks of up to
+        ``chunk_size``, the most PagerDuty accepts in one request, and the chunks
+        are sent concurrently. A failing chunk doesn't stop the others; check the
+        result's ``failed`` instead.
+
+        :type changes: dict
+        :param changes: The fields to change on every incident, such as
+                ``{'urgency': 'low'}``
+
+        :type ids: list of str
+        :param ids: The IDs of the incidents to change. If not given, the incidents
+                are chosen by the other keyword arguments, which are passed to
+                :meth:`select`
+
+        :type chunk_size: int
+        :param chunk_size: The most incidents changed per request
+
+        :type max_workers: int
+        :param max_workers: The most requests in flight at once
+
+        :rtype: :class:`BulkResult`
+        """
+        self._check_from_email()
+
+        def send(chunk):
+            body = {'incidents': [dict(changes, id=id, type='incident_reference') for id in chunk]}
+            return self._write('put', self.PATH, body)
+
+        return self._bulk(send, self._select_ids(ids, query), chunk_size, max_workers)
+
+    def acknowledge_many(self, ids=None, **kwargs):
+        """
+        Acknowledges many incidents. See :meth:`update_many`
+
+        :rtype: :class:`BulkResult`
+        """
+        return self.update_many({'status': 'acknowledged'}, ids, **kwargs)
+
+    def resolve_many(self, ids=None, resolution=None, **kwargs):
+        """
+        Resolves many incidents. See :meth:`update_many`
+
+        :type resolution: str
+        :param resolution: If given, a note added to every resolved incident
+
+        :rtype: :class:`BulkResult`
+        """
+        changes = {'status': 'resolved'}
+        if resolution is not None:
+            changes['resolution'] = resolution
+        return self.update_many(changes, ids, **kwargs)
+
+    def reassign_many(self, assignee_ids=None, escalation_policy_id=None, ids=None, **kwargs):
+        """
+        Reassigns many incidents to users or to an escalation policy. See :meth:`update_many`
+
+        :type assignee_ids: list of str
+        :param assignee_ids: The IDs of the users to assign
+
+        :type escalation_policy_id: str
+        :param escalation_policy_id: The ID of the escalation policy to assign
+
+        :rtype: :class:`BulkResult`
+        :raises: ValueError unless exactly one of ``assignee_ids`` and
+            ``escalation_policy_id`` is given
+        """
+        if bool(assignee_ids) == bool(escalation_policy_id):
+            raise ValueError('Pass either assignee_ids or escalation_policy_id')
+        if assignee_ids:
+            changes = {'assignments': [
+                {'assignee': {'id': id, 'type': 'user_reference'}} for id in assignee_ids
+            ]}
+        else:
+            changes = {'escalation_policy': {'id': escalation_policy_id, 'type': 'escalation_policy_reference'}}
+        return self.update_many(changes, ids, **kwargs)
+
+    def snooze_many(self, duration, ids=None, max_workers=DEFAULT_POOL_MAXSIZE, **query):
+        """
+        Snoozes many acknowledged incidents. PagerDuty snoozes one incident per
+        request, so the requests are sent concurrently. See :meth:`update_many`
+
+        :type duration: int
+        :param duration: The number of seconds to snooze for
+
+        :rtype: :class:`BulkResult`
+        """
+        self._check_from_email()
+        if ids is None:
+            query.setdefault('statuses', ['acknowledged'])
+
+        def send(chunk):
+            return self._write('post', '{0}/{1}/snooze'.format(self.PATH, chunk[0]), {'duration': duration})
+
+        return self._bulk(send, self._select_ids(ids, query), 1, max_workers)
+
+    def merge(self, target_id, ids=None, chunk_size=MAX_BULK_INCIDENTS, **query):
+        """
+        Merges many incidents into one. The chunks are sent one after another,
+        since they all change the target. See :meth:`update_many`
+
+        :type target_id: str
+        :param target_id: The ID of the incident to merge the others into. It is
+                left out of the incidents to merge if they include it
+
+        :rtype: :class:`BulkResult`
+        """
+        self._check_from_email()
+
+        def send(chunk):
+            body = {'source_incidents': [{'id': id, 'type': 'incident_reference'} for id in chunk]}
+            return self._write('put', '{0}/{1}/merge'.format(self.PATH, target_id), body)
+
+        ids = [id for id in self._select_ids(ids, query) if id != target_id]
+        return self._bulk(send, ids, chunk_size, 1)
+
+    def _select_ids(self, ids, query):
+        if ids is None:
+            return self.select(**query)
+        if query:
+            raise ValueError('Pass either ids or a query, not both')
+        return list(ids)
+
+    def _check_from_email(self):
+        # Checked before selecting, so a misconfigured client doesn't list every incident first
+        if not self.from_email:
+            raise ConfigurationException('Bulk operations need the from_email of a PagerDuty user')
+
+    def _bulk(self, send, ids, chunk_size, max_workers):
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        result = BulkResult()
+        for sent in send_concurrently(send, chunks, max_workers=max_workers):
+            result.add(sent, self.COLLECTION)
+        if result.succeeded:
+            self.invalidate()
+        return result
+
+    def _write(self, method, path, body):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.api_key)
+        headers = dict(self.headers, From=self.from_email)
+        return self._request(method, url=self._url(path), data=body, headers=headers)
+
+
+class LogEntries(RestResource):
+    PATH = 'log_entries'
+    COLLECTION = 'log_entries'
+    SINGULAR = 'log_entry'
+
+
+class Services(RestResource):
+    PATH = 'services'
+    COLLECTION = 'services'
+    SINGULAR = 'service'
+
+
+class EscalationPolicies(RestResource):
+    PATH = 'escalation_policies'
+    COLLECTION = 'escalation_policies'
+    SINGULAR = 'escalation_policy'
+
+
+class Schedules(RestResource):
+    PATH = 'schedules'
+    COLLECTION = 'schedules'
+    SINGULAR = 'schedule'
+
+
+class Users(RestResource):
+    PATH = 'users'
+    COLLECTION = 'users'
+    SINGULAR = 'user'
+
+
+class OnCalls(RestResource):
+    PATH = 'oncalls'
+    COLLECTION = 'oncalls'
+
+
+class AuditRecords(RestResource):
+    """
+    The audit trail, which uses cursor pagination
+    """
+    PATH = 'audit/records'
+    COLLECTION = 'records'
+    CURSOR_PAGINATION = True
@@ -0,0 +1,115 @@
+import math
+import random
+import time
+
+
+class RetryPolicy(object):
+    """
+    Decides whether and when a failed request is sent again.
+
+    Waits use exponential backoff with full jitter: before attempt ``n + 1`` the
+    wait is a random time between 0 and ``min(backoff_cap, backoff_base * 2 ** (n - 1))``.
+    If the server sends a ``Retry-After`` header, that wait is used instead, up to
+    ``backoff_cap``.
+    """
+    def __init__(self, max_attempts=3, backoff_base=0.5, backoff_cap=30, retry_statuses=(429, 500, 502, 503, 504),
+                 respect_retry_after=True, deadline=None, random=random.random):
+        """
+        :type max_attempts: int
+        :param max_attempts: The most times a request is sent, including the first
+
+        :type backoff_base: float
+        :param backoff_base: Seconds of the largest wait before the first retry
+
+        :type backoff_cap: float
+        :param backoff_cap: Seconds of the largest wait before any retry, including
+                one asked for by ``Retry-After``
+
+        :type retry_statuses: tuple
+        :param retry_statuses: Response status codes that are retried. Connection
+                errors and timeouts are always retried
+
+        :type respect_retry_after: bool
+        :param respect_retry_after: If True, wait as long as a ``Retry-After``
+                header asks, up to ``backoff_cap``
+
+        :type deadline: float
+        :param deadline: The most seconds to spend on a request, including retries.
+                A retry that would start after the deadline isn't made
+
+        :type random: callable
+        :param random: Returns a random float in [0, 1)
+        """
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_statuses = frozenset(retry_statuses)
+        self.respect_retry_after = respect_retry_after
+        self.deadline = deadline
+        self.random = random
+
+    def is_retryable(self, status_code=None):
+        """
+        :type status_code: int
+        :param status_code: The status of the failed response, or None for a
+                connection error or timeout
+
+        :rtype: bool
+        """
+        return status_code is None or status_code in self.retry_statuses
+
+    def next_delay(self, attempt, elapsed, retry_after=None):
+        """
+        Returns the seconds to wait before retrying a failed attempt
+
+        :type attempt: int
+        :param attempt: The number of the attempt that failed, starting at 1
+
+        :type elapsed: float
+        :param elapsed: Seconds spent on the request so far
+
+        :type retry_after: str
+        :param retry_after: The ``Retry-After`` header of the failed response
+
+        :rtype: float
+        :return: The wait, or None if the request shouldn't be retried
+        """
+        if attempt >= self.max_attempts:
+            return None
+
+        delay = self.parse_retry_after(retry_after) if self.respect_retry_after else None
+        if delay is not None:
+            delay = min(delay, self.backoff_cap)
+        else:
+            delay = self.random() * min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1))
+
+        if self.deadline is not None and elapsed + delay >= self.deadline:
+            return None
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value):
+        """
+        Parses a ``Retry-After`` header given in seconds or as an HTTP date
+
+        :rtype: float
+        :return: The seconds to wait, or None if the header is missing or invalid
+        """
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            pass
+        else:
+            return max(seconds, 0) if math.isfinite(seconds) else None
+        # Only HTTP dates need email.utils, which is slow to import
+        import email.utils
+        try:
+            return max(email.utils.mktime_tz(email.utils.parsedate_tz(value)) - time.time(), 0)
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+
+# Sends every request once, which is what resources do unless given a policy
+NO_RETRY = RetryPolicy(max_attempts=1)
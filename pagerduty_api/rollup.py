@@ -0,0 +1,301 @@
+import collections
+import hashlib
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class _Group(object):
+    """
+    The recent triggers of a group, and its summary incident while rolled up
+    """
+    __slots__ = ('values', 'triggers', 'routing_key', 'summary_key', 'summary_sent_at', 'members', 'count', 'samples')
+
+    def __init__(self, values):
+        self.values = values
+        self.triggers = collections.deque()
+        self.routing_key = None
+        self.summary_key = None
+        self.summary_sent_at = None
+        self.members = set()
+        self.count = 0
+        self.samples = []
+
+
+class EventRollup(object):
+    """
+    Collapses alert storms into summary incidents.
+
+    Triggers are grouped by ``fields`` of their payload. Once a group has had
+    ``threshold`` triggers within ``window`` seconds, one summary incident is
+    triggered for it and further triggers in the group are rolled up into it
+    instead of being sent. The summary's details count them and list a sample
+    of their incident keys, and are refreshed at most once a window. Acknowledges
+    and resolves of rolled up incidents aren't sent, and the summary is resolved
+    once every incident rolled up into it has been resolved.
+
+    Events that aren't rolled up are sent through the resource as usual. The
+    rollup is thread-safe.
+
+        ::
+
+            rollup = EventRollup(alert, fields=('service_key', 'details.dependency'), threshold=10)
+            rollup.trigger(description='web01 cannot reach redis', incident_key='web01/redis',
+                           details={'dependency': 'redis'})
+    """
+    def __init__(self, resource, fields=None, description_prefix=None, key=None, window=60, threshold=10,
+                 max_samples=10, clock=time.monotonic):
+        """
+        :type resource: :class:`EventResource <pagerduty_api.events.EventResource>`
+        :param resource: The alert that builds and sends the events
+
+        :type fields: tuple
+        :param fields: The payload fields events are grouped by. ``details.<name>``
+                names a field of the event's details. Defaults to the routing key
+
+        :type description_prefix: int
+        :param description_prefix: If given, events are also grouped by this many
+                leading characters of their description (or summary)
+
+        :type key: callable
+        :param key: If given, called with a payload to return its group instead
+                of using ``fields`` and ``description_prefix``. Must be hashable
+
+        :type window: float
+        :param window: Seconds over which triggers are counted
+
+        :type threshold: int
+        :param threshold: The number of triggers in a window that starts a summary
+
+        :type max_samples: int
+        :param max_samples: The most incident keys listed in a summary's details
+
+        :type clock: callable
+        :param clock: Returns the current time in seconds
+        """
+        self.resource = resource
+        self.fields = tuple(fields or (resource.ROUTING_KEY_FIELD,))
+        self.description_prefix = description_prefix
+        self.key = key
+        self.window = window
+        self.threshold = threshold
+        self.max_samples = max_samples
+        self.clock = clock
+        self.rolled_up = 0
+        self.summaries = 0
+
+        # group key -> _Group, least recently triggered first
+        self._groups = collections.OrderedDict()
+        # (routing_key, incident_key) -> group key, for incidents rolled up into a summary
+        self._members = {}
+        self._lock = threading.Lock()
+
+    def trigger(self, **kwargs):
+        """
+        Builds and submits a trigger. Takes the keyword arguments of the resource's ``trigger``
+
+        :rtype: dict
+        """
+        return self.submit(self.resource.build_event('trigger', **kwargs))
+
+    def acknowledge(self, **kwargs):
+        """
+        Builds and submits an acknowledge. Takes the keyword arguments of the resource's ``acknowledge``
+
+        :rtype: dict
+        """
+        return self.submit(self.resource.build_event('acknowledge', **kwargs))
+
+    def resolve(self, **kwargs):
+        """
+        Builds and submits a resolve. Takes the keyword arguments of the resource's ``resolve``
+
+        :rtype: dict
+        """
+        return self.submit(self.resource.build_event('resolve', **kwargs))
+
+    def submit(self, data):
+        """
+        Sends an event payload, or rolls it up into its group's summary
+
+        :type data: dict
+        :param data: A payload, as built by the resource's ``build_event``
+
+        :rtype: dict
+        :return: The response of the API, or a response with a ``rolled_up``
+                status and the ``rollup_key`` of the summary incident
+        """
+        routing_key, incident_key, event_type = self.resource._identity(data)
+        if incident_key is None:
+            return self.resource._send(data)
+
+        with self._lock:
+            if event_type == 'trigger':
+                summary_key, summary = self._trigger(data, routing_key, incident_key)
+            else:
+                summary_key, summary = self._update(routing_key, incident_key, event_type)
+
+        if summary_key is None:
+            return self.resource._send(data)
+        if summary is not None:
+            try:
+                self.resource._send(summary)
+            except Exception:
+                with self._lock:
+                    self._summary_failed(summary_key, event_type, routing_key, incident_key)
+                raise
+            with self._lock:
+                self.summaries += 1
+                if event_type == 'resolve':
+                    self._summary_resolved(summary_key)
+            LOG.info('Sent PagerDuty rollup {0} for {1}'.format(self.resource._identity(summary)[2], summary_key))
+        return self._rolled_up_response(incident_key, summary_key)
+
+    def group_of(self, data):
+        """
+        :rtype: tuple
+        :return: The group key of a payload
+        """
+        if self.key is not None:
+            return self.key(data)
+
+        details = self.resource._details(data)
+        values = tuple(
+            details.get(field[len('details.'):]) if field.startswith('details.') else data.get(field)
+            for field in self.fields
+        )
+        if self.description_prefix:
+            values += ((self.resource._description(data) or '')[:self.description_prefix],)
+        return values
+
+    def _trigger(self, data, routing_key, incident_key):
+        """
+        Records a trigger, returning the key of the summary it is rolled up into
+        (None if it isn't), and a summary event to send if one is due
+        """
+        now = self.clock()
+        self._prune(now)
+        group_key = self.group_of(data)
+        group = self._groups.get(group_key)
+        if group is None:
+            group = self._groups[group_key] = _Group(group_key)
+        self._groups.move_to_end(group_key)
+
+        group.triggers.append(now)
+        while group.triggers and group.triggers[0] <= now - self.window:
+            group.triggers.popleft()
+
+        if (routing_key, incident_key) not in self._members:
+            if group.summary_key is None and len(group.triggers) < self.threshold:
+                return None, None
+            self._add_member(group, group_key, routing_key, incident_key)
+
+        if group.summary_sent_at is not None and now - group.summary_sent_at < self.window:
+            return group.summary_key, None
+        group.summary_sent_at = now
+        return group.summary_key, self.resource._summary_data(
+            group.routing_key, group.summary_key, self._summary_description(group, data), self._summary_details(group)
+        )
+
+    def _add_member(self, group, group_key, routing_key, incident_key):
+        if group.summary_key is None:
+            group.summary_key = self._summary_key(group)
+            group.routing_key = routing_key
+        group.members.add(incident_key)
+        group.count += 1
+        if len(group.samples) < self.max_samples:
+            group.samples.append(incident_key)
+        self._members[(routing_key, incident_key)] = group_key
+        self.rolled_up += 1
+
+    def _summary_failed(self, summary_key, event_type, routing_key, incident_key):
+        for group_key, group in self._groups.items():
+            if group.summary_key != summary_key:
+                continue
+            if event_type == 'resolve':
+                # Keeps the incident rolled up, so resolving it again resolves the summary
+                group.members.add(incident_key)
+                self._members[(routing_key, incident_key)] = group_key
+            else:
+                # Lets the next trigger in the group send the summary again, so the storm still pages
+                group.summary_sent_at = None
+
+    def _summary_resolved(self, summary_key):
+        for group in self._groups.values():
+            if group.summary_key != summary_key:
+                continue
+            if group.members:
+                # Triggers rolled up while the resolve was being sent open the summary again
+                group.summary_sent_at = None
+            else:
+                group.summary_key = group.summary_sent_at = group.routing_key = None
+                group.count = 0
+                group.samples = []
+
+    def _update(self, routing_key, incident_key, event_type):
+        """
+        Records an acknowledge or resolve, returning the key of the summary it is
+        rolled up into (None if it isn't), and the summary's resolve if it was the
+        last open member
+        """
+        group_key = self._members.get((routing_key, incident_key))
+        if group_key is None:
+            return None, None
+
+        group = self._groups[group_key]
+        summary_key = group.summary_key
+        self.rolled_up += 1
+        if event_type != 'resolve':
+            return summary_key, None
+
+        del self._members[(routing_key, incident_key)]
+        group.members.discard(incident_key)
+        if group.members:
+            return summary_key, None
+
+        # The group keeps its summary until the resolve has been sent
+        return summary_key, self.resource.build_event('resolve', **{
+            self.resource.ROUTING_KEY_FIELD: group.routing_key, self.resource.INCIDENT_KEY_FIELD: summary_key,
+        })
+
+    def _prune(self, now):
+        # Forgets the least recently triggered groups once they are quiet, unless their summary is open
+        quiet = []
+        for group_key, group in self._groups.items():
+            if group.triggers[-1] > now - self.window:
+                break
+            if group.summary_key is None:
+                quiet.append(group_key)
+        for group_key in quiet:
+            del self._groups[group_key]
+
+    def _summary_key(self, group):
+        return 'rollup/{0}'.format(hashlib.md5(repr(group.values).encode('utf-8')).hexdigest())
+
+    def _summary_description(self, group, data):
+        description = self.resource._description(data) or ''
+        if self.description_prefix:
+            description = description[:self.description_prefix]
+        return '{0} related incidents: {1}'.format(group.count, description)
+
+    def _summary_details(self, group):
+        values = group.values if isinstance(group.values, tuple) else (group.values,)
+        names = self.fields + (('description',) if self.description_prefix else ())
+        return {
+            'rollup': {
+                'group': dict(zip(names, values)) if self.key is None else repr(group.values),
+                'count': group.count,
+                'open': len(group.members),
+                'sample_incident_keys': list(group.samples),
+            },
+        }
+
+    def _rolled_up_response(self, incident_key, summary_key):
+        return {
+            'status': 'rolled_up',
+            'message': 'Event rolled up into a summary incident',
+            self.resource.INCIDENT_KEY_FIELD: incident_key,
+            'rollup_key': summary_key,
+        }
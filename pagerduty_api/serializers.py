@@ -0,0 +1,111 @@
+import json
+import threading
+
+_default_serializer = None
+_default_serializer_lock = threading.Lock()
+
+
+class Fragment(object):
+    """
+    Fields encoded once and reused for every payload that contains them
+    """
+    __slots__ = ('fields', 'encoded')
+
+    def __init__(self, fields, encoded):
+        self.fields = fields
+        self.encoded = encoded
+
+    def matches(self, data):
+        return all(key in data and data[key] == value for key, value in self.fields.items())
+
+
+class JSONSerializer(object):
+    """
+    Encodes payloads to compact JSON bytes with the standard library
+    """
+    def __init__(self, sort_keys=False, skip_none=True):
+        """
+        :type sort_keys: bool
+        :param sort_keys: If True, keys are written in sorted order
+
+        :type skip_none: bool
+        :param skip_none: If True, top level fields that are None are left out
+        """
+        self.sort_keys = sort_keys
+        self.skip_none = skip_none
+
+    def fragment(self, **fields):
+        """
+        Pre-encodes fields that many payloads share, to be passed to :meth:`dumps`
+
+        :rtype: :class:`Fragment`
+        """
+        return Fragment(fields, self._encode(fields)[1:-1])
+
+    def dumps(self, data, fragment=None):
+        """
+        :type data: dict
+        :param data: The payload
+
+        :type fragment: :class:`Fragment`
+        :param fragment: Pre-encoded fields of the payload. Ignored if the payload's
+                values differ, or if keys are sorted
+
+        :rtype: bytes
+        """
+        if fragment is not None and (self.sort_keys or not fragment.matches(data)):
+            fragment = None
+
+        if self.skip_none or fragment is not None:
+            skip = fragment.fields if fragment is not None else ()
+            data = dict(
+                (key, value) for key, value in data.items()
+                if key not in skip and (value is not None or not self.skip_none)
+            )
+
+        body = self._encode(data)
+        if fragment is None:
+            return body
+        if body == b'{}':
+            return b'{' + fragment.encoded + b'}'
+        return b'{' + fragment.encoded + b',' + body[1:]
+
+    def _encode(self, data):
+        return json.dumps(data, sort_keys=self.sort_keys, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonSerializer(JSONSerializer):
+    """
+    Encodes payloads with `orjson`_, which is several times faster than the
+    standard library. Needs ``pip install orjson``
+
+    .. _orjson: https://github.com/ijl/orjson
+    """
+    def __init__(self, *args, **kwargs):
+        import orjson
+
+        super(OrjsonSerializer, self).__init__(*args, **kwargs)
+        self._dumps = orjson.dumps
+        # Details may use numbers as keys, which the standard library turns into strings too
+        self._option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            self._option |= orjson.OPT_SORT_KEYS
+
+    def _encode(self, data):
+        return self._dumps(data, option=self._option)
+
+
+def get_default_serializer():
+    """
+    Returns the serializer used by resources that weren't given one: an
+    :class:`OrjsonSerializer` if orjson is installed, otherwise a :class:`JSONSerializer`
+    """
+    global _default_serializer
+    if _default_serializer is None:
+        with _default_serializer_lock:
+            if _default_serializer is None:
+                try:
+                    _default_serializer = OrjsonSerializer()
+                except ImportError:
+                    _default_serializer = JSONSerializer()
+    return _default_serializer
@@ -0,0 +1,272 @@
+import collections
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from .base import DEFAULT_POOL_MAXSIZE
+from .batch import send_concurrently
+
+LOG = logging.getLogger(__name__)
+
+SEGMENT_RE = re.compile(r'^segment-(\d{10})\.log$')
+
+
+class FsyncPolicies(object):
+    ALWAYS = 'always'
+    INTERVAL = 'interval'
+    NEVER = 'never'
+
+
+class EventSpool(object):
+    """
+    A durable, append-only spool of events that couldn't be sent.
+
+    Events are written as JSON lines to numbered segment files in ``directory``,
+    each with the key of the incident it belongs to.
+    A new segment is started once the current one reaches ``segment_size`` bytes.
+    :meth:`replay` sends spooled events in the order they were written. The spool
+    is thread-safe, and survives restarts: spooled events are picked up again when
+    a spool is opened on the same directory.
+    """
+    def __init__(self, directory, fsync=FsyncPolicies.INTERVAL, fsync_interval=1.0, segment_size=4 * 1024 * 1024,
+                 max_size=256 * 1024 * 1024):
+        """
+        :type directory: str
+        :param directory: Where segments are kept. Created if it doesn't exist
+
+        :type fsync: str
+        :param fsync: One of the :class:`FsyncPolicies`. When writes are forced to
+                disk: after every event, at most every ``fsync_interval`` seconds,
+                or whenever the operating system chooses
+
+        :type fsync_interval: float
+        :param fsync_interval: Seconds between syncs with the ``interval`` policy
+
+        :type segment_size: int
+        :param segment_size: Bytes written to a segment before starting a new one
+
+        :type max_size: int
+        :param max_size: The most bytes spooled. Events that don't fit are refused
+        """
+        if fsync not in (FsyncPolicies.ALWAYS, FsyncPolicies.INTERVAL, FsyncPolicies.NEVER):
+            raise ValueError('Unknown fsync policy {0}'.format(fsync))
+
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segment_size = segment_size
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._file = None
+        self._file_size = 0
+        self._last_sync = 0
+        self._size = 0
+        self._sequence = 0
+        self._pending = collections.Counter()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for path in self._segments():
+            self._size += os.path.getsize(path)
+            for key, data in self._read(path):
+                self._pending[key] += 1
+            self._sequence = int(SEGMENT_RE.match(os.path.basename(path)).group(1))
+
+    def __len__(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    @property
+    def size(self):
+        """
+        The bytes spooled
+        """
+        return self._size
+
+    def append(self, data, key):
+        """
+        Spools an event payload
+
+        :type data: dict
+        :param data: The event payload
+
+        :type key: tuple
+        :param key: The ``(routing key, incident key)`` of the event. Events with
+                the same key are replayed in order
+
+        :rtype: bool
+        :return: False if the spool is full and the event wasn't spooled
+        """
+        key = tuple(key)
+        line = self._line(key, data)
+
+        with self._lock:
+            if self.max_size is not None and self._size + len(line) > self.max_size:
+                LOG.error('PagerDuty spool {0} is full'.format(self.directory))
+                return False
+
+            if self._file is None or self._file_size >= self.segment_size:
+                self._close_segment()
+                self._sequence += 1
+                self._file = open(self._segment_path(self._sequence), 'ab')
+                self._file_size = 0
+
+            self._file.write(line)
+            self._file_size += len(line)
+            self._size += len(line)
+            self._pending[key] += 1
+            self._sync()
+        return True
+
+    def has_pending(self, key):
+        """
+        :type key: tuple
+        :param key: The ``(routing key, incident key)`` of an event
+
+        :rtype: bool
+        :return: True if events for the incident are waiting in the spool, so the
+                event must be spooled behind them
+        """
+        with self._lock:
+            return self._pending[tuple(key)] > 0
+
+    def replay(self, send, batch_size=100, max_workers=DEFAULT_POOL_MAXSIZE, is_retryable=lambda e: True):
+        """
+        Sends spooled events in order, removing them from the spool as they are sent.
+
+        Events are sent in batches of up to ``batch_size``. A batch never holds two
+        events for the same incident, so events for an incident are delivered in
+        the order they were spooled, and a resolve is never sent before its trigger.
+        The replay stops at the first event that fails with a retryable error,
+        leaving it and every later event in the spool.
+
+        :type send: callable
+        :param send: Sends one event payload
+
+        :type batch_size: int
+        :param batch_size: The most events sent at once
+
+        :type max_workers: int
+        :param max_workers: The most events in flight at once
+
+        :type is_retryable: callable
+        :param is_retryable: Called with the exception of a failed event. If it
+                returns False, the event can never be sent, so it is logged and dropped
+
+        :rtype: int
+        :return: The number of events sent
+        """
+        with self._replay_lock:
+            with self._lock:
+                # Later events go to a new segment while this replay reads the old ones
+                self._close_segment()
+                segments = self._segments()
+
+            sent = 0
+            stopped = False
+            for path in segments:
+                if stopped:
+                    break
+                delivered, kept, stopped = self._replay_segment(
+                    list(self._read(path)), send, batch_size, max_workers, is_retryable
+                )
+                sent += delivered
+                self._rewrite(path, kept)
+            return sent
+
+    def close(self):
+        """
+        Forces spooled events to disk and closes the current segment
+        """
+        with self._lock:
+            self._close_segment()
+
+    def _replay_segment(self, events, send, batch_size, max_workers, is_retryable):
+        sent = 0
+        while events:
+            batch, keys = [], set()
+            for key, data in events:
+                if len(batch) >= batch_size or key in keys:
+                    break
+                batch.append((key, data))
+                keys.add(key)
+
+            failed = []
+            for (key, data), result in zip(batch, send_concurrently(send, [data for key, data in batch], max_workers)):
+                if result.ok:
+                    sent += 1
+                elif is_retryable(result.exception):
+                    failed.append((key, data))
+                    continue
+                else:
+                    LOG.error('Dropped spooled PagerDuty event: {0}'.format(result.exception))
+                with self._lock:
+                    self._pending[key] -= 1
+                    # Incident keys are unbounded, so forget the ones with nothing spooled
+                    if not self._pending[key]:
+                        del self._pending[key]
+
+            # A batch is always the front of the segment
+            events = failed + events[len(batch):]
+            if failed:
+                return sent, events, True
+        return sent, events, False
+
+    def _rewrite(self, path, events):
+        old_size = os.path.getsize(path)
+        if events:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                for key, data in events:
+                    f.write(self._line(key, data))
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp_path, path)
+        else:
+            os.remove(path)
+
+        with self._lock:
+            self._size += (os.path.getsize(path) if events else 0) - old_size
+
+    def _sync(self):
+        if self.fsync == FsyncPolicies.NEVER:
+            self._file.flush()
+            return
+        now = time.time()
+        if self.fsync == FsyncPolicies.ALWAYS or now - self._last_sync >= self.fsync_interval:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _segment_path(self, sequence):
+        return os.path.join(self.directory, 'segment-{0:010d}.log'.format(sequence))
+
+    def _segments(self):
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory) if SEGMENT_RE.match(name)
+        )
+
+    def _line(self, key, data):
+        return (json.dumps({'key': key, 'data': data}, separators=(',', ':')) + '\n').encode('utf-8')
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                    yield tuple(record['key']), record['data']
+                except (ValueError, KeyError, TypeError):
+                    # A torn write from a crash
+                    LOG.warning('Skipped a corrupt line in PagerDuty spool segment {0}'.format(path))
@@ -0,0 +1,374 @@
+"""
+Keeps a local SQLite copy of incidents and their log entries, so reports and
+dashboards can query them without calling the REST API.
+"""
+import json
+import logging
+import sqlite3
+import threading
+
+from .rest import DEFAULT_PAGE_SIZE, Incidents, LogEntries, to_isoformat, to_timestamp
+
+LOG = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+HIGH_WATER_MARK = 'log_entries_high_water_mark'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id TEXT PRIMARY KEY,
+    incident_number INTEGER,
+    incident_key TEXT,
+    service_id TEXT,
+    status TEXT,
+    urgency TEXT,
+    title TEXT,
+    created_at REAL,
+    resolved_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS incidents_service ON incidents (service_id, status);
+CREATE INDEX IF NOT EXISTS incidents_status ON incidents (status);
+CREATE INDEX IF NOT EXISTS incidents_created ON incidents (created_at);
+CREATE INDEX IF NOT EXISTS incidents_resolved ON incidents (resolved_at);
+CREATE INDEX IF NOT EXISTS incidents_key ON incidents (incident_key);
+
+CREATE TABLE IF NOT EXISTS log_entries (
+    id TEXT PRIMARY KEY,
+    incident_id TEXT,
+    type TEXT,
+    created_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS log_entries_incident ON log_entries (incident_id, created_at);
+CREATE INDEX IF NOT EXISTS log_entries_created ON log_entries (created_at);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns that incidents can be counted by
+GROUP_COLUMNS = ('service_id', 'status', 'urgency', 'incident_key')
+
+
+def _reference_id(value):
+    return value.get('id') if isinstance(value, dict) else None
+
+
+class IncidentStore(object):
+    """
+    A SQLite store of incidents and log entries, indexed by service, status,
+    created and resolved time and incident key.
+
+    Objects are kept as PagerDuty returns them, and written with upserts, so
+    storing the same object twice is harmless. The store is thread-safe: a sync
+    can write to it while dashboards read from it.
+    """
+    def __init__(self, path):
+        """
+        :type path: str
+        :param path: The SQLite database file, created if it doesn't exist.
+                ``':memory:'`` keeps the store in memory
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            if path != ':memory:':
+                self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.executescript(SCHEMA)
+            self._connection.execute(
+                'INSERT OR IGNORE INTO sync_state (name, value) VALUES (?, ?)', ('schema_version', str(SCHEMA_VERSION))
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def upsert_incidents(self, incidents):
+        """
+        Stores incidents, replacing any stored with the same ID
+
+        :type incidents: list of dict
+        :param incidents: Incidents from the REST API
+
+        :rtype: int
+        :return: The number of incidents stored
+        """
+        rows = [
+            (
+                incident['id'],
+                incident.get('incident_number'),
+                incident.get('incident_key'),
+                _reference_id(incident.get('service')),
+                incident.get('status'),
+                incident.get('urgency'),
+                incident.get('title'),
+                to_timestamp(incident.get('created_at')),
+                to_timestamp(self._resolved_at(incident)),
+                json.dumps(incident),
+            )
+            for incident in incidents
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO incidents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def upsert_log_entries(self, log_entries):
+        """
+        Stores log entries, replacing any stored with the same ID
+
+        :type log_entries: list of dict
+        :param log_entries: Log entries from the REST API
+
+        :rtype: int
+        :return: The number of log entries stored
+        """
+        rows = [
+            (
+                entry['id'],
+                _reference_id(entry.get('incident')),
+                entry.get('type'),
+                to_timestamp(entry.get('created_at')),
+                json.dumps(entry),
+            )
+            for entry in log_entries
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO log_entries VALUES (?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def get(self, id):
+        """
+        :type id: str
+        :param id: The ID of an incident
+
+        :rtype: dict
+        :return: The stored incident, or None
+        """
+        rows = self._query('SELECT data FROM incidents WHERE id = ?', (id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def incidents(self, service_id=None, status=None, incident_key=None, since=None, until=None, limit=None):
+        """
+        Finds stored incidents, newest first
+
+        :type service_id: str or list
+        :param service_id: Only incidents of this service, or of these services
+
+        :type status: str or list
+        :param status: Only incidents with this status, or these statuses
+
+        :type incident_key: str
+        :param incident_key: Only incidents with this incident key
+
+        :type since: float, datetime or str
+        :param since: Only incidents created at or after this time
+
+        :type until: float, datetime or str
+        :param until: Only incidents created before this time
+
+        :type limit: int
+        :param limit: The most incidents returned
+
+        :rtype: list of dict
+        """
+        where, params = self._filters(service_id, status, incident_key, since, until)
+        sql = 'SELECT data FROM incidents{0} ORDER BY created_at DESC'.format(where)
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [json.loads(row[0]) for row in self._query(sql, params)]
+
+    def counts(self, group_by='status', service_id=None, status=None, since=None, until=None):
+        """
+        Counts stored incidents, grouped by a column. Takes the filters of :meth:`incidents`
+
+        :type group_by: str
+        :param group_by: One of ``service_id``, ``status``, ``urgency`` or ``incident_key``
+
+        :rtype: dict
+        :return: The number of incidents for each value of the column
+        """
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError('Incidents can only be counted by one of {0}'.format(', '.join(GROUP_COLUMNS)))
+        where, params = self._filters(service_id, status, None, since, until)
+        sql = 'SELECT {0}, COUNT(*) FROM incidents{1} GROUP BY {0}'.format(group_by, where)
+        return dict(self._query(sql, params))
+
+    def mean_time_to_resolve(self, service_id=None, since=None, until=None):
+        """
+        The mean seconds from trigger to resolve of the stored incidents resolved
+        at or after ``since`` and before ``until``
+
+        :rtype: float
+        :return: The mean, or None if no incidents were resolved
+        """
+        where, params = self._filters(service_id, None, None, since, until, time_column='resolved_at')
+        where += ' AND ' if where else ' WHERE '
+        sql = 'SELECT AVG(resolved_at - created_at) FROM incidents{0}resolved_at IS NOT NULL'.format(where)
+        return self._query(sql, params)[0][0]
+
+    def log_entries(self, incident_id):
+        """
+        :type incident_id: str
+        :param incident_id: The ID of an incident
+
+        :rtype: list of dict
+        :return: The stored log entries of the incident, oldest first
+        """
+        sql = 'SELECT data FROM log_entries WHERE incident_id = ? ORDER BY created_at'
+        return [json.loads(row[0]) for row in self._query(sql, (incident_id,))]
+
+    def get_state(self, name):
+        rows = self._query('SELECT value FROM sync_state WHERE name = ?', (name,))
+        return rows[0][0] if rows else None
+
+    def set_state(self, name, value):
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)', (name, value))
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _filters(self, service_id, status, incident_key, since, until, time_column='created_at'):
+        """
+        Returns a WHERE clause and its parameters
+        """
+        clauses, params = [], []
+        for column, value in (('service_id', service_id), ('status', status), ('incident_key', incident_key)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append('{0} IN ({1})'.format(column, ', '.join('?' * len(values))))
+            params.extend(values)
+        for operator, value in (('>=', since), ('<', until)):
+            if value is not None:
+                clauses.append('{0} {1} ?'.format(time_column, operator))
+                params.append(to_timestamp(value))
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def _resolved_at(self, incident):
+        if incident.get('status') != 'resolved':
+            return None
+        return incident.get('resolved_at') or incident.get('last_status_change_at')
+
+
+class IncidentSync(object):
+    """
+    Pulls the incidents and log entries that changed since the last sync into
+    an :class:`IncidentStore`.
+
+    Every change to an incident adds a log entry, so a sync lists the log
+    entries created since the high-water mark of the last one, with their
+    incidents included, and upserts both. The high-water mark is the newest
+    log entry seen, and is saved in the store only once a sync has finished,
+    so a failed sync is simply repeated. Each sync reaches back ``overlap``
+    seconds before the mark to catch entries PagerDuty indexed late.
+
+        ::
+
+            store = IncidentStore('/var/lib/myapp/pagerduty.db')
+            sync = IncidentSync(store, api_key='...')
+            sync.sync()
+            store.incidents(service_id='PSERVICE', status='triggered')
+    """
+    def __init__(self, store, api_key=None, overlap=300, initial_since=None, page_size=DEFAULT_PAGE_SIZE,
+                 **resource_kwargs):
+        """
+        :type store: :class:`IncidentStore`
+        :param store: Where incidents and log entries are kept
+
+        :type api_key: str
+        :param api_key: The REST API key. See :class:`AuthorizedResource <pagerduty_api.base.AuthorizedResource>`
+
+        :type overlap: float
+        :param overlap: Seconds before the high-water mark that each sync reaches back
+
+        :type initial_since: float, datetime or str
+        :param initial_since: Where the first sync starts. If None, PagerDuty's
+                default range is used
+
+        :type page_size: int
+        :param page_size: The number of log entries fetched and stored at a time
+
+        Any other keyword arguments, such as ``session``, ``retry_policy`` or
+        ``rate_limiter``, are passed to the :class:`LogEntries <pagerduty_api.rest.LogEntries>`
+        and :class:`Incidents <pagerduty_api.rest.Incidents>` resources
+        """
+        self.store = store
+        self.overlap = overlap
+        self.initial_since = initial_since
+        self.page_size = page_size
+        self.log_entries = LogEntries(api_key, **resource_kwargs)
+        self.incidents = Incidents(api_key, **resource_kwargs)
+        self._lock = threading.Lock()
+
+    @property
+    def high_water_mark(self):
+        """
+        The creation time of the newest log entry synced, in seconds since the epoch, or None
+        """
+        value = self.store.get_state(HIGH_WATER_MARK)
+        return float(value) if value is not None else None
+
+    def sync(self):
+        """
+        Pulls everything that changed since the last sync. Only one sync runs at a time.
+
+        :rtype: dict
+        :return: The number of ``incidents`` and ``log_entries`` stored, and the
+                new ``high_water_mark``
+        """
+        with self._lock:
+            mark = self.high_water_mark
+            since = self.initial_since if mark is None else mark - self.overlap
+            params = {'include[]': ['incidents']}
+            if since is not None:
+                params['since'] = to_isoformat(to_timestamp(since))
+
+            counts = {'incidents': 0, 'log_entries': 0}
+            missing = set()
+            batch = []
+            for entry in self.log_entries.list(page_size=self.page_size, **params):
+                batch.append(entry)
+                if len(batch) >= self.page_size:
+                    mark = self._store_batch(batch, counts, missing, mark)
+                    batch = []
+            mark = self._store_batch(batch, counts, missing, mark)
+
+            # Entries whose incident wasn't included only carry a reference to it
+            if missing:
+                counts['incidents'] += self.store.upsert_incidents([self.incidents.get(id) for id in sorted(missing)])
+
+            if mark is not None:
+                self.store.set_state(HIGH_WATER_MARK, repr(mark))
+            counts['high_water_mark'] = mark
+            LOG.info('Synced {0} PagerDuty incidents and {1} log entries'.format(
+                counts['incidents'], counts['log_entries']
+            ))
+            return counts
+
+    def _store_batch(self, batch, counts, missing, mark):
+        """
+        Stores a batch of log entries and their incidents, returning the new high-water mark
+        """
+        incidents = {}
+        for entry in batch:
+            incident = entry.get('incident')
+            if isinstance(incident, dict) and 'status' in incident:
+                incidents[incident['id']] = incident
+                entry['incident'] = {'id': incident['id'], 'type': 'incident_reference'}
+            elif _reference_id(incident) is not None:
+                missing.add(incident['id'])
+            created_at = to_timestamp(entry.get('created_at'))
+            if created_at is not None and (mark is None or created_at > mark):
+                mark = created_at
+
+        missing.difference_update(incidents)
+        counts['incidents'] += self.store.upsert_incidents(list(incidents.values()))
+        counts['log_entries'] += self.store.upsert_log_entries(batch)
+        return mark
@@ -0,0 +1,528 @@
+"""
+A local stand-in for PagerDuty, for integration and load tests that must not
+touch the network.
+
+Run it on its own with ``python -m pagerduty_api.testing --port 8080``.
+"""
+import argparse
+import collections
+import functools
+import hashlib
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LOG = logging.getLogger(__name__)
+
+EVENTS_V1_PATH = '/generic/2010-04-15/create_event.json'
+EVENTS_V2_PATH = '/v2/enqueue'
+CHANGE_EVENTS_PATH = '/v2/change/enqueue'
+HTTP2_PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+
+NOT_FOUND = {'error': {'message': 'Not Found', 'code': 2100}}
+
+
+class Faults(object):
+    THROTTLE = 'throttle'
+    ERROR = 'error'
+    DROP = 'drop'
+
+
+class FakePagerDuty(object):
+    """
+    A threaded HTTP server that answers like PagerDuty's Events APIs (v1, v2 and
+    change events), the REST API's offset paginated collections and objects, and
+    the incident changes made by the bulk operations of
+    :class:`Incidents <pagerduty_api.rest.Incidents>`: updating many incidents,
+    merging and snoozing. List queries are paginated but not filtered. Changes
+    need a ``From`` header, as PagerDuty's do, and are made to the objects added
+    with :meth:`add`.
+
+    Faults can be queued for the next requests with :meth:`throttle`,
+    :meth:`fail` and :meth:`drop`, or injected at random with the ``*_rate``
+    arguments for longer load tests. Every request waits ``latency`` seconds
+    first. Point resources at the server with :meth:`point`.
+
+    With ``http2``, clients may also speak HTTP/2 without negotiating it (h2c
+    with prior knowledge), and the streams of a connection are answered
+    concurrently. This needs the ``h2`` package.
+
+        ::
+
+            with FakePagerDuty() as server:
+                alert = server.point(Alert(service_key='abc'))
+                server.throttle(retry_after=0)
+                alert.trigger(description='No data received')
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0, throttle_rate=0, error_rate=0, drop_rate=0,
+                 retry_after=1, random=random.random, http2=False):
+        """
+        :type host: str
+        :param host: The address to listen on
+
+        :type port: int
+        :param port: The port to listen on. If 0, a free port is picked
+
+        :type latency: float or callable
+        :param latency: Seconds every request waits before it is answered, or a
+                callable returning them
+
+        :type throttle_rate: float
+        :param throttle_rate: The chance of a request being answered with a 429
+
+        :type error_rate: float
+        :param error_rate: The chance of a request being answered with a 500
+
+        :type drop_rate: float
+        :param drop_rate: The chance of a request's connection being closed
+                without an answer
+
+        :type retry_after: float
+        :param retry_after: The ``Retry-After`` seconds sent with random 429s
+
+        :type random: callable
+        :param random: Returns a random float in [0, 1)
+
+        :type http2: bool
+        :param http2: If True, HTTP/2 connections are answered too
+        """
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.retry_after = retry_after
+        self.random = random
+        self.http2 = http2
+
+        self.events = []
+        self.requests = 0
+        self.connections = 0
+        self.collections = {}
+        self._faults = collections.deque()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def start(self):
+        """
+        Starts answering requests on a background thread
+
+        :rtype: :class:`FakePagerDuty`
+        """
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, name='fake-pagerduty', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops answering requests and closes the listening socket
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def point(self, resource):
+        """
+        Points an event or REST resource at the server instead of PagerDuty
+
+        :rtype: The resource
+        """
+        if hasattr(resource, 'CHANGE_URL'):
+            resource.CHANGE_URL = self.url + CHANGE_EVENTS_PATH
+        if hasattr(resource, 'URL'):
+            resource.URL = self.url + (EVENTS_V2_PATH if hasattr(resource, 'CHANGE_URL') else EVENTS_V1_PATH)
+        if hasattr(resource, 'BASE_URL'):
+            resource.BASE_URL = self.url
+        return resource
+
+    def add(self, path, objects):
+        """
+        Adds objects to a REST collection, creating it if needed
+
+        :type path: str
+        :param path: The collection's path, such as ``services`` or
+                ``incidents/PT4KHLK/log_entries``
+
+        :type objects: list
+        :param objects: Dicts, each with an ``id``
+        """
+        with self._lock:
+            self.collections.setdefault(path.strip('/'), []).extend(objects)
+
+    def throttle(self, count=1, retry_after=None):
+        """
+        Answers the next requests with a 429
+
+        :type count: int
+        :param count: The number of requests throttled
+
+        :type retry_after: float
+        :param retry_after: The ``Retry-After`` seconds sent. Defaults to the
+                server's ``retry_after``
+        """
+        self._queue((Faults.THROTTLE, self.retry_after if retry_after is None else retry_after), count)
+
+    def fail(self, count=1, status=500):
+        """
+        Answers the next requests with a server error
+
+        :type count: int
+        :param count: The number of requests failed
+
+        :type status: int
+        :param status: The status code sent
+        """
+        self._queue((Faults.ERROR, status), count)
+
+    def drop(self, count=1):
+        """
+        Closes the connection of the next requests without answering them
+
+        :type count: int
+        :param count: The number of requests dropped
+        """
+        self._queue((Faults.DROP, None), count)
+
+    def reset(self):
+        """
+        Forgets received events, counters and queued faults
+        """
+        with self._lock:
+            del self.events[:]
+            self.requests = 0
+            self.connections = 0
+            self._faults.clear()
+
+    def _queue(self, fault, count):
+        with self._lock:
+            self._faults.extend([fault] * count)
+
+    def _next_fault(self):
+        with self._lock:
+            self.requests += 1
+            if self._faults:
+                return self._faults.popleft()
+
+        chance = self.random()
+        if chance < self.drop_rate:
+            return Faults.DROP, None
+        chance -= self.drop_rate
+        if chance < self.throttle_rate:
+            return Faults.THROTTLE, self.retry_after
+        chance -= self.throttle_rate
+        if chance < self.error_rate:
+            return Faults.ERROR, 500
+        return None, None
+
+    def _wait(self):
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+
+    def _answer(self, method, path, body=None, headers=None):
+        """
+        Answers a request, returning its (status, body, headers), or None if
+        its connection is to be dropped. Request header names are lowercase
+        """
+        headers = headers or {}
+        fault, value = self._next_fault()
+        self._wait()
+
+        if fault == Faults.DROP:
+            return None
+        elif fault == Faults.THROTTLE:
+            body = {'status': 'throttle event', 'message': 'Requests for this service are arriving too quickly'}
+            return _json_answer(429, body, {'Retry-After': '{0:g}'.format(value)})
+        elif fault == Faults.ERROR:
+            return _json_answer(value, {'status': 'error', 'message': 'Internal server error'})
+
+        if method == 'GET':
+            return self._answer_get(path, headers.get('if-none-match'))
+        path = urlparse(path).path
+        if path in (EVENTS_V1_PATH, EVENTS_V2_PATH, CHANGE_EVENTS_PATH):
+            return self._answer_event(path, body)
+        return self._answer_change(method, path.strip('/'), body, headers)
+
+    def _answer_event(self, path, body):
+        try:
+            event = json.loads(body.decode('utf-8'))
+        except ValueError:
+            return _json_answer(400, {'status': 'invalid event', 'message': 'Event object is invalid'})
+
+        if path == EVENTS_V1_PATH:
+            status, response = 200, {'incident_key': event.get('incident_key')}
+        elif path == EVENTS_V2_PATH:
+            status, response = 202, {'dedup_key': event.get('dedup_key')}
+        else:
+            status, response = 202, {}
+
+        with self._lock:
+            self.events.append(event)
+        return _json_answer(status, dict(response, status='success', message='Event processed'))
+
+    def _answer_change(self, method, path, body, headers):
+        parent, _, action = path.rpartition('/')
+        collection, _, id = parent.rpartition('/')
+        if (method, path) == ('PUT', 'incidents'):
+            change = self._update_incidents
+        elif collection == 'incidents' and (method, action) == ('PUT', 'merge'):
+            change = functools.partial(self._merge_incidents, id)
+        elif collection == 'incidents' and (method, action) == ('POST', 'snooze'):
+            change = functools.partial(self._snooze_incident, id)
+        else:
+            return _json_answer(404, NOT_FOUND)
+
+        try:
+            body = json.loads(body.decode('utf-8'))
+        except ValueError:
+            return _json_answer(400, _invalid('Request body is not JSON'))
+        if not headers.get('from'):
+            return _json_answer(400, _invalid('Requester User Not Found'))
+        with self._lock:
+            incidents = dict((obj['id'], obj) for obj in self.collections.get('incidents', []))
+            return change(incidents, body)
+
+    def _update_incidents(self, incidents, body):
+        changes = body.get('incidents', [])
+        if any(change.get('id') not in incidents for change in changes):
+            return _json_answer(404, NOT_FOUND)
+        for change in changes:
+            incidents[change['id']].update((name, value) for name, value in change.items() if name != 'type')
+        return _json_answer(200, {'incidents': [incidents[change['id']] for change in changes]})
+
+    def _merge_incidents(self, id, incidents, body):
+        sources = [source.get('id') for source in body.get('source_incidents', [])]
+        if any(source not in incidents for source in sources + [id]):
+            return _json_answer(404, NOT_FOUND)
+        for source in sources:
+            incidents[source]['status'] = 'resolved'
+        return _json_answer(200, {'incident': incidents[id]})
+
+    def _snooze_incident(self, id, incidents, body):
+        incident = incidents.get(id)
+        if incident is None:
+            return _json_answer(404, NOT_FOUND)
+        if incident.get('status') != 'acknowledged':
+            return _json_answer(400, _invalid('Incident must be acknowledged to be snoozed'))
+        incident['snoozed_for'] = body.get('duration')
+        return _json_answer(201, {'incident': incident})
+
+    def _answer_get(self, path, if_none_match):
+        url = urlparse(path)
+        path = url.path.strip('/')
+        query = parse_qs(url.query)
+
+        if path in self.collections:
+            return _json_answer(200, self._page(path, self.collections[path], query))
+
+        parent, _, id = path.rpartition('/')
+        for obj in self.collections.get(parent, []):
+            if obj['id'] == id:
+                return self._answer_object(_singular(parent.rpartition('/')[2]), obj, if_none_match)
+        return _json_answer(404, NOT_FOUND)
+
+    def _page(self, path, objects, query):
+        offset = int(query.get('offset', ['0'])[0])
+        limit = int(query.get('limit', ['25'])[0])
+        page = {
+            path.rpartition('/')[2]: objects[offset:offset + limit],
+            'offset': offset,
+            'limit': limit,
+            'more': offset + limit < len(objects),
+        }
+        if query.get('total') == ['true']:
+            page['total'] = len(objects)
+        return page
+
+    def _answer_object(self, name, obj, if_none_match):
+        body = json.dumps({name: obj}, sort_keys=True).encode('utf-8')
+        etag = '"{0}"'.format(hashlib.md5(body).hexdigest())
+        if if_none_match == etag:
+            return 304, None, {'ETag': etag}
+        return _json_answer(200, body, {'ETag': etag})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, which Nagle's algorithm would delay on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def setup(self):
+        super(_Handler, self).setup()
+        with self.fake._lock:
+            self.fake.connections += 1
+
+    def handle(self):
+        # HTTP/1.1 requests never start like the HTTP/2 connection preface
+        if self.fake.http2 and self.rfile.peek(len(HTTP2_PREFACE))[:3] == HTTP2_PREFACE[:3]:
+            return _HTTP2Connection(self.fake, self.connection, self.rfile).serve()
+        super(_Handler, self).handle()
+
+    def log_message(self, format, *args):
+        LOG.debug(format, *args)
+
+    def do_POST(self):
+        self._answer('POST')
+
+    def do_PUT(self):
+        self._answer('PUT')
+
+    def do_GET(self):
+        self._answer('GET')
+
+    def _answer(self, method):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        headers = dict((name.lower(), value) for name, value in self.headers.items())
+        self._send(self.fake._answer(method, self.path, body, headers))
+
+    def _send(self, answer):
+        if answer is None:
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+
+        status, body, headers = answer
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+
+class _HTTP2Connection(object):
+    """
+    Answers the streams of an HTTP/2 connection, each on its own thread so that
+    they are answered concurrently, as PagerDuty would
+    """
+    def __init__(self, fake, sock, rfile):
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        self.events = h2.events
+        self.fake = fake
+        self.sock = sock
+        self.rfile = rfile
+        self.connection = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding='utf-8')
+        )
+        self.streams = {}
+        self.lock = threading.Lock()
+
+    def serve(self):
+        with self.lock:
+            self.connection.initiate_connection()
+            self._flush()
+        while True:
+            data = self.rfile.read1(65535)
+            if not data:
+                return
+            with self.lock:
+                events = self.connection.receive_data(data)
+                self._flush()
+            for event in events:
+                if isinstance(event, self.events.ConnectionTerminated):
+                    return
+                self._handle(event)
+
+    def _handle(self, event):
+        if isinstance(event, self.events.RequestReceived):
+            self.streams[event.stream_id] = (dict(event.headers), [])
+        elif isinstance(event, self.events.DataReceived):
+            self.streams[event.stream_id][1].append(event.data)
+            with self.lock:
+                self.connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, self.events.StreamEnded):
+            headers, chunks = self.streams.pop(event.stream_id)
+            thread = threading.Thread(target=self._answer, args=(event.stream_id, headers, b''.join(chunks)))
+            thread.daemon = True
+            thread.start()
+
+    def _answer(self, stream_id, headers, body):
+        answer = self.fake._answer(headers[':method'], headers[':path'], body, headers)
+        with self.lock:
+            if answer is None:
+                self.connection.reset_stream(stream_id)
+            else:
+                status, body, headers = answer
+                headers = [(':status', str(status))] + [(name.lower(), value) for name, value in headers.items()]
+                self.connection.send_headers(stream_id, headers, end_stream=body is None)
+                if body is not None:
+                    self.connection.send_data(stream_id, body, end_stream=True)
+            self._flush()
+
+    def _flush(self):
+        self.sock.sendall(self.connection.data_to_send())
+
+
+def _invalid(message):
+    return {'error': {'message': 'Invalid Input Provided', 'code': 2001, 'errors': [message]}}
+
+
+def _json_answer(status, body, headers=None):
+    if isinstance(body, dict):
+        body = json.dumps(body).encode('utf-8')
+    return status, body, dict(headers or {}, **{'Content-Type': 'application/json', 'Content-Length': str(len(body))})
+
+
+def _singular(name):
+    if name.endswith('ies'):
+        return name[:-3] + 'y'
+    return name[:-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs a local stand-in for PagerDuty')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help='seconds every request waits')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='chance of a 429')
+    parser.add_argument('--error-rate', type=float, default=0, help='chance of a 500')
+    parser.add_argument('--drop-rate', type=float, default=0, help='chance of a dropped connection')
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--http2', action='store_true', help='also answer HTTP/2 with prior knowledge')
+    args = parser.parse_args()
+
+    server = FakePagerDuty(
+        args.host, args.port, latency=args.latency, throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+        drop_rate=args.drop_rate, retry_after=args.retry_after, http2=args.http2,
+    )
+    print('Serving a fake PagerDuty on {0}'.format(server.url), flush=True)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import io
+import os
+import runpy
+import shutil
+import signal
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+from unittest import TestCase
+
+from mock import patch
+
+from pagerduty_api.agent import AgentAlert, AgentAlertV2, AlertAgent, get_socket_path, main
+from pagerduty_api.dedup import EventDeduplicator
+from pagerduty_api.exceptions import DispatcherException, PagerDutyAPIServerException
+from pagerduty_api.testing import FakePagerDuty
+
+
+class AlertAgentTests(TestCase):
+    """
+    Tests for AlertAgent and its client resources
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'agent.sock')
+
+        self.server = FakePagerDuty().start()
+        self.addCleanup(self.server.stop)
+        self.agent = AlertAgent(self.path, deduplicator=EventDeduplicator())
+        for resource in self.agent.resources.values():
+            self.server.point(resource)
+        self.agent.start()
+        self.addCleanup(self.agent.close)
+
+    def test_wait_for_response(self):
+        """
+        Test a waiting client gets PagerDuty's response
+        """
+        alert = AgentAlert(service_key='abc', socket_path=self.path, wait=True)
+
+        response = alert.trigger(description='No data received', incident_key='web01')
+
+        self.assertEqual(response['status'], 'success')
+        self.assertEqual(self.server.events[0]['service_key'], 'abc')
+        self.assertEqual(self.server.events[0]['incident_key'], 'web01')
+
+    def test_queued(self):
+        """
+        Test a client returns once the agent has queued the event
+        """
+        alert = AgentAlert(service_key='abc', socket_path=self.path)
+
+        response = alert.trigger(description='No data received', incident_key='web01')
+        self.agent.dispatchers['alert'].flush()
+
+        self.assertEqual(response['status'], 'queued')
+        self.assertEqual(response['incident_key'], 'web01')
+        self.assertEqual(len(self.server.events), 1)
+
+    def test_dedup_across_clients(self):
+        """
+        Test repeats from different clients are suppressed by the agent
+        """
+        first = AgentAlert(service_key='abc', socket_path=self.path, wait=True)
+        second = AgentAlert(service_key='abc', socket_path=self.path, wait=True)
+
+        first.trigger(description='No data received', incident_key='web01')
+        response = second.trigger(description='No data received', incident_key='web01')
+
+        self.assertEqual(response['status'], 'suppressed')
+        self.assertEqual(len(self.server.events), 1)
+
+    def test_alert_v2(self):
+        """
+        Test v2 events are sent through the agent's v2 resource
+        """
+        alert = AgentAlertV2(routing_key='R015Z2Y8HHSWQ1MEKHJ8MDU2Q7JKB4D4', socket_path=self.path, wait=True)
+
+        response = alert.trigger('Disk full', 'web01', dedup_key='disk')
+        alert.change('Deployed')
+
+        self.assertEqual(response['dedup_key'], 'disk')
+        self.assertEqual([event.get('event_action') for event in self.server.events], ['trigger', None])
+
+    def test_server_error(self):
+        """
+        Test a failure from PagerDuty is raised by the client
+        """
+        self.server.fail(status=400)
+        alert = AgentAlert(service_key='abc', socket_path=self.path, wait=True)
+
+        with self.assertRaises(PagerDutyAPIServerException) as context:
+            alert.trigger(description='No data received')
+
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_unknown_resource(self):
+        """
+        Test the agent refuses messages it can't send
+        """
+        reply = self.agent.handle({'kind': 'sms', 'event': {}})
+
+        self.assertEqual(reply['error'], 'Unknown resource sms')
+        self.assertFalse(reply['server_error'])
+
+    def test_agent_unreachable(self):
+        """
+        Test a client raises if the agent isn't running
+        """
+        alert = AgentAlert(service_key='abc', socket_path=self.path + '.missing')
+
+        with self.assertRaises(DispatcherException):
+            alert.trigger(description='No data received')
+
+    def test_socket_permissions(self):
+        """
+        Test the socket is only accessible by its owner
+        """
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_invalid_message(self):
+        """
+        Test the agent replies with an error to a message that isn't JSON
+        """
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(connection.close)
+        connection.connect(self.path)
+
+        connection.sendall(b'not json\n')
+        reply = connection.makefile('rb').readline()
+
+        self.assertEqual(reply, b'{"error": "Invalid message", "server_error": false, "status_code": null}\n')
+
+    def test_client_error(self):
+        """
+        Test an error from the agent that isn't from PagerDuty raises a DispatcherException
+        """
+        class SMSAlert(AgentAlert):
+            AGENT_KIND = 'sms'
+
+        alert = SMSAlert(service_key='abc', socket_path=self.path)
+
+        with self.assertRaisesRegex(DispatcherException, 'Unknown resource sms'):
+            alert.trigger(description='No data received')
+
+    def test_agent_closes_connection(self):
+        """
+        Test a client raises, and reconnects next time, if the agent hangs up
+        """
+        path = self.path + '.closing'
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(path)
+        listener.listen(1)
+
+        def hang_up():
+            connection = listener.accept()[0]
+            connection.makefile('rb').readline()
+            connection.close()
+
+        threading.Thread(target=hang_up, daemon=True).start()
+        alert = AgentAlert(service_key='abc', socket_path=path)
+
+        with self.assertRaisesRegex(DispatcherException, 'closed the connection'):
+            alert.trigger(description='No data received')
+
+        self.assertIsNone(alert._local.connection)
+
+    def test_replaces_stale_socket(self):
+        """
+        Test a socket left behind by an agent that died is replaced
+        """
+        path = self.path + '.stale'
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+
+        with AlertAgent(path) as agent:
+            response = AgentAlert(service_key='abc', socket_path=path).trigger(description='No data received')
+            os.unlink(path)
+
+        self.assertEqual(response['status'], 'queued')
+        self.assertIsNone(agent._thread)
+        self.assertFalse(os.path.exists(path))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_fork(self):
+        """
+        Test a forked worker opens its own connection to the agent
+        """
+        alert = AgentAlert(service_key='abc', socket_path=self.path, wait=True)
+        alert.trigger(description='Before fork', incident_key='parent')
+
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            try:
+                alert.trigger(description='In worker', incident_key='child')
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        alert.trigger(description='After fork', incident_key='parent2')
+
+        self.assertEqual(
+            [event['incident_key'] for event in self.server.events], ['parent', 'child', 'parent2']
+        )
+
+    def test_socket_path_from_environment(self):
+        """
+        Test the socket path falls back to the environment
+        """
+        os.environ['PAGERDUTY_AGENT_SOCKET'] = '/run/agent.sock'
+        self.addCleanup(os.environ.pop, 'PAGERDUTY_AGENT_SOCKET')
+
+        self.assertEqual(get_socket_path(), '/run/agent.sock')
+        self.assertEqual(get_socket_path('/tmp/other.sock'), '/tmp/other.sock')
+
+
+class AgentMainTests(TestCase):
+    """
+    Tests for running the agent with python -m pagerduty_api.agent
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'agent.sock')
+        self.agents = []
+        self.handlers = {}
+
+    def run_main(self, serve_forever, *args):
+        def serve(agent):
+            self.agents.append(agent)
+            serve_forever(agent)
+
+        argv = ['agent', '--socket', self.path] + list(args)
+        output = io.StringIO()
+        with patch.object(sys, 'argv', argv), patch('sys.stdout', output), \
+                patch('pagerduty_api.agent.signal.signal', side_effect=self.handlers.__setitem__), \
+                patch.object(AlertAgent, 'serve_forever', autospec=True, side_effect=serve):
+            main()
+        return output.getvalue()
+
+    def test_sigterm(self):
+        """
+        Test the agent listens until SIGTERM, then removes its socket
+        """
+        real_serve_forever = AlertAgent.serve_forever
+
+        def serve_forever(agent):
+            self.handlers[signal.SIGTERM](signal.SIGTERM, None)
+            real_serve_forever(agent)
+
+        output = self.run_main(serve_forever, '--dedup-window', '60', '--rate', '5')
+
+        self.assertEqual(output, 'PagerDuty agent listening on {0}\n'.format(self.path))
+        resource = self.agents[0].resources['alert']
+        self.assertEqual(resource.deduplicator.window, 60)
+        self.assertIsNotNone(resource.rate_limiter)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_keyboard_interrupt(self):
+        """
+        Test Ctrl+C stops the agent without a traceback
+        """
+        def interrupt(agent):
+            raise KeyboardInterrupt()
+
+        self.run_main(interrupt)
+
+        self.assertIsNone(self.agents[0].resources['alert'].deduplicator)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_module(self):
+        """
+        Test the module runs main()
+        """
+        with patch.object(sys, 'argv', ['agent', '--help']), patch('sys.stdout', io.StringIO()) as output, \
+                warnings.catch_warnings(), self.assertRaises(SystemExit):
+            # runpy warns that the module was already imported
+            warnings.simplefilter('ignore', RuntimeWarning)
+            runpy.run_module('pagerduty_api.agent', run_name='__main__')
+
+        self.assertIn('Sends PagerDuty events for local worker processes', output.getvalue())
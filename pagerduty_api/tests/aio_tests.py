@@ -0,0 +1,414 @@
+import asyncio
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+import aiohttp
+
+from pagerduty_api.aio import (
+    AsyncAlert, AsyncAlertV2, _client_timeout, close_default_async_session, create_async_session,
+    get_default_async_session,
+)
+from pagerduty_api.breaker import CircuitBreaker
+from pagerduty_api.dedup import EventDeduplicator
+from pagerduty_api.exceptions import (
+    CircuitOpenException, IncidentKeyException, PagerDutyAPIServerException, SpoolFullException,
+)
+from pagerduty_api.metrics import MetricsAggregator
+from pagerduty_api.ratelimit import RateLimiter
+from pagerduty_api.retry import RetryPolicy
+from pagerduty_api.spool import EventSpool
+from pagerduty_api.tracker import IncidentTracker
+
+
+class FakeResponse(object):
+
+    def __init__(self, status=200, body='{"status": "success"}', headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def text(self):
+        return self.body
+
+    async def json(self, content_type=None):
+        return json.loads(self.body)
+
+
+class FakeSession(object):
+
+    def __init__(self, response=None, delay=0):
+        self.response = response or FakeResponse()
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    def post(self, url, **kwargs):
+        self.calls.append(dict(kwargs, url=url))
+        session = self
+
+        class Context(object):
+            async def __aenter__(self):
+                session.active += 1
+                session.peak = max(session.peak, session.active)
+                await asyncio.sleep(session.delay)
+                session.active -= 1
+                return session.response
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+        return Context()
+
+
+class AsyncAlertTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.service_key = '4baa5d20cfba466a5e075b02698f455c'
+        self.session = FakeSession()
+        self.alert = AsyncAlert(service_key=self.service_key, session=self.session)
+
+    async def test_trigger_success(self):
+        """
+        Test .trigger() posts the same payload as the synchronous alert
+        """
+        response = await self.alert.trigger(description='No data received', incident_key='/alert/110')
+
+        self.assertEqual(response, {'status': 'success'})
+        self.assertEqual(self.alert.incident_key, '/alert/110')
+        call = self.session.calls[0]
+        self.assertEqual(call['url'], AsyncAlert.URL)
+        self.assertEqual(json.loads(call['data']), {
+            'service_key': self.service_key,
+            'event_type': 'trigger',
+            'incident_key': '/alert/110',
+            'description': 'No data received',
+        })
+        self.assertEqual(call['timeout'].sock_connect, self.alert.timeout[0])
+
+    async def test_acknowledge_and_resolve_use_triggered_key(self):
+        """
+        Test .acknowledge() and .resolve() fall back to the triggered incident key
+        """
+        await self.alert.trigger(description='No data received')
+        await self.alert.acknowledge()
+        await self.alert.resolve(description='Fixed')
+
+        sent = [json.loads(call['data']) for call in self.session.calls]
+        self.assertEqual([d['event_type'] for d in sent], ['trigger', 'acknowledge', 'resolve'])
+        self.assertEqual(len(set(d['incident_key'] for d in sent)), 1)
+
+    async def test_missing_incident_key(self):
+        """
+        Test .acknowledge() and .resolve() raise an IncidentKeyException
+        """
+        with self.assertRaises(IncidentKeyException):
+            await self.alert.acknowledge()
+        with self.assertRaises(IncidentKeyException):
+            await self.alert.resolve()
+
+    async def test_server_error(self):
+        """
+        Test an error response raises a PagerDutyAPIServerException
+        """
+        alert = AsyncAlert(service_key=self.service_key, session=FakeSession(FakeResponse(500, 'Server Error')))
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            await alert.trigger(description='No data received')
+
+    async def test_retry(self):
+        """
+        Test failed requests are retried by the retry policy
+        """
+        responses = [FakeResponse(503, headers={'Retry-After': '0'}), FakeResponse()]
+        self.session.post = lambda url, **kwargs: responses.pop(0)
+        alert = AsyncAlert(service_key=self.service_key, session=self.session, retry_policy=RetryPolicy())
+
+        self.assertEqual(await alert.trigger(description='No data received'), {'status': 'success'})
+        self.assertEqual(responses, [])
+
+    async def test_retry_gives_up(self):
+        """
+        Test connection errors raise once the retry policy gives up
+        """
+        def post(url, **kwargs):
+            raise aiohttp.ClientConnectionError()
+        self.session.post = post
+        alert = AsyncAlert(service_key=self.service_key, session=self.session, retry_policy=RetryPolicy(
+            max_attempts=2, backoff_base=0.01
+        ))
+
+        with self.assertRaises(PagerDutyAPIServerException) as cm:
+            await alert.trigger(description='No data received')
+        self.assertEqual(cm.exception.attempts, 2)
+
+    async def test_spool(self):
+        """
+        Test failed events are spooled and replayed on the event loop
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        alert = AsyncAlert(service_key=self.service_key, session=self.session, spool=EventSpool(directory))
+        self.session.response = FakeResponse(503, 'Unavailable')
+
+        append = alert.spool.append
+        threads = []
+        alert.spool.append = lambda *args: threads.append(threading.current_thread()) or append(*args)
+
+        self.assertEqual((await alert.trigger(description='No data received'))['status'], 'spooled')
+        self.assertEqual((await alert.resolve())['status'], 'spooled')
+
+        self.session.response = FakeResponse()
+        self.assertEqual(await alert.replay_spool(), 2)
+        self.assertEqual(len(alert.spool), 0)
+        self.assertEqual(len(self.session.calls), 3)
+        # Spool writes don't block the event loop
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_spool_full(self):
+        """
+        Test an event that can't be spooled behind its incident raises and is rolled back
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        alert = AsyncAlert(
+            service_key=self.service_key, session=self.session, spool=EventSpool(directory), tracker=IncidentTracker()
+        )
+        self.session.response = FakeResponse(503, 'Unavailable')
+        await alert.trigger(description='No data received', incident_key='web01')
+        alert.spool.max_size = 1
+
+        with self.assertRaises(SpoolFullException):
+            await alert.resolve(incident_key='web01')
+
+        self.assertEqual(alert.tracker.state(self.service_key, 'web01'), 'triggered')
+        self.assertEqual(len(self.session.calls), 1)
+
+    async def test_spool_replayed_meanwhile(self):
+        """
+        Test an event is sent if its incident's spooled events were replayed while it waited for the spool
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        alert = AsyncAlert(service_key=self.service_key, session=self.session, spool=EventSpool(directory))
+        alert.spool.append({'incident_key': 'web01'}, (self.service_key, 'web01'))
+        alert._spool_behind_pending = lambda data: None
+
+        response = await alert.resolve(incident_key='web01')
+
+        self.assertEqual(response['status'], 'success')
+        self.assertEqual(len(self.session.calls), 1)
+
+    async def test_rate_limited(self):
+        """
+        Test events wait for the rate limiter without blocking the event loop
+        """
+        alert = AsyncAlert(
+            service_key=self.service_key, session=self.session, rate_limiter=RateLimiter(per_key_rate=1000)
+        )
+
+        await alert.trigger(description='No data received')
+
+        self.assertEqual(len(self.session.calls), 1)
+
+    async def test_post_without_body(self):
+        """
+        Test a request can be sent without a body
+        """
+        await self.alert._post(url=self.alert.URL, data=None, headers=self.alert.headers)
+
+        self.assertIsNone(self.session.calls[0]['data'])
+
+    async def test_hooks(self):
+        """
+        Test hooks are called around async requests
+        """
+        metrics = MetricsAggregator()
+        alert = AsyncAlert(service_key=self.service_key, session=self.session, hooks=[metrics])
+
+        await alert.trigger(description='No data received')
+        self.session.response = FakeResponse(400, 'Bad Request')
+        with self.assertRaises(PagerDutyAPIServerException):
+            await alert.resolve()
+
+        self.assertEqual((metrics.successes, metrics.errors), (1, 1))
+        self.assertEqual(metrics.by_status, {200: 1, 400: 1})
+
+    async def test_hooks_cancelled(self):
+        """
+        Test a cancelled request ends for the hooks
+        """
+        metrics = MetricsAggregator()
+        alert = AsyncAlert(service_key=self.service_key, session=self.session, hooks=[metrics])
+        self.session.delay = 10
+        task = asyncio.ensure_future(alert.trigger(description='No data received'))
+        await asyncio.sleep(0.01)
+
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual((metrics.in_flight, metrics.errors), (0, 1))
+
+    async def test_send_many(self):
+        """
+        Test .send_many() bounds concurrency and keeps results in order
+        """
+        self.session.delay = 0.01
+        events = [{'event_type': 'trigger', 'description': str(i)} for i in range(10)]
+        events.append({'event_type': 'resolve'})
+
+        results = await self.alert.send_many(events, max_workers=3)
+
+        self.assertEqual([r.event for r in results], events)
+        self.assertTrue(all(r.ok for r in results[:10]))
+        self.assertIsInstance(results[10].exception, IncidentKeyException)
+        self.assertLessEqual(self.session.peak, 3)
+
+    async def test_send_many_keeps_incident_order(self):
+        """
+        Test .send_many() sends the events of one incident one after another, in order
+        """
+        self.session.delay = 0.01
+        events = [
+            {'event_type': 'trigger', 'description': 'down', 'incident_key': 'a'},
+            {'event_type': 'acknowledge', 'incident_key': 'a'},
+            {'event_type': 'resolve', 'incident_key': 'a'},
+        ]
+
+        results = await self.alert.send_many(events, max_workers=3)
+
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual([json.loads(call['data'])['event_type'] for call in self.session.calls],
+                         ['trigger', 'acknowledge', 'resolve'])
+        self.assertEqual(self.session.peak, 1)
+
+    async def test_gather(self):
+        """
+        Test many alerts can be sent with asyncio.gather
+        """
+        self.session.delay = 0.01
+        alerts = [AsyncAlert(service_key=str(i), session=self.session) for i in range(5)]
+
+        await asyncio.gather(*[alert.trigger(description='down') for alert in alerts])
+
+        self.assertEqual(len(self.session.calls), 5)
+        self.assertGreater(self.session.peak, 1)
+
+    async def test_deduplication(self):
+        """
+        Test repeats are suppressed and failures forgotten
+        """
+        alert = AsyncAlert(service_key=self.service_key, session=self.session, deduplicator=EventDeduplicator())
+        await alert.trigger(description='No data received')
+        response = await alert.trigger(description='No data received')
+        self.assertEqual(response['status'], 'suppressed')
+
+        self.session.response = FakeResponse(500, 'Server Error')
+        with self.assertRaises(PagerDutyAPIServerException):
+            await alert.resolve()
+        self.assertEqual(len(alert.deduplicator), 0)
+
+    async def test_circuit_breaker(self):
+        """
+        Test server errors open the circuit and later events fail fast
+        """
+        self.session.response = FakeResponse(503, 'Unavailable')
+        alert = AsyncAlert(
+            service_key=self.service_key, session=self.session,
+            circuit_breaker=CircuitBreaker(min_requests=1, window_size=1),
+        )
+        with self.assertRaises(PagerDutyAPIServerException):
+            await alert.trigger(description='No data received')
+
+        with self.assertRaises(CircuitOpenException):
+            await alert.trigger(description='No data received')
+        self.assertEqual(len(self.session.calls), 1)
+
+    async def test_tracker(self):
+        """
+        Test redundant events are skipped and resolve_all() is a coroutine
+        """
+        alert = AsyncAlert(service_key=self.service_key, session=self.session, tracker=IncidentTracker())
+        await alert.trigger(description='web01 down', incident_key='web01')
+        response = await alert.acknowledge(incident_key='web02')
+        results = await alert.resolve_all()
+
+        self.assertEqual(response['status'], 'redundant')
+        self.assertTrue(results[0].ok)
+        self.assertEqual(len(self.session.calls), 2)
+        self.assertEqual(len(alert.tracker), 0)
+
+
+class AsyncAlertV2Tests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        self.alert = AsyncAlertV2(routing_key='R015Z2Y8HHSWQ1MEKHJ8MDU2Q7JKB4D4', session=self.session)
+
+    async def test_events(self):
+        """
+        Test every v2 event is sent to its endpoint
+        """
+        await self.alert.trigger('Disk full', 'web01', severity='warning')
+        await self.alert.acknowledge()
+        await self.alert.resolve()
+        await self.alert.change('Deployed', source='ci')
+
+        self.assertEqual([json.loads(c['data']).get('event_action') for c in self.session.calls], [
+            'trigger', 'acknowledge', 'resolve', None,
+        ])
+        self.assertEqual(self.session.calls[-1]['url'], AsyncAlertV2.CHANGE_URL)
+
+    async def test_send_many(self):
+        """
+        Test .send_many() is a coroutine
+        """
+        results = await self.alert.send_many([{'event_action': 'resolve', 'dedup_key': 'a'}])
+
+        self.assertTrue(results[0].ok)
+
+
+class AsyncSessionTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_default_session_is_shared(self):
+        """
+        Test alerts without a session share the loop's default session
+        """
+        session = get_default_async_session()
+
+        self.assertIs(AsyncAlert(service_key='a').session, session)
+        self.assertIs(AsyncAlert(service_key='b').session, session)
+
+        await close_default_async_session()
+        self.assertTrue(session.closed)
+        self.assertIsNot(get_default_async_session(), session)
+        await close_default_async_session()
+        await close_default_async_session()
+
+    async def test_create_session(self):
+        """
+        Test the pool settings are passed to the connector
+        """
+        session = create_async_session(limit=5, keepalive_timeout=None)
+
+        self.assertIsInstance(session, aiohttp.ClientSession)
+        self.assertEqual(session.connector.limit, 5)
+        self.assertTrue(session.connector.force_close)
+        await session.close()
+
+    def test_float_timeout(self):
+        """
+        Test a single number is used as the total timeout
+        """
+        self.assertEqual(_client_timeout(5).total, 5)
@@ -1,12 +1,14 @@
 import logging
 
 import json
+import time
 import unittest
-from mock import patch
+from mock import Mock, patch
 import requests
 
 from pagerduty_api.alerts import Alert
 from pagerduty_api.exceptions import IncidentKeyException
+from pagerduty_api.serializers import JSONSerializer
 
 logging.disable(logging.FATAL)
 DUMMY_API_KEY = 'wieZvi9AY3uCj6zaQPZX'
@@ -22,9 +24,9 @@ class PagerDutyAlertTests(unittest.TestCase):
 
         self.incident_key = '/alert/110'
 
-        self.alert = Alert(service_key=self.service_key)
+        self.alert = Alert(service_key=self.service_key, serializer=JSONSerializer(sort_keys=True))
 
-    @patch.object(requests, 'post')
+    @patch.object(requests.Session, 'post')
     def test_trigger_assigns_incident_key(self, mock_post):
         """
         Test triggering an alert without an incident_key sets one for the alert
@@ -39,7 +41,7 @@ class PagerDutyAlertTests(unittest.TestCase):
         # Assert we made one
         self.assertIsNotNone(alert.incident_key)
 
-    @patch.object(requests, 'post')
+    @patch.object(requests.Session, 'post')
     def test_trigger_success(self, mock_post):
         """
         Test .trigger() calls the correct endpoint with correct parameters
@@ -63,12 +65,13 @@ class PagerDutyAlertTests(unittest.TestCase):
                 'client': 'apple_0033c42e190872c508666ab6acbbd2e7',
                 'client_url': 'https://apple.ambition.com',
                 'details': {'some_key': 'some_value'},
-            }, sort_keys=True),
+            }, sort_keys=True, separators=(',', ':')).encode('utf-8'),
             headers=self.alert.headers,
             url=self.alert.URL,
+            timeout=self.alert.timeout,
         )
 
-    @patch.object(requests, 'post')
+    @patch.object(requests.Session, 'post')
     def test_acknowledge_success(self, mock_post):
         """
         Test .acknowledge() calls the correct endpoint with correct parameters
@@ -88,12 +91,13 @@ class PagerDutyAlertTests(unittest.TestCase):
                 'incident_key': self.incident_key,
                 'description': 'No data received',
                 'details': {'some_key': 'some_value'},
-            }, sort_keys=True),
+            }, sort_keys=True, separators=(',', ':')).encode('utf-8'),
             headers=self.alert.headers,
             url=self.alert.URL,
+            timeout=self.alert.timeout,
         )
 
-    @patch.object(requests, 'post')
+    @patch.object(requests.Session, 'post')
     def test_acknowledge_raises_error(self, mock_post):
         """
         Test .acknowledge() raises an IncidentKeyException
@@ -107,7 +111,7 @@ class PagerDutyAlertTests(unittest.TestCase):
                 details={'some_key': 'some_value'}
             )
 
-    @patch.object(requests, 'post')
+    @patch.object(requests.Session, 'post')
     def test_resolve_success(self, mock_post):
         """
         Test .resolve() calls the correct endpoint with correct parameters
@@ -127,12 +131,13 @@ class PagerDutyAlertTests(unittest.TestCase):
                 'incident_key': self.incident_key,
                 'description': 'No data received',
                 'details': {'some_key': 'some_value'},
-            }, sort_keys=True),
+            }, sort_keys=True, separators=(',', ':')).encode('utf-8'),
             headers=self.alert.headers,
             url=self.alert.URL,
+            timeout=self.alert.timeout,
         )
 
-    @patch.object(requests, 'post')
+    @patch.object(requests.Session, 'post')
     def test_resolve_raises_error(self, mock_post):
         """
         Test .resolve() raises an IncidentKeyException
@@ -145,3 +150,87 @@ class PagerDutyAlertTests(unittest.TestCase):
                 description='No data received',
                 details={'some_key': 'some_value'}
             )
+
+    @patch.object(requests.Session, 'post')
+    def test_send_many_success(self, mock_post):
+        """
+        Test .send_many() sends every event and returns results in order
+        """
+        mock_post.return_value.json.side_effect = lambda: {'status': 'success'}
+
+        results = self.alert.send_many([
+            {'event_type': 'trigger', 'description': 'No data received', 'incident_key': 'a'},
+            {'event_type': 'acknowledge', 'incident_key': 'b'},
+            {'event_type': 'resolve', 'incident_key': 'c', 'service_key': 'other_service'},
+        ])
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual([r.event['incident_key'] for r in results], ['a', 'b', 'c'])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(results[0].response, {'status': 'success'})
+
+        sent = sorted(json.loads(call[1]['data'])['incident_key'] for call in mock_post.call_args_list)
+        self.assertEqual(sent, ['a', 'b', 'c'])
+        resolve = [json.loads(c[1]['data']) for c in mock_post.call_args_list if b'resolve' in c[1]['data']][0]
+        self.assertEqual(resolve['service_key'], 'other_service')
+
+    @patch.object(requests.Session, 'post')
+    def test_send_many_keeps_incident_order(self, mock_post):
+        """
+        Test .send_many() sends the events of one incident in the order given
+        """
+        sent = []
+
+        def post(url, data, **kwargs):
+            event = json.loads(data)
+            # A trigger sent at the same time as its resolve would arrive after it
+            time.sleep(0.02 if event['event_type'] == 'trigger' else 0)
+            sent.append((event['incident_key'], event['event_type']))
+            return Mock(ok=True, status_code=200, json=Mock(return_value={'status': 'success'}))
+        mock_post.side_effect = post
+        events = []
+        for i in range(5):
+            events.append({'event_type': 'trigger', 'description': 'No data received', 'incident_key': str(i)})
+            events.append({'event_type': 'resolve', 'incident_key': str(i)})
+
+        results = self.alert.send_many(events, max_workers=10)
+
+        self.assertTrue(all(r.ok for r in results))
+        for i in range(5):
+            self.assertEqual([e for e in sent if e[0] == str(i)], [(str(i), 'trigger'), (str(i), 'resolve')])
+
+    @patch.object(requests.Session, 'post')
+    def test_send_many_partial_failure(self, mock_post):
+        """
+        Test .send_many() records failing events without stopping the batch
+        """
+        alert = Alert(service_key=self.service_key)
+
+        results = alert.send_many([
+            {'event_type': 'resolve'},
+            {'event_type': 'bogus'},
+            {'event_type': 'trigger', 'description': 'No data received'},
+        ], max_workers=1)
+
+        self.assertIsInstance(results[0].exception, IncidentKeyException)
+        self.assertIsInstance(results[1].exception, ValueError)
+        self.assertTrue(results[2].ok)
+        self.assertEqual(mock_post.call_count, 1)
+        # Batches don't change the incident key of the alert
+        self.assertIsNone(alert.incident_key)
+
+    @patch.object(requests.Session, 'post')
+    def test_default_payload_is_compact(self, mock_post):
+        """
+        Test empty fields are left out and the service key leads the payload
+        """
+        alert = Alert(service_key=self.service_key, serializer=JSONSerializer())
+
+        alert.resolve(incident_key=self.incident_key)
+
+        self.assertEqual(
+            mock_post.call_args[1]['data'],
+            '{{"service_key":"{0}","event_type":"resolve","incident_key":"{1}"}}'.format(
+                self.service_key, self.incident_key
+            ).encode('utf-8')
+        )
@@ -0,0 +1,152 @@
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+from mock import patch
+
+from pagerduty_api.alerts_v2 import AlertV2, Severities
+from pagerduty_api.dedup import EventDeduplicator
+from pagerduty_api.exceptions import IncidentKeyException
+from pagerduty_api.spool import EventSpool
+
+
+class AlertV2Tests(TestCase):
+
+    def setUp(self):
+        self.routing_key = 'R015Z2Y8HHSWQ1MEKHJ8MDU2Q7JKB4D4'
+        self.alert = AlertV2(routing_key=self.routing_key)
+
+    def sent(self, mock_post, index=-1):
+        call = mock_post.call_args_list[index][1]
+        return call['url'], json.loads(call['data'])
+
+    @patch.object(requests.Session, 'post')
+    def test_trigger_success(self, mock_post):
+        """
+        Test .trigger() posts a v2 payload to the enqueue endpoint
+        """
+        self.alert.trigger(
+            summary='Disk full on web01',
+            source='web01',
+            severity=Severities.CRITICAL,
+            dedup_key='web01/disk',
+            component='disk',
+            group='web',
+            class_='storage',
+            custom_details={'free': '0%'},
+            links=[{'href': 'https://status.example.com'}],
+        )
+
+        url, data = self.sent(mock_post)
+        self.assertEqual(url, AlertV2.URL)
+        self.assertEqual(data, {
+            'routing_key': self.routing_key,
+            'event_action': 'trigger',
+            'dedup_key': 'web01/disk',
+            'payload': {
+                'summary': 'Disk full on web01',
+                'source': 'web01',
+                'severity': 'critical',
+                'component': 'disk',
+                'group': 'web',
+                'class': 'storage',
+                'custom_details': {'free': '0%'},
+            },
+            'links': [{'href': 'https://status.example.com'}],
+        })
+        self.assertEqual(mock_post.call_args[1]['data'][:15], b'{"routing_key":')
+
+    @patch.object(requests.Session, 'post')
+    def test_acknowledge_and_resolve_use_triggered_key(self, mock_post):
+        """
+        Test .acknowledge() and .resolve() fall back to the last dedup key
+        """
+        self.alert.trigger(summary='Disk full on web01', source='web01')
+        self.alert.acknowledge()
+        self.alert.resolve()
+
+        keys = set(self.sent(mock_post, i)[1]['dedup_key'] for i in range(3))
+        self.assertEqual(keys, set([self.alert.dedup_key]))
+        self.assertEqual(self.sent(mock_post)[1], {
+            'routing_key': self.routing_key, 'event_action': 'resolve', 'dedup_key': self.alert.dedup_key,
+        })
+
+    def test_missing_dedup_key(self):
+        """
+        Test .acknowledge() and .resolve() raise an IncidentKeyException
+        """
+        with self.assertRaises(IncidentKeyException):
+            self.alert.acknowledge()
+        with self.assertRaises(IncidentKeyException):
+            self.alert.resolve()
+
+    @patch.object(requests.Session, 'post')
+    def test_change(self, mock_post):
+        """
+        Test .change() posts to the change events endpoint
+        """
+        self.alert.change(summary='Deployed v1.2', source='ci', custom_details={'sha': 'abc'})
+
+        url, data = self.sent(mock_post)
+        self.assertEqual(url, AlertV2.CHANGE_URL)
+        self.assertEqual(data, {
+            'routing_key': self.routing_key,
+            'payload': {'summary': 'Deployed v1.2', 'source': 'ci', 'custom_details': {'sha': 'abc'}},
+        })
+
+    @patch.object(requests.Session, 'post')
+    def test_send_many(self, mock_post):
+        """
+        Test .send_many() sends v2 events across routing keys
+        """
+        results = self.alert.send_many([
+            {'event_action': 'trigger', 'summary': 'down', 'source': 'web01', 'dedup_key': 'a'},
+            {'event_action': 'resolve', 'dedup_key': 'b', 'routing_key': 'other'},
+            {'event_action': 'change', 'summary': 'Deployed'},
+            {'event_action': 'snooze'},
+        ])
+
+        self.assertEqual([r.ok for r in results], [True, True, True, False])
+        self.assertIsInstance(results[3].exception, ValueError)
+        routing_keys = sorted(json.loads(c[1]['data'])['routing_key'] for c in mock_post.call_args_list)
+        self.assertEqual(routing_keys, sorted(['other', self.routing_key, self.routing_key]))
+
+    @patch.object(requests.Session, 'post')
+    def test_deduplication(self, mock_post):
+        """
+        Test repeats are suppressed by dedup key, and counted in custom details
+        """
+        alert = AlertV2(routing_key=self.routing_key, deduplicator=EventDeduplicator(coalesce=True))
+        alert.change(summary='Deployed')
+        alert.change(summary='Deployed')
+        alert.trigger(summary='down', source='web01')
+        response = alert.trigger(summary='down', source='web01')
+        alert.resolve()
+        dedup_key = alert.dedup_key
+        alert.resolve()
+        alert.trigger(summary='down again', source='web01', dedup_key=dedup_key, custom_details={'load': 9})
+
+        self.assertEqual(response, {'status': 'suppressed', 'message': 'Duplicate event suppressed',
+                                    'dedup_key': dedup_key})
+        self.assertEqual(mock_post.call_count, 5)
+        payload = json.loads(mock_post.call_args[1]['data'])['payload']
+        self.assertEqual(payload['custom_details'], {'load': 9, 'suppressed_events': 1})
+
+    @patch.object(requests.Session, 'post')
+    def test_spool(self, mock_post):
+        """
+        Test unreachable v2 events are spooled and replayed to their endpoints
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        alert = AlertV2(routing_key=self.routing_key, spool=EventSpool(directory))
+        mock_post.side_effect = requests.ConnectionError('unreachable')
+
+        self.assertEqual(alert.trigger(summary='down', source='web01')['status'], 'spooled')
+        self.assertEqual(alert.change(summary='Deployed')['status'], 'spooled')
+
+        mock_post.side_effect = None
+        self.assertEqual(alert.replay_spool(max_workers=1), 2)
+        self.assertEqual([self.sent(mock_post, i)[0] for i in (2, 3)], [AlertV2.URL, AlertV2.CHANGE_URL])
@@ -5,7 +5,8 @@ import requests
 
 from mock import patch, Mock
 
-from pagerduty_api.base import AuthorizedResource, Resource
+from pagerduty_api import base
+from pagerduty_api.base import AuthorizedResource, Resource, create_session, get_default_session
 from pagerduty_api.exceptions import ConfigurationException, PagerDutyAPIServerException
 
 
@@ -17,7 +18,7 @@ class ResourceTests(TestCase):
     def setUp(self):
         self.TEST_URL = 'https://www.google.com'
 
-    @patch.object(requests, 'post')
+    @patch.object(requests.Session, 'post')
     def test_post_not_ok(self, mock_post):
         """
         Test ._post() handles a not ok response
@@ -32,8 +33,68 @@ class ResourceTests(TestCase):
 
         mock_post.assert_called_once_with(
             url=self.TEST_URL,
+            timeout=resource.timeout,
         )
 
+    @patch.object(requests.Session, 'post')
+    def test_post_uses_given_session_and_timeout(self, mock_post):
+        """
+        Test ._post() sends through the session and timeout the resource was built with
+        """
+        session = create_session()
+        resource = Resource(session=session, timeout=1)
+
+        resource._post(url=self.TEST_URL, data={'b': 1, 'a': 2})
+
+        self.assertIs(resource.session, session)
+        mock_post.assert_called_once_with(
+            url=self.TEST_URL,
+            data=b'{"b":1,"a":2}',
+            timeout=1,
+        )
+
+    def test_default_session_is_shared(self):
+        """
+        Test resources without a session share the default one
+        """
+        self.assertIs(Resource().session, Resource().session)
+        self.assertIs(Resource().session, get_default_session())
+
+    def test_default_session_created_once(self):
+        """
+        Test a session created by another thread while waiting for the lock is the one returned
+        """
+        session = requests.Session()
+        lock = Mock()
+        lock.__enter__ = Mock(side_effect=lambda: setattr(base, '_default_session', session))
+        lock.__exit__ = Mock(return_value=False)
+
+        with patch.object(base, '_default_session', None), patch.object(base, '_default_session_lock', lock):
+            self.assertIs(get_default_session(), session)
+
+
+class CreateSessionTests(TestCase):
+
+    def test_pool_size(self):
+        """
+        Test the pool settings are passed to the mounted adapters
+        """
+        session = create_session(pool_connections=3, pool_maxsize=7, pool_block=True)
+
+        adapter = session.get_adapter('https://events.pagerduty.com')
+        self.assertEqual(adapter._pool_connections, 3)
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertTrue(adapter._pool_block)
+        self.assertEqual(session.headers['Connection'], 'keep-alive')
+
+    def test_no_keep_alive(self):
+        """
+        Test connections are closed when keep alive is disabled
+        """
+        session = create_session(keep_alive=False)
+
+        self.assertEqual(session.headers['Connection'], 'close')
+
 
 class AuthorizedResourceTests(TestCase):
 
@@ -73,3 +134,21 @@ class AuthorizedResourceTests(TestCase):
             AuthorizedResource()
 
         os_environ_mock.assert_called_once_with('PAGERDUTY_API_KEY')
+
+    def test_headers_use_api_key(self):
+        """
+        Test the headers authorize with the resource's api_key and ask for v2
+        """
+        resource = AuthorizedResource(api_key='123')
+
+        self.assertEqual(resource.headers['Authorization'], 'Token token=123')
+        self.assertEqual(resource.headers['Accept'], 'application/vnd.pagerduty+json;version=2')
+
+    def test_url(self):
+        """
+        Test paths are joined onto the base url
+        """
+        resource = AuthorizedResource(api_key='123')
+
+        self.assertEqual(resource._url('/incidents'), 'https://api.pagerduty.com/incidents')
+        self.assertEqual(resource._url('services/P1'), 'https://api.pagerduty.com/services/P1')
@@ -0,0 +1,101 @@
+import threading
+import time
+from unittest import TestCase
+
+from pagerduty_api.batch import EventResult, send_concurrently
+
+
+class SendConcurrentlyTests(TestCase):
+
+    def test_empty(self):
+        """
+        Test nothing is sent for an empty batch
+        """
+        self.assertEqual(send_concurrently(lambda event: event, []), [])
+
+    def test_results_in_input_order(self):
+        """
+        Test results come back in input order even when later events finish first
+        """
+        def send(event):
+            time.sleep(0.01 * (5 - event))
+            return event * 10
+
+        results = send_concurrently(send, range(5), max_workers=5)
+
+        self.assertEqual([r.event for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual([r.response for r in results], [0, 10, 20, 30, 40])
+
+    def test_bounded_concurrency(self):
+        """
+        Test no more than max_workers events are in flight
+        """
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def send(event):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.01)
+            with lock:
+                state['active'] -= 1
+
+        send_concurrently(send, range(20), max_workers=3)
+
+        self.assertLessEqual(state['peak'], 3)
+
+    def test_same_key_in_order(self):
+        """
+        Test events sharing a key are sent one after another in input order, and other keys at once
+        """
+        lock = threading.Lock()
+        sent = []
+        state = {'active': 0, 'peak': 0}
+
+        def send(event):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            # Later events for a key would overtake earlier ones if they were sent at once
+            time.sleep(0.02 if event[1] == 'trigger' else 0)
+            with lock:
+                state['active'] -= 1
+                sent.append(event)
+            return event
+
+        events = [(key, event_type) for key in 'abc' for event_type in ('trigger', 'resolve')]
+
+        results = send_concurrently(send, events, max_workers=6, key=lambda event: event[0])
+
+        self.assertEqual([r.response for r in results], events)
+        for key in 'abc':
+            self.assertEqual([event for event in sent if event[0] == key], [(key, 'trigger'), (key, 'resolve')])
+        self.assertEqual(state['peak'], 3)
+
+    def test_failures_are_captured(self):
+        """
+        Test an exception is stored on its result
+        """
+        error = RuntimeError('boom')
+
+        def send(event):
+            if event == 1:
+                raise error
+            return event
+
+        results = send_concurrently(send, [0, 1, 2], max_workers=2)
+
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertIs(results[1].exception, error)
+
+
+class EventResultTests(TestCase):
+
+    def test_repr(self):
+        """
+        Test the repr shows the outcome
+        """
+        result = EventResult({}, response={'status': 'success'})
+        self.assertEqual(repr(result), "<EventResult ok {'status': 'success'}>")
+        self.assertEqual(repr(EventResult({}, exception=ValueError('x'))), "<EventResult failed ValueError('x')>")
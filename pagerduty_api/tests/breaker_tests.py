@@ -0,0 +1,249 @@
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+from mock import patch
+
+from pagerduty_api.alerts import Alert
+from pagerduty_api.breaker import CircuitBreaker, CircuitStates
+from pagerduty_api.exceptions import CircuitOpenException, PagerDutyAPIServerException
+from pagerduty_api.metrics import MetricsAggregator
+from pagerduty_api.retry import RetryPolicy
+from pagerduty_api.spool import EventSpool
+from pagerduty_api.tests.helpers import FakeClock
+
+
+class CircuitBreakerTests(TestCase):
+    """
+    Tests for CircuitBreaker
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_rate=0.5, min_requests=4, window_size=4, cool_down=10, clock=self.clock)
+
+    def fail(self, count):
+        for _ in range(count):
+            self.breaker.record(True, 0.1, self.breaker.acquire())
+
+    def test_opens_at_failure_rate(self):
+        """
+        Test the circuit opens once enough recent attempts failed
+        """
+        self.breaker.record(False, 0.1)
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CircuitStates.CLOSED)
+
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, CircuitStates.OPEN)
+        self.assertEqual(self.breaker.opened, 1)
+
+    def test_needs_min_requests(self):
+        """
+        Test a few failures don't open the circuit on their own
+        """
+        self.fail(3)
+
+        self.assertEqual(self.breaker.state, CircuitStates.CLOSED)
+
+    def test_open_rejects(self):
+        """
+        Test an open circuit fails fast with the time left to wait
+        """
+        self.fail(4)
+        self.clock.now = 4
+
+        with self.assertRaises(CircuitOpenException) as context:
+            self.breaker.acquire()
+
+        self.assertEqual(context.exception.retry_in, 6)
+        self.assertIsNone(context.exception.status_code)
+        self.assertEqual(self.breaker.rejected, 1)
+
+    def test_half_open_probe_closes(self):
+        """
+        Test a successful probe after the cool down closes the circuit
+        """
+        self.fail(4)
+        self.clock.now = 10
+
+        self.assertEqual(self.breaker.state, CircuitStates.HALF_OPEN)
+        self.assertTrue(self.breaker.acquire())
+        with self.assertRaises(CircuitOpenException):
+            self.breaker.acquire()
+
+        self.breaker.record(False, 0.1, probe=True)
+        self.assertEqual(self.breaker.state, CircuitStates.CLOSED)
+        self.assertFalse(self.breaker.acquire())
+
+    def test_half_open_probe_reopens(self):
+        """
+        Test a failed probe opens the circuit for another cool down
+        """
+        self.fail(4)
+        self.clock.now = 10
+
+        self.breaker.record(True, 0.1, self.breaker.acquire())
+
+        self.assertEqual(self.breaker.state, CircuitStates.OPEN)
+        self.clock.now = 19
+        self.assertEqual(self.breaker.state, CircuitStates.OPEN)
+        self.clock.now = 20
+        self.assertEqual(self.breaker.state, CircuitStates.HALF_OPEN)
+
+    def test_probes_all_pass(self):
+        """
+        Test the circuit only closes once every probe passed
+        """
+        breaker = CircuitBreaker(min_requests=1, window_size=1, cool_down=10, probes=2, clock=self.clock)
+        breaker.record(True, 0.1)
+        self.clock.now = 10
+
+        breaker.record(False, 0.1, breaker.acquire())
+        self.assertEqual(breaker.state, CircuitStates.HALF_OPEN)
+        breaker.record(False, 0.1, breaker.acquire())
+        self.assertEqual(breaker.state, CircuitStates.CLOSED)
+
+    def test_late_outcomes_ignored(self):
+        """
+        Test attempts finishing after the circuit left their state don't change it
+        """
+        self.fail(4)
+        self.breaker.record(False, 0.1)
+        self.clock.now = 10
+        probe = self.breaker.acquire()
+        self.breaker.reset()
+
+        self.breaker.record(True, 0.1, probe)
+
+        self.assertEqual(self.breaker.state, CircuitStates.CLOSED)
+        self.assertEqual(self.breaker.snapshot()['failure_rate'], 0.0)
+
+    def test_slow_calls_fail(self):
+        """
+        Test attempts slower than the slow call duration count as failures
+        """
+        breaker = CircuitBreaker(min_requests=2, window_size=2, slow_call_duration=1, clock=self.clock)
+        breaker.record(False, 1.5)
+        breaker.record(False, 2)
+
+        self.assertEqual(breaker.state, CircuitStates.OPEN)
+
+    def test_snapshot_and_reset(self):
+        """
+        Test the snapshot reports the state and counts
+        """
+        self.fail(4)
+
+        self.assertEqual(self.breaker.snapshot(), {
+            'state': CircuitStates.OPEN, 'failure_rate': 1.0, 'rejected': 0, 'opened': 1,
+        })
+        self.breaker.reset()
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitStates.CLOSED)
+
+
+class AlertCircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(min_requests=2, window_size=2, cool_down=10, clock=self.clock)
+        self.metrics = MetricsAggregator()
+        self.alert = Alert(
+            service_key='4baa5d20cfba466a5e075b02698f455c', circuit_breaker=self.breaker, hooks=[self.metrics]
+        )
+
+    @patch.object(requests.Session, 'post')
+    def test_fails_fast_while_open(self, mock_post):
+        """
+        Test events aren't sent while the circuit is open, and metrics show it
+        """
+        mock_post.side_effect = requests.ConnectionError('refused')
+        self.alert.retry_policy = RetryPolicy(max_attempts=5, backoff_base=0)
+
+        with self.assertRaises(CircuitOpenException) as context:
+            self.alert.trigger(description='No data received')
+        self.assertEqual(context.exception.attempts, 2)
+        self.assertEqual(mock_post.call_count, 2)
+
+        with self.assertRaises(CircuitOpenException):
+            self.alert.trigger(description='No data received')
+        self.assertEqual(mock_post.call_count, 2)
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['short_circuited'], 2)
+        self.assertEqual(snapshot['circuit_state'], CircuitStates.OPEN)
+
+    @patch.object(requests.Session, 'post')
+    def test_client_errors_dont_open(self, mock_post):
+        """
+        Test 4xx responses aren't counted against PagerDuty
+        """
+        mock_post.return_value.ok = False
+        mock_post.return_value.status_code = 400
+
+        for _ in range(3):
+            with self.assertRaises(PagerDutyAPIServerException):
+                self.alert.trigger(description='No data received')
+
+        self.assertEqual(self.breaker.state, CircuitStates.CLOSED)
+
+    @patch.object(requests.Session, 'post')
+    def test_probe_closes(self, mock_post):
+        """
+        Test the event sent after the cool down closes the circuit
+        """
+        mock_post.return_value.status_code = 200
+        self.breaker.record(True, 0)
+        self.breaker.record(True, 0)
+        self.clock.now = 10
+
+        self.alert.trigger(description='No data received')
+
+        self.assertEqual(self.breaker.state, CircuitStates.CLOSED)
+        self.assertEqual(mock_post.call_count, 1)
+
+    @patch.object(requests.Session, 'post')
+    def test_spooled_while_open(self, mock_post):
+        """
+        Test a spool takes events while the circuit is open
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.alert.spool = EventSpool(directory)
+        self.addCleanup(self.alert.spool.close)
+        self.breaker.record(True, 0)
+        self.breaker.record(True, 0)
+
+        response = self.alert.trigger(description='No data received')
+
+        self.assertEqual(response['status'], 'spooled')
+        self.assertFalse(mock_post.called)
+
+    @patch.object(requests.Session, 'post')
+    def test_fallback_while_open(self, mock_post):
+        """
+        Test the fallback gets events while the circuit is open
+        """
+        diverted = []
+        self.alert.fallback = lambda data: diverted.append(data) or {'status': 'diverted'}
+        self.breaker.record(True, 0)
+        self.breaker.record(True, 0)
+
+        response = self.alert.trigger(description='No data received', incident_key='web01')
+
+        self.assertEqual(response, {'status': 'diverted'})
+        self.assertEqual(diverted[0]['incident_key'], 'web01')
+        self.assertFalse(mock_post.called)
+
+    @patch.object(requests.Session, 'post')
+    def test_fallback_not_used_for_other_errors(self, mock_post):
+        """
+        Test the fallback only takes events stopped by the circuit breaker
+        """
+        mock_post.return_value.ok = False
+        mock_post.return_value.status_code = 500
+        self.alert.fallback = lambda data: {'status': 'diverted'}
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.alert.trigger(description='No data received')
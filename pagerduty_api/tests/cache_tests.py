@@ -0,0 +1,211 @@
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock
+
+from pagerduty_api.cache import NOT_MODIFIED, ResponseCache
+from pagerduty_api.tests.helpers import FakeClock
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Tests for ResponseCache
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(ttl=10, ttls={'oncalls': 1}, max_size=2, clock=self.clock)
+
+    def test_read_through(self):
+        """
+        Test a fresh entry is served without fetching again
+        """
+        fetch = Mock(return_value=({'id': 'P1'}, None))
+
+        self.assertEqual(self.cache.get('services', 'P1', fetch), {'id': 'P1'})
+        self.assertEqual(self.cache.get('services', 'P1', fetch), {'id': 'P1'})
+
+        fetch.assert_called_once_with(None)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_ttl_per_namespace(self):
+        """
+        Test entries expire after their namespace's time to live
+        """
+        fetch = Mock(return_value=('value', None))
+        self.cache.get('services', 'key', fetch)
+        self.cache.get('oncalls', 'key', fetch)
+
+        self.clock.now = 5
+        self.cache.get('services', 'key', fetch)
+        self.cache.get('oncalls', 'key', fetch)
+
+        self.assertEqual(fetch.call_count, 3)
+
+    def test_revalidates_with_etag(self):
+        """
+        Test an expired entry with an ETag is revalidated and kept if not modified
+        """
+        value = {'id': 'P1'}
+        self.cache.get('services', 'P1', Mock(return_value=(value, '"v1"')))
+        self.clock.now = 11
+        fetch = Mock(return_value=(NOT_MODIFIED, '"v1"'))
+
+        self.assertIs(self.cache.get('services', 'P1', fetch), value)
+        self.assertIs(self.cache.get('services', 'P1', fetch), value)
+
+        fetch.assert_called_once_with('"v1"')
+        self.assertEqual(self.cache.revalidated, 1)
+
+    def test_lru_eviction(self):
+        """
+        Test the least recently used entry is evicted once the cache is full
+        """
+        fetch = Mock(side_effect=lambda etag: ('value', None))
+        self.cache.get('services', 'a', fetch)
+        self.cache.get('services', 'b', fetch)
+        self.cache.get('services', 'a', fetch)
+        self.cache.get('services', 'c', fetch)
+
+        self.assertEqual(len(self.cache), 2)
+        self.cache.get('services', 'a', fetch)
+        self.cache.get('services', 'b', fetch)
+        self.assertEqual(fetch.call_count, 4)
+
+    def test_single_flight(self):
+        """
+        Test concurrent misses for a key share one fetch
+        """
+        release = threading.Event()
+        calls = []
+
+        def fetch(etag):
+            calls.append(etag)
+            release.wait(5)
+            return 'value', None
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get('services', 'P1', fetch)))
+            for _ in range(50)
+        ]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 50)
+
+    def test_fetch_error_not_cached(self):
+        """
+        Test a failed fetch raises and caches nothing
+        """
+        with self.assertRaises(ValueError):
+            self.cache.get('services', 'P1', Mock(side_effect=ValueError))
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.get('services', 'P1', Mock(return_value=('value', None))), 'value')
+
+    def test_single_flight_error(self):
+        """
+        Test concurrent misses waiting on a failed fetch raise its error
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch(etag):
+            started.set()
+            release.wait(5)
+            raise ValueError('Server down')
+
+        errors = []
+
+        def get():
+            try:
+                self.cache.get('services', 'P1', fetch)
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=get)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=get) for _ in range(5)]
+        for thread in followers:
+            thread.start()
+        # Let the followers reach the flight before it fails
+        time.sleep(0.05)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(len(errors), 6)
+        self.assertEqual(len(set(map(id, errors))), 1)
+
+    def test_invalidate(self):
+        """
+        Test entries can be forgotten by namespace and key
+        """
+        fetch = Mock(return_value=('value', None))
+        cache = ResponseCache(clock=self.clock)
+        cache.get('services', 'a', fetch)
+        cache.get('services', 'b', fetch)
+        cache.get('users', 'a', fetch)
+
+        self.assertEqual(cache.invalidate('services', lambda key: key == 'a'), 1)
+        self.assertEqual(cache.invalidate('services'), 1)
+        self.assertEqual(cache.invalidate(), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_during_fetch(self):
+        """
+        Test a fetch that was in progress when its key was invalidated isn't cached
+        """
+        def fetch(etag):
+            self.cache.invalidate('services', lambda key: key == 'P1')
+            return 'old', None
+
+        self.assertEqual(self.cache.get('services', 'P2', fetch), 'old')
+        self.assertEqual(self.cache.get('services', 'P1', fetch), 'old')
+
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get('services', 'P1', Mock(return_value=('new', None))), 'new')
+
+    def test_clear_during_fetch(self):
+        """
+        Test a miss after the cache was cleared doesn't wait on the stale fetch
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def stale_fetch(etag):
+            started.set()
+            release.wait(5)
+            return 'old', None
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(self.cache.get('services', 'P1', stale_fetch)))
+        leader.start()
+        started.wait(5)
+
+        self.cache.clear()
+        fresh_fetch = Mock(side_effect=lambda etag: release.set() or ('new', None))
+        self.assertEqual(self.cache.get('services', 'P1', fresh_fetch), 'new')
+        leader.join()
+
+        self.assertEqual(results, ['old'])
+        self.assertEqual(self.cache.get('services', 'P1', stale_fetch), 'new')
+        self.assertEqual(fresh_fetch.call_count, 1)
+
+    def test_clear(self):
+        """
+        Test every entry is forgotten
+        """
+        self.cache.get('services', 'P1', Mock(return_value=('value', None)))
+        self.cache.get('users', 'P1', Mock(return_value=('value', None)))
+
+        self.cache.clear()
+
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,133 @@
+import json
+from unittest import TestCase
+
+import requests
+from mock import patch
+
+from pagerduty_api.alerts import Alert
+from pagerduty_api.dedup import EventDeduplicator
+from pagerduty_api.exceptions import PagerDutyAPIServerException
+from pagerduty_api.tests.helpers import FakeClock
+
+
+class EventDeduplicatorTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.dedup = EventDeduplicator(window=10, clock=self.clock)
+
+    def send(self, incident_key='a', event_type='trigger', service_key='s', dedup=None):
+        return (self.dedup if dedup is None else dedup).check(service_key, incident_key, event_type)[0]
+
+    def test_repeats_suppressed_within_window(self):
+        """
+        Test the same event is suppressed until the window passes
+        """
+        self.assertTrue(self.send())
+        self.clock.now = 5
+        self.assertFalse(self.send())
+        self.assertFalse(self.send())
+        self.clock.now = 10
+        self.assertEqual(self.dedup.check('s', 'a', 'trigger'), (True, 2))
+
+        self.assertEqual(self.dedup.suppressed, 2)
+
+    def test_transitions_go_through(self):
+        """
+        Test a change of event type is always sent
+        """
+        self.assertTrue(self.send(event_type='trigger'))
+        self.assertTrue(self.send(event_type='resolve'))
+        self.assertTrue(self.send(event_type='trigger'))
+        self.assertFalse(self.send(event_type='trigger'))
+
+    def test_keys_are_separate(self):
+        """
+        Test incidents and services are deduplicated separately
+        """
+        self.assertTrue(self.send(incident_key='a'))
+        self.assertTrue(self.send(incident_key='b'))
+        self.assertTrue(self.send(incident_key='a', service_key='t'))
+
+    def test_bounded_size(self):
+        """
+        Test the least recently sent incidents are forgotten
+        """
+        dedup = EventDeduplicator(window=10, max_size=2, clock=self.clock)
+        for key in 'abc':
+            self.send(incident_key=key, dedup=dedup)
+
+        self.assertEqual(len(dedup), 2)
+        self.assertTrue(self.send(incident_key='a', dedup=dedup))
+        self.assertFalse(self.send(incident_key='c', dedup=dedup))
+
+    def test_expired_entries_are_dropped(self):
+        """
+        Test incidents are forgotten once their window passes
+        """
+        self.send(incident_key='a')
+        self.clock.now = 20
+        self.send(incident_key='b')
+
+        self.assertEqual(len(self.dedup), 1)
+
+    def test_forget_and_clear(self):
+        """
+        Test forgotten incidents are sent again
+        """
+        self.send(incident_key='a')
+        self.send(incident_key='b')
+        self.dedup.forget('s', 'a')
+
+        self.assertTrue(self.send(incident_key='a'))
+        self.dedup.clear()
+        self.assertEqual(len(self.dedup), 0)
+
+
+class AlertDeduplicationTests(TestCase):
+
+    def setUp(self):
+        self.alert = Alert(service_key='4baa5d20cfba466a5e075b02698f455c', deduplicator=EventDeduplicator())
+
+    @patch.object(requests.Session, 'post')
+    def test_repeat_trigger_not_sent(self, mock_post):
+        """
+        Test a repeated trigger is suppressed but the resolve is sent
+        """
+        self.alert.trigger(description='No data received')
+        response = self.alert.trigger(description='No data received')
+        self.alert.resolve()
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(response['status'], 'suppressed')
+        self.assertEqual(response['incident_key'], self.alert.incident_key)
+        self.assertEqual(self.alert.deduplicator.suppressed, 1)
+
+    @patch.object(requests.Session, 'post')
+    def test_failed_event_not_remembered(self, mock_post):
+        """
+        Test an event that failed to send isn't suppressed when retried
+        """
+        mock_post.return_value.ok = False
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.alert.trigger(description='No data received')
+
+        mock_post.return_value.ok = True
+        self.alert.trigger(description='No data received')
+
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch.object(requests.Session, 'post')
+    def test_coalesce(self, mock_post):
+        """
+        Test the next sent event carries the number of suppressed repeats
+        """
+        alert = Alert(service_key='4baa5d20cfba466a5e075b02698f455c', deduplicator=EventDeduplicator(coalesce=True))
+        alert.trigger(description='No data received')
+        alert.trigger(description='No data received')
+        alert.trigger(description='No data received')
+        alert.resolve(details={'host': 'web01'})
+
+        details = json.loads(mock_post.call_args[1]['data'])['details']
+        self.assertEqual(details, {'host': 'web01', 'suppressed_events': 2})
@@ -0,0 +1,192 @@
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock
+
+from pagerduty_api.alerts import Alert
+from pagerduty_api.dispatcher import AlertDispatcher, OverflowPolicies
+from pagerduty_api.exceptions import DispatcherException, IncidentKeyException
+
+
+class BlockingAlert(Alert):
+    """
+    An alert whose sends wait until released
+    """
+    def __init__(self, *args, **kwargs):
+        super(BlockingAlert, self).__init__(*args, **kwargs)
+        self.release = threading.Event()
+        self.sent = []
+
+    def _send(self, data):
+        self.release.wait(5)
+        self.sent.append(data)
+        return {'status': 'success', 'incident_key': data['incident_key']}
+
+
+class AlertDispatcherTests(TestCase):
+
+    def setUp(self):
+        self.alert = BlockingAlert(service_key='4baa5d20cfba466a5e075b02698f455c')
+
+    def test_events_are_sent(self):
+        """
+        Test queued events are sent and their futures resolve to the response
+        """
+        self.alert.release.set()
+        with AlertDispatcher(self.alert, workers=3) as dispatcher:
+            trigger = dispatcher.trigger(description='No data received', incident_key='a')
+            ack = dispatcher.acknowledge()
+            resolve = dispatcher.resolve(incident_key='b')
+
+            self.assertTrue(dispatcher.flush(timeout=5))
+
+        self.assertEqual(trigger.result(), {'status': 'success', 'incident_key': 'a'})
+        self.assertEqual(ack.result()['incident_key'], 'a')
+        self.assertEqual(resolve.result()['incident_key'], 'b')
+        self.assertEqual(len(self.alert.sent), 3)
+
+    def test_incident_order_kept(self):
+        """
+        Test events for one incident are sent in turn while other incidents are sent at once
+        """
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def send(data):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            # A trigger sent at the same time as its resolve would finish after it
+            time.sleep(0.02 if data['event_type'] == 'trigger' else 0)
+            with lock:
+                state['active'] -= 1
+                self.alert.sent.append(data)
+            return {'status': 'success'}
+        self.alert._send = send
+
+        with AlertDispatcher(self.alert, workers=4) as dispatcher:
+            for i in range(10):
+                dispatcher.trigger(description='No data received', incident_key=str(i))
+                dispatcher.resolve(incident_key=str(i))
+
+        for i in range(10):
+            self.assertEqual([d['event_type'] for d in self.alert.sent if d['incident_key'] == str(i)],
+                             ['trigger', 'resolve'])
+        self.assertGreater(state['peak'], 1)
+
+    def test_send_errors_are_set_on_future(self):
+        """
+        Test an error while sending fails the event's future
+        """
+        alert = Alert(service_key='4baa5d20cfba466a5e075b02698f455c')
+        alert._send = Mock(side_effect=RuntimeError('boom'))
+
+        with AlertDispatcher(alert) as dispatcher:
+            future = dispatcher.trigger(description='No data received')
+
+        self.assertIsInstance(future.exception(), RuntimeError)
+
+    def test_build_errors_raise(self):
+        """
+        Test an event that can't be built raises immediately
+        """
+        with AlertDispatcher(self.alert) as dispatcher:
+            with self.assertRaises(IncidentKeyException):
+                dispatcher.resolve()
+
+    def test_drop_newest(self):
+        """
+        Test the new event is dropped when the queue is full
+        """
+        dispatcher = AlertDispatcher(self.alert, workers=1, max_queue_size=1, overflow=OverflowPolicies.DROP_NEWEST)
+        in_flight = dispatcher.resolve(incident_key='0')
+        while dispatcher._queue:
+            pass
+        queued = dispatcher.resolve(incident_key='1')
+        dropped = dispatcher.resolve(incident_key='2')
+
+        self.assertIsInstance(dropped.exception(), DispatcherException)
+        self.alert.release.set()
+        dispatcher.close()
+
+        self.assertTrue(in_flight.result())
+        self.assertTrue(queued.result())
+        self.assertEqual(dispatcher.dropped, 1)
+        self.assertEqual([d['incident_key'] for d in self.alert.sent], ['0', '1'])
+
+    def test_drop_oldest(self):
+        """
+        Test the oldest waiting event is dropped when the queue is full
+        """
+        dispatcher = AlertDispatcher(self.alert, workers=1, max_queue_size=1, overflow=OverflowPolicies.DROP_OLDEST)
+        dispatcher.resolve(incident_key='0')
+        while dispatcher._queue:
+            pass
+        dropped = dispatcher.resolve(incident_key='1')
+        queued = dispatcher.resolve(incident_key='2')
+
+        self.assertIsInstance(dropped.exception(), DispatcherException)
+        self.alert.release.set()
+        dispatcher.close()
+
+        self.assertTrue(queued.result())
+        self.assertEqual([d['incident_key'] for d in self.alert.sent], ['0', '2'])
+
+    def test_block_timeout(self):
+        """
+        Test a blocked event is dropped once the block timeout passes
+        """
+        dispatcher = AlertDispatcher(self.alert, workers=1, max_queue_size=1, block_timeout=0.01)
+        dispatcher.resolve(incident_key='0')
+        while dispatcher._queue:
+            pass
+        dispatcher.resolve(incident_key='1')
+        dropped = dispatcher.resolve(incident_key='2')
+
+        self.assertIsInstance(dropped.exception(), DispatcherException)
+        self.assertFalse(dispatcher.flush(timeout=0.01))
+        self.alert.release.set()
+        self.assertTrue(dispatcher.close(timeout=5))
+
+    def test_block_until_room(self):
+        """
+        Test a blocked event is queued once there is room, and cancelled events aren't sent
+        """
+        dispatcher = AlertDispatcher(self.alert, workers=1, max_queue_size=1)
+        dispatcher.resolve(incident_key='0')
+        while dispatcher._queue:
+            pass
+        cancelled = dispatcher.resolve(incident_key='1')
+        blocked = []
+        thread = threading.Thread(target=lambda: blocked.append(dispatcher.resolve(incident_key='2')))
+        thread.start()
+        # Let the event block on the full queue
+        time.sleep(0.05)
+
+        self.assertTrue(cancelled.cancel())
+        self.alert.release.set()
+        thread.join()
+        self.assertTrue(dispatcher.close(timeout=5))
+
+        self.assertEqual(blocked[0].result(), {'status': 'success', 'incident_key': '2'})
+        self.assertEqual([d['incident_key'] for d in self.alert.sent], ['0', '2'])
+        self.assertEqual(dispatcher.dropped, 0)
+
+    def test_closed(self):
+        """
+        Test a closed dispatcher refuses events
+        """
+        self.alert.release.set()
+        dispatcher = AlertDispatcher(self.alert)
+        dispatcher.close()
+
+        with self.assertRaises(DispatcherException):
+            dispatcher.trigger(description='No data received')
+
+    def test_unknown_policy(self):
+        """
+        Test an unknown overflow policy is refused
+        """
+        with self.assertRaises(ValueError):
+            AlertDispatcher(self.alert, overflow='sometimes')
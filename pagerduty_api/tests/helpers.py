@@ -0,0 +1,12 @@
+class FakeClock(object):
+    """
+    A clock for tests to move by hand, standing in for ``time.time`` and ``time.sleep``
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
@@ -0,0 +1,163 @@
+import datetime
+from unittest import TestCase
+
+import requests
+from mock import Mock, patch
+
+from pagerduty_api import base
+from pagerduty_api.alerts import Alert
+from pagerduty_api.exceptions import PagerDutyAPIServerException
+from pagerduty_api.metrics import MetricsAggregator, RequestHooks, RequestInfo, emit
+from pagerduty_api.retry import RetryPolicy
+
+
+class RecordingHooks(RequestHooks):
+
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, info):
+        self.calls.append(('before_request', info.event_type, info.status_code))
+
+    def after_response(self, info):
+        self.calls.append(('after_response', info.event_type, info.status_code))
+
+    def on_error(self, info):
+        self.calls.append(('on_error', info.event_type, info.status_code))
+
+
+def response(status_code):
+    return Mock(
+        ok=status_code < 400, status_code=status_code, text='', headers={},
+        elapsed=datetime.timedelta(milliseconds=5)
+    )
+
+
+class ResourceHooksTests(TestCase):
+
+    def setUp(self):
+        self.hooks = RecordingHooks()
+        self.metrics = MetricsAggregator()
+        self.alert = Alert(
+            service_key='4baa5d20cfba466a5e075b02698f455c', hooks=[self.hooks, self.metrics],
+            retry_policy=RetryPolicy(random=lambda: 0),
+        )
+
+    @patch.object(base.time, 'sleep')
+    @patch.object(requests.Session, 'post')
+    def test_success(self, mock_post, mock_sleep):
+        """
+        Test hooks see the event, status, size, timings and retries of a request
+        """
+        mock_post.side_effect = [response(503), response(200)]
+
+        self.alert.trigger(description='No data received', incident_key='a')
+
+        self.assertEqual(self.hooks.calls, [
+            ('before_request', 'trigger', None),
+            ('after_response', 'trigger', 200),
+        ])
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['requests'], 1)
+        self.assertEqual(snapshot['successes'], 1)
+        self.assertEqual(snapshot['retries'], 1)
+        self.assertEqual(snapshot['in_flight'], 0)
+        self.assertEqual(snapshot['by_status'], {200: 1})
+        self.assertEqual(snapshot['by_event_type'], {'trigger': 1})
+        self.assertGreater(snapshot['bytes_sent'], 0)
+        self.assertIsNotNone(snapshot['p99'])
+
+    @patch.object(requests.Session, 'post')
+    def test_error(self, mock_post):
+        """
+        Test on_error is called once a request fails for good
+        """
+        mock_post.return_value = response(400)
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.alert.resolve(incident_key='a')
+
+        self.assertEqual(self.hooks.calls[-1], ('on_error', 'resolve', 400))
+        self.assertEqual(self.metrics.errors, 1)
+
+    @patch.object(requests.Session, 'post')
+    def test_unexpected_error(self, mock_post):
+        """
+        Test on_error is called for errors the transport doesn't wrap
+        """
+        mock_post.side_effect = requests.exceptions.ChunkedEncodingError('Connection broken')
+
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            self.alert.trigger(description='No data received')
+
+        self.assertEqual(self.hooks.calls[-1], ('on_error', 'trigger', None))
+        self.assertEqual((self.metrics.in_flight, self.metrics.errors), (0, 1))
+
+    @patch.object(requests.Session, 'post')
+    def test_broken_hook_is_ignored(self, mock_post):
+        """
+        Test an exception in a hook doesn't stop the request
+        """
+        mock_post.return_value = response(200)
+        self.hooks.before_request = Mock(side_effect=RuntimeError('boom'))
+
+        self.alert.trigger(description='No data received')
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(self.metrics.successes, 1)
+
+
+class MetricsAggregatorTests(TestCase):
+
+    def finish(self, metrics, total, status_code=200):
+        info = RequestInfo(event_type='trigger')
+        info.status_code = status_code
+        info.attempts = 1
+        info.total = total
+        metrics.before_request(info)
+        metrics.after_response(info)
+
+    def test_percentiles(self):
+        """
+        Test percentiles are taken from recent latencies
+        """
+        metrics = MetricsAggregator(max_samples=100)
+        self.assertIsNone(metrics.percentile(50))
+
+        for ms in range(1, 201):
+            self.finish(metrics, ms / 1000.0)
+
+        self.assertAlmostEqual(metrics.percentile(50), 0.150, delta=0.0015)
+        self.assertAlmostEqual(metrics.percentile(99), 0.199, delta=0.001)
+        self.assertEqual(metrics.percentile(0), 0.101)
+
+    def test_reset(self):
+        """
+        Test reset forgets everything
+        """
+        metrics = MetricsAggregator()
+        self.finish(metrics, 0.1)
+        metrics.reset()
+
+        self.assertEqual(metrics.snapshot()['requests'], 0)
+        self.assertIsNone(metrics.snapshot()['p50'])
+
+
+class RequestInfoTests(TestCase):
+
+    def test_for_payload(self):
+        """
+        Test the event type and incident key are read from the payload
+        """
+        info = RequestInfo.for_payload('url', {'event_type': 'trigger', 'incident_key': 'a'})
+
+        self.assertEqual((info.url, info.event_type, info.incident_key, info.retries), ('url', 'trigger', 'a', 0))
+        self.assertIsNone(RequestInfo.for_payload('url', b'{}').event_type)
+
+    def test_default_hooks_do_nothing(self):
+        """
+        Test the base hooks can be called
+        """
+        emit([RequestHooks()], 'before_request', RequestInfo())
+        emit([RequestHooks()], 'after_response', RequestInfo())
+        emit([RequestHooks()], 'on_error', RequestInfo())
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+from unittest import TestCase
+
+import requests
+from mock import patch
+
+from pagerduty_api import ratelimit
+from pagerduty_api.alerts import Alert
+from pagerduty_api.exceptions import RateLimitException
+from pagerduty_api.ratelimit import RateLimiter
+from pagerduty_api.tests.helpers import FakeClock
+
+
+class RateLimiterTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch.object(ratelimit.time, 'sleep', side_effect=self.clock.sleep)
+        self.mock_sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unlimited(self):
+        """
+        Test a limiter without rates never waits
+        """
+        limiter = RateLimiter(clock=self.clock)
+
+        for _ in range(100):
+            self.assertEqual(limiter.acquire('a'), 0)
+        self.assertIsNone(limiter.tokens())
+        self.assertIsNone(limiter.tokens('a'))
+        self.assertEqual(limiter.wait_time('a'), 0)
+
+    def test_global_burst_then_wait(self):
+        """
+        Test the burst capacity is used before callers wait at the refill rate
+        """
+        limiter = RateLimiter(rate=2, capacity=3, clock=self.clock)
+
+        waits = [limiter.acquire('a') for _ in range(5)]
+
+        self.assertEqual(waits, [0, 0, 0, 0.5, 0.5])
+        self.assertEqual(limiter.throttled, 2)
+        self.assertEqual(limiter.waited, 1)
+        self.assertEqual(self.clock.now, 1)
+
+    def test_per_key(self):
+        """
+        Test each service key has its own bucket
+        """
+        limiter = RateLimiter(per_key_rate=1, key_rates={'fast': (10, 10)}, clock=self.clock)
+
+        limiter.acquire('a')
+        self.assertEqual(limiter.tokens('a'), 0)
+        self.assertEqual(limiter.wait_time('a'), 1)
+        self.assertEqual(limiter.wait_time('b'), 0)
+        self.assertEqual(limiter.tokens('fast'), 10)
+        self.assertEqual(limiter.acquire(), 0)
+
+    def test_idle_buckets_forgotten(self):
+        """
+        Test buckets of idle keys are forgotten once full, and keys still refilling are kept
+        """
+        patcher = patch.object(ratelimit, 'MIN_SWEEP_SIZE', 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        limiter = RateLimiter(per_key_rate=1, per_key_capacity=2, key_rates={'free': (None, None)}, clock=self.clock)
+        for key in ['a', 'b', 'free']:
+            limiter.acquire(key)
+        self.clock.now = 1
+        limiter.acquire('c')
+        limiter.acquire('c')
+
+        limiter.acquire('d')
+
+        self.assertEqual(sorted(limiter._buckets), ['c', 'd'])
+        self.assertEqual(limiter._sweep_at, 4)
+        self.assertEqual(limiter.wait_time('c'), 1)
+
+    def test_fail_fast(self):
+        """
+        Test a non blocking limiter raises without taking a token
+        """
+        limiter = RateLimiter(rate=1, block=False, clock=self.clock)
+        limiter.acquire()
+
+        with self.assertRaises(RateLimitException) as cm:
+            limiter.acquire()
+
+        self.assertEqual(cm.exception.wait, 1)
+        self.assertEqual(limiter.rejected, 1)
+        self.clock.now = 1
+        self.assertEqual(limiter.acquire(), 0)
+
+    def test_max_wait(self):
+        """
+        Test callers don't wait longer than max_wait
+        """
+        limiter = RateLimiter(rate=1, max_wait=0.5, clock=self.clock)
+        limiter.acquire()
+        self.clock.now = 0.5
+        limiter.acquire()
+
+        with self.assertRaises(RateLimitException):
+            limiter.acquire()
+
+    def test_threads(self):
+        """
+        Test tokens aren't handed out twice across threads
+        """
+        limiter = RateLimiter(rate=1, capacity=50, block=False, clock=self.clock)
+        acquired = []
+
+        def run():
+            for _ in range(20):
+                try:
+                    acquired.append(limiter.acquire())
+                except RateLimitException:
+                    pass
+
+        threads = [threading.Thread(target=run) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(acquired), 50)
+        self.assertEqual(limiter.rejected, 50)
+
+    def test_acquire_async(self):
+        """
+        Test the async variant waits with asyncio
+        """
+        limiter = RateLimiter(rate=100, capacity=1, clock=self.clock)
+
+        async def run():
+            return [await limiter.acquire_async('a') for _ in range(2)]
+
+        self.assertEqual(asyncio.run(run()), [0, 0.01])
+        self.assertFalse(self.mock_sleep.called)
+
+
+class AlertRateLimitTests(TestCase):
+
+    @patch.object(requests.Session, 'post')
+    def test_alert_takes_token_per_service_key(self, mock_post):
+        """
+        Test an alert takes a token for the event's service key before posting
+        """
+        limiter = RateLimiter(per_key_rate=1, block=False)
+        alert = Alert(service_key='4baa5d20cfba466a5e075b02698f455c', rate_limiter=limiter)
+
+        alert.trigger(description='No data received')
+        with self.assertRaises(RateLimitException):
+            alert.resolve()
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertLess(limiter.tokens(alert.service_key), 1)
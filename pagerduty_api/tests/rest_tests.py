@@ -0,0 +1,553 @@
+import datetime
+import json
+import threading
+import time
+from unittest import TestCase
+
+import requests
+
+from mock import patch, Mock
+
+from pagerduty_api.batch import EventResult
+from pagerduty_api.cache import ResponseCache
+from pagerduty_api.exceptions import ConfigurationException, PagerDutyAPIServerException
+from pagerduty_api.ratelimit import RateLimiter
+from pagerduty_api.rest import AuditRecords, BulkResult, Incidents, OnCalls, Services, to_isoformat, to_timestamp
+
+
+def page_response(payload):
+    return Mock(name='response', ok=True, status_code=200, json=Mock(return_value=payload))
+
+
+def fake_incidents(count, delays=None):
+    """
+    Returns a fake get for an offset paginated list of ``count`` incidents,
+    sleeping ``delays[offset]`` seconds before answering a page
+    """
+    def get(url, params, **kwargs):
+        offset, limit = params['offset'], params['limit']
+        time.sleep((delays or {}).get(offset, 0))
+        payload = {
+            'incidents': [{'id': i} for i in range(offset, min(offset + limit, count))],
+            'more': offset + limit < count,
+        }
+        if params.get('total'):
+            payload['total'] = count
+        return page_response(payload)
+    return get
+
+
+class RestResourceTests(TestCase):
+    """
+    Tests for RestResource, through its subclasses
+    """
+
+    @patch.object(requests.Session, 'get')
+    def test_get_unwraps_singular(self, mock_get):
+        """
+        Test .get() returns the object inside its singular key
+        """
+        mock_get.return_value = page_response({'service': {'id': 'P1'}})
+
+        service = Services(api_key='123').get('P1', **{'include[]': ['teams']})
+
+        self.assertEqual(service, {'id': 'P1'})
+        self.assertEqual(mock_get.call_args[1]['url'], 'https://api.pagerduty.com/services/P1')
+        self.assertEqual(mock_get.call_args[1]['params'], {'include[]': ['teams']})
+        self.assertEqual(mock_get.call_args[1]['headers']['Authorization'], 'Token token=123')
+
+    @patch.object(requests.Session, 'get')
+    def test_list_is_lazy(self, mock_get):
+        """
+        Test .list() doesn't request anything until it is iterated
+        """
+        mock_get.return_value = page_response({'incidents': [], 'more': False})
+
+        incidents = Incidents(api_key='123').list()
+
+        self.assertFalse(mock_get.called)
+        self.assertEqual(list(incidents), [])
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch.object(requests.Session, 'get')
+    def test_list_offset_pagination(self, mock_get):
+        """
+        Test .list() follows offsets until 'more' is false
+        """
+        mock_get.side_effect = [
+            page_response({'incidents': [{'id': 1}, {'id': 2}], 'more': True}),
+            page_response({'incidents': [{'id': 3}], 'more': False}),
+        ]
+
+        incidents = list(Incidents(api_key='123').list(page_size=2, prefetch=False, **{'statuses[]': ['triggered']}))
+
+        self.assertEqual(incidents, [{'id': 1}, {'id': 2}, {'id': 3}])
+        params = [call[1]['params'] for call in mock_get.call_args_list]
+        self.assertEqual(params, [
+            {'statuses[]': ['triggered'], 'limit': 2, 'offset': 0},
+            {'statuses[]': ['triggered'], 'limit': 2, 'offset': 2},
+        ])
+
+    @patch.object(requests.Session, 'get')
+    def test_list_prefetches_next_page(self, mock_get):
+        """
+        Test the next page is fetched while the current one is consumed
+        """
+        fetched = threading.Event()
+
+        def get(url, params, **kwargs):
+            if params['offset']:
+                fetched.set()
+                return page_response({'services': [{'id': 2}], 'more': False})
+            return page_response({'services': [{'id': 1}], 'more': True})
+        mock_get.side_effect = get
+
+        services = Services(api_key='123').list(page_size=1)
+
+        self.assertEqual(next(services), {'id': 1})
+        self.assertTrue(fetched.wait(5))
+        self.assertEqual(list(services), [{'id': 2}])
+
+    @patch.object(requests.Session, 'get')
+    def test_list_stops_early(self, mock_get):
+        """
+        Test pages aren't fetched past the point iteration stops
+        """
+        mock_get.return_value = page_response({'oncalls': [{'id': 1}, {'id': 2}], 'more': True})
+
+        oncalls = OnCalls(api_key='123').list(prefetch=False)
+        self.assertEqual(next(oncalls), {'id': 1})
+        oncalls.close()
+
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch.object(requests.Session, 'get')
+    def test_list_cursor_pagination(self, mock_get):
+        """
+        Test cursor paginated collections follow next_cursor
+        """
+        mock_get.side_effect = [
+            page_response({'records': [{'id': 1}], 'next_cursor': 'abc'}),
+            page_response({'records': [{'id': 2}], 'next_cursor': None}),
+        ]
+
+        records = list(AuditRecords(api_key='123').list(page_size=1))
+
+        self.assertEqual(records, [{'id': 1}, {'id': 2}])
+        params = [call[1]['params'] for call in mock_get.call_args_list]
+        self.assertEqual(params, [{'limit': 1}, {'limit': 1, 'cursor': 'abc'}])
+
+    @patch.object(requests.Session, 'get')
+    def test_incident_log_entries(self, mock_get):
+        """
+        Test an incident's log entries are listed from its sub-collection
+        """
+        mock_get.return_value = page_response({'log_entries': [{'id': 'L1'}], 'more': False})
+
+        entries = list(Incidents(api_key='123').log_entries('P1'))
+
+        self.assertEqual(entries, [{'id': 'L1'}])
+        self.assertEqual(mock_get.call_args[1]['url'], 'https://api.pagerduty.com/incidents/P1/log_entries')
+
+
+class ParallelListTests(TestCase):
+    """
+    Tests for RestResource.list() with workers
+    """
+
+    @patch.object(requests.Session, 'get')
+    def test_ordered(self, mock_get):
+        """
+        Test parallel pages are yielded in order even when they arrive out of order
+        """
+        mock_get.side_effect = fake_incidents(10, delays={2: 0.05})
+
+        incidents = list(Incidents(api_key='123').list(page_size=2, workers=4))
+
+        self.assertEqual(incidents, [{'id': i} for i in range(10)])
+        self.assertEqual(mock_get.call_count, 5)
+        self.assertEqual(mock_get.call_args_list[0][1]['params']['total'], 'true')
+
+    @patch.object(requests.Session, 'get')
+    def test_as_completed(self, mock_get):
+        """
+        Test unordered pages are yielded as they arrive
+        """
+        mock_get.side_effect = fake_incidents(6, delays={2: 0.1})
+
+        incidents = list(Incidents(api_key='123').list(page_size=2, workers=2, ordered=False))
+
+        self.assertEqual(incidents, [{'id': i} for i in (0, 1, 4, 5, 2, 3)])
+
+    @patch.object(requests.Session, 'get')
+    def test_without_total(self, mock_get):
+        """
+        Test listing carries on serially if PagerDuty doesn't return a total
+        """
+        counted = fake_incidents(5)
+
+        def get(url, params, **kwargs):
+            return counted(url, dict(params, total=None), **kwargs)
+        mock_get.side_effect = get
+
+        incidents = list(Incidents(api_key='123').list(page_size=2, workers=4))
+
+        self.assertEqual(incidents, [{'id': i} for i in range(5)])
+        self.assertEqual(mock_get.call_count, 3)
+
+    @patch.object(requests.Session, 'get')
+    def test_single_page(self, mock_get):
+        """
+        Test a list that fits on the first page needs one request
+        """
+        mock_get.side_effect = fake_incidents(2)
+
+        incidents = list(Incidents(api_key='123').list(page_size=2, workers=4))
+
+        self.assertEqual(incidents, [{'id': 0}, {'id': 1}])
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch.object(requests.Session, 'get')
+    def test_stops_early(self, mock_get):
+        """
+        Test pages not yet fetched are cancelled when the caller stops iterating
+        """
+        mock_get.side_effect = fake_incidents(100, delays={2: 0.05})
+
+        incidents = Incidents(api_key='123').list(page_size=2, workers=2)
+        first = [next(incidents) for _ in range(3)]
+        incidents.close()
+
+        self.assertEqual(first, [{'id': 0}, {'id': 1}, {'id': 2}])
+        self.assertLess(mock_get.call_count, 10)
+
+    @patch.object(requests.Session, 'get')
+    def test_cursor_pagination_is_serial(self, mock_get):
+        """
+        Test cursor paginated collections ignore workers
+        """
+        mock_get.side_effect = [
+            page_response({'records': [{'id': 1}], 'next_cursor': 'abc'}),
+            page_response({'records': [{'id': 2}], 'next_cursor': None}),
+        ]
+
+        records = list(AuditRecords(api_key='123').list(page_size=1, workers=4))
+
+        self.assertEqual(records, [{'id': 1}, {'id': 2}])
+        self.assertNotIn('total', mock_get.call_args_list[0][1]['params'])
+
+    @patch.object(requests.Session, 'get')
+    def test_rate_limited(self, mock_get):
+        """
+        Test every page request takes a token keyed by the api key
+        """
+        mock_get.side_effect = fake_incidents(6)
+        rate_limiter = Mock(spec=RateLimiter)
+
+        list(Incidents(api_key='123', rate_limiter=rate_limiter).list(page_size=2, workers=2))
+
+        self.assertEqual(rate_limiter.acquire.call_count, 3)
+        rate_limiter.acquire.assert_called_with('123')
+
+
+class CachedRestResourceTests(TestCase):
+    """
+    Tests for RestResource with a cache
+    """
+
+    @patch.object(requests.Session, 'get')
+    def test_get_is_cached(self, mock_get):
+        """
+        Test repeated gets are served from the cache
+        """
+        mock_get.return_value = page_response({'service': {'id': 'P1'}})
+        mock_get.return_value.headers = {}
+        services = Services(api_key='123', cache=ResponseCache())
+
+        self.assertEqual(services.get('P1'), {'id': 'P1'})
+        self.assertEqual(services.get('P1'), {'id': 'P1'})
+
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch.object(requests.Session, 'get')
+    def test_rate_limited(self, mock_get):
+        """
+        Test only requests the cache can't answer take a token
+        """
+        mock_get.return_value = page_response({'service': {'id': 'P1'}})
+        mock_get.return_value.headers = {}
+        rate_limiter = Mock(spec=RateLimiter)
+        services = Services(api_key='123', cache=ResponseCache(), rate_limiter=rate_limiter)
+
+        services.get('P1')
+        services.get('P1')
+
+        rate_limiter.acquire.assert_called_once_with('123')
+
+    @patch.object(requests.Session, 'get')
+    def test_revalidates_with_etag(self, mock_get):
+        """
+        Test an expired response is revalidated with If-None-Match
+        """
+        ok = page_response({'service': {'id': 'P1'}})
+        ok.headers = {'ETag': '"v1"'}
+        not_modified = Mock(name='response', ok=True, status_code=304, headers={})
+        mock_get.side_effect = [ok, not_modified]
+        services = Services(api_key='123', cache=ResponseCache(ttl=0))
+
+        self.assertEqual(services.get('P1'), {'id': 'P1'})
+        self.assertEqual(services.get('P1'), {'id': 'P1'})
+
+        self.assertNotIn('If-None-Match', mock_get.call_args_list[0][1]['headers'])
+        self.assertEqual(mock_get.call_args_list[1][1]['headers']['If-None-Match'], '"v1"')
+        self.assertNotIn('If-None-Match', services.headers)
+
+    @patch.object(requests.Session, 'get')
+    def test_invalidate(self, mock_get):
+        """
+        Test an object's cached response can be forgotten
+        """
+        mock_get.return_value = page_response({'service': {'id': 'P1'}})
+        mock_get.return_value.headers = {}
+        services = Services(api_key='123', cache=ResponseCache())
+        services.get('P1')
+        services.get('P2')
+
+        self.assertEqual(services.invalidate('P1'), 1)
+        services.get('P1')
+
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(services.invalidate(), 2)
+        self.assertEqual(Services(api_key='123').invalidate(), 0)
+
+
+def fake_bulk_update(fail_ids=()):
+    """
+    Returns a fake put that echoes back the incidents of a bulk update, failing
+    with a 400 any request that includes one of ``fail_ids``
+    """
+    def put(url, data, **kwargs):
+        incidents = json.loads(data)['incidents']
+        if any(incident['id'] in fail_ids for incident in incidents):
+            return Mock(name='response', ok=False, status_code=400, text='Invalid incident')
+        return page_response({'incidents': incidents})
+    return put
+
+
+class BulkIncidentTests(TestCase):
+    """
+    Tests for the bulk operations of Incidents
+    """
+
+    def setUp(self):
+        self.incidents = Incidents(api_key='123', from_email='ops@example.com')
+
+    @patch.object(requests.Session, 'put')
+    def test_resolve_many_chunks(self, mock_put):
+        """
+        Test incidents are resolved in chunks, as the user given by from_email
+        """
+        mock_put.side_effect = fake_bulk_update()
+        ids = ['P{0}'.format(i) for i in range(600)]
+
+        result = self.incidents.resolve_many(ids, resolution='Fixed')
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.succeeded, ids)
+        self.assertEqual(len(result.incidents), 600)
+        self.assertEqual(mock_put.call_count, 3)
+        bodies = [json.loads(call[1]['data']) for call in mock_put.call_args_list]
+        self.assertEqual(sorted(len(body['incidents']) for body in bodies), [100, 250, 250])
+        self.assertEqual(bodies[0]['incidents'][0], {
+            'id': bodies[0]['incidents'][0]['id'], 'type': 'incident_reference', 'status': 'resolved',
+            'resolution': 'Fixed',
+        })
+        self.assertEqual(mock_put.call_args[1]['url'], 'https://api.pagerduty.com/incidents')
+        self.assertEqual(mock_put.call_args[1]['headers']['From'], 'ops@example.com')
+
+    @patch.object(requests.Session, 'put')
+    def test_partial_failure(self, mock_put):
+        """
+        Test a failing chunk marks its incidents as failed without stopping the others
+        """
+        mock_put.side_effect = fake_bulk_update(fail_ids={'P3'})
+
+        result = self.incidents.acknowledge_many(['P{0}'.format(i) for i in range(6)], chunk_size=2)
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.succeeded, ['P0', 'P1', 'P4', 'P5'])
+        self.assertEqual(sorted(result.failed), ['P2', 'P3'])
+        self.assertIsInstance(result.failed['P2'], PagerDutyAPIServerException)
+
+    @patch.object(requests.Session, 'put')
+    @patch.object(requests.Session, 'get')
+    @patch('pagerduty_api.rest.time.time', return_value=to_timestamp('2020-01-01T02:00:00Z'))
+    def test_select_by_query(self, mock_time, mock_get, mock_put):
+        """
+        Test incidents are selected by service, status and age when no IDs are given
+        """
+        mock_get.return_value = page_response({'incidents': [{'id': 'P1'}], 'more': False})
+        mock_put.side_effect = fake_bulk_update()
+
+        result = self.incidents.resolve_many(service_ids=['PWEB'], older_than=3600)
+        self.incidents.resolve_many(statuses=['triggered'])
+
+        self.assertEqual(result.succeeded, ['P1'])
+        aged, every = [call[1]['params'] for call in mock_get.call_args_list]
+        self.assertEqual(aged['service_ids[]'], ['PWEB'])
+        self.assertEqual(aged['statuses[]'], ['triggered', 'acknowledged'])
+        self.assertEqual(aged['until'], '2020-01-01T01:00:00Z')
+        self.assertNotIn('date_range', aged)
+        self.assertEqual(every['statuses[]'], ['triggered'])
+        self.assertEqual(every['date_range'], 'all')
+        with self.assertRaises(ValueError):
+            self.incidents.resolve_many(['P1'], service_ids=['PWEB'])
+
+    def test_bulk_result(self):
+        """
+        Test a result collects incidents from either response shape and reports failures
+        """
+        result = BulkResult()
+        result.add(EventResult(['P1'], response={'incident': {'id': 'P1'}}), 'incidents')
+        result.add(EventResult(['P2'], response={}), 'incidents')
+        result.add(EventResult(['P3'], exception=ValueError('Invalid')), 'incidents')
+
+        self.assertEqual(result.succeeded, ['P1', 'P2'])
+        self.assertEqual(result.incidents, [{'id': 'P1'}])
+        self.assertEqual(repr(result), '<BulkResult 2 succeeded, 1 failed>')
+
+    @patch.object(requests.Session, 'put')
+    def test_all_failed_keeps_cache(self, mock_put):
+        """
+        Test cached incidents are kept when nothing was changed
+        """
+        mock_put.side_effect = fake_bulk_update(fail_ids={'P1'})
+        incidents = Incidents(api_key='123', from_email='ops@example.com', cache=ResponseCache())
+        incidents.cache.get('incidents', 'key', lambda etag: ({'incident': {}}, None))
+
+        result = incidents.resolve_many(['P1'])
+
+        self.assertEqual(list(result.failed), ['P1'])
+        self.assertEqual(incidents.invalidate(), 1)
+
+    @patch.object(requests.Session, 'get')
+    def test_select_any_status(self, mock_get):
+        """
+        Test select() can leave out the status filter
+        """
+        mock_get.return_value = page_response({'incidents': [], 'more': False})
+
+        self.assertEqual(self.incidents.select(statuses=None), [])
+        self.assertNotIn('statuses[]', mock_get.call_args[1]['params'])
+
+    @patch.object(requests.Session, 'put')
+    def test_reassign_many(self, mock_put):
+        """
+        Test incidents are reassigned to users or to an escalation policy
+        """
+        mock_put.side_effect = fake_bulk_update()
+
+        self.incidents.reassign_many(assignee_ids=['PUSER'], ids=['P1'])
+        assigned = json.loads(mock_put.call_args[1]['data'])['incidents'][0]
+        self.incidents.reassign_many(escalation_policy_id='PPOLICY', ids=['P1'])
+        escalated = json.loads(mock_put.call_args[1]['data'])['incidents'][0]
+
+        self.assertEqual(assigned['assignments'], [{'assignee': {'id': 'PUSER', 'type': 'user_reference'}}])
+        self.assertEqual(escalated['escalation_policy'], {'id': 'PPOLICY', 'type': 'escalation_policy_reference'})
+        with self.assertRaises(ValueError):
+            self.incidents.reassign_many(ids=['P1'])
+
+    @patch.object(requests.Session, 'post')
+    def test_snooze_many(self, mock_post):
+        """
+        Test every incident is snoozed with its own request
+        """
+        mock_post.side_effect = lambda url, **kwargs: page_response({'incident': {'id': url.split('/')[-2]}})
+
+        result = self.incidents.snooze_many(3600, ids=['P1', 'P2'])
+
+        self.assertEqual(sorted(incident['id'] for incident in result.incidents), ['P1', 'P2'])
+        self.assertEqual(json.loads(mock_post.call_args[1]['data']), {'duration': 3600})
+
+    @patch.object(requests.Session, 'post')
+    @patch.object(requests.Session, 'get')
+    def test_snooze_acknowledged_by_query(self, mock_get, mock_post):
+        """
+        Test snoozing by query picks acknowledged incidents, and writes are rate limited
+        """
+        mock_get.return_value = page_response({'incidents': [{'id': 'P1'}], 'more': False})
+        mock_post.return_value = page_response({'incident': {'id': 'P1'}})
+        self.incidents.rate_limiter = RateLimiter(per_key_rate=1000)
+
+        result = self.incidents.snooze_many(3600, service_ids=['PWEB'])
+
+        self.assertEqual(result.succeeded, ['P1'])
+        self.assertEqual(mock_get.call_args[1]['params']['statuses[]'], ['acknowledged'])
+        self.assertEqual(mock_post.call_args[1]['url'], 'https://api.pagerduty.com/incidents/P1/snooze')
+
+    @patch.object(requests.Session, 'put')
+    def test_merge(self, mock_put):
+        """
+        Test incidents are merged into the target in serial chunks, leaving out the target
+        """
+        mock_put.return_value = page_response({'incident': {'id': 'P0'}})
+
+        result = self.incidents.merge('P0', ids=['P0', 'P1', 'P2', 'P3'], chunk_size=2)
+
+        self.assertEqual(result.succeeded, ['P1', 'P2', 'P3'])
+        self.assertEqual(mock_put.call_args[1]['url'], 'https://api.pagerduty.com/incidents/P0/merge')
+        self.assertEqual(json.loads(mock_put.call_args[1]['data']), {
+            'source_incidents': [{'id': 'P3', 'type': 'incident_reference'}],
+        })
+
+    @patch.object(requests.Session, 'put')
+    def test_invalidates_cache(self, mock_put):
+        """
+        Test a bulk change forgets cached incidents
+        """
+        mock_put.side_effect = fake_bulk_update()
+        cache = ResponseCache()
+        incidents = Incidents(api_key='123', from_email='ops@example.com', cache=cache)
+        cache.get('incidents', 'key', lambda etag: ({'incident': {}}, None))
+
+        incidents.acknowledge_many(['P1'])
+
+        self.assertEqual(incidents.invalidate(), 0)
+
+    @patch.object(requests.Session, 'get')
+    def test_needs_from_email(self, mock_get):
+        """
+        Test bulk operations without from_email fail before listing any incidents
+        """
+        incidents = Incidents(api_key='123')
+
+        for operation in (
+            lambda: incidents.acknowledge_many(['P1']),
+            lambda: incidents.resolve_many(service_ids=['PWEB']),
+            lambda: incidents.snooze_many(3600),
+            lambda: incidents.merge('P1'),
+        ):
+            with self.assertRaises(ConfigurationException):
+                operation()
+        self.assertFalse(mock_get.called)
+
+
+class TimestampTests(TestCase):
+    """
+    Tests for converting PagerDuty times
+    """
+
+    def test_to_timestamp(self):
+        """
+        Test ISO times, datetimes and numbers are converted to seconds since the epoch
+        """
+        expected = 1577836800.5
+
+        self.assertEqual(to_timestamp('2020-01-01T00:00:00.5Z'), expected)
+        self.assertEqual(to_timestamp(datetime.datetime(2020, 1, 1, 0, 0, 0, 500000)), expected)
+        self.assertEqual(to_timestamp(datetime.datetime(2020, 1, 1, 1, 0, 0, 500000, tzinfo=datetime.timezone(
+            datetime.timedelta(hours=1)
+        ))), expected)
+        self.assertEqual(to_timestamp(expected), expected)
+        self.assertIsNone(to_timestamp(None))
+        self.assertEqual(to_isoformat(expected), '2020-01-01T00:00:00Z')
@@ -0,0 +1,137 @@
+import email.utils
+import time
+from unittest import TestCase
+
+import requests
+from mock import Mock, patch
+
+from pagerduty_api import base
+from pagerduty_api.base import Resource
+from pagerduty_api.exceptions import PagerDutyAPIServerException
+from pagerduty_api.retry import NO_RETRY, RetryPolicy
+
+
+class RetryPolicyTests(TestCase):
+
+    def test_backoff_full_jitter(self):
+        """
+        Test waits grow exponentially up to the cap, scaled by the jitter
+        """
+        policy = RetryPolicy(max_attempts=10, backoff_base=1, backoff_cap=5, random=lambda: 0.5)
+
+        self.assertEqual([policy.next_delay(n, 0) for n in range(1, 6)], [0.5, 1, 2, 2.5, 2.5])
+
+    def test_max_attempts(self):
+        """
+        Test no retry is made after the last attempt
+        """
+        policy = RetryPolicy(max_attempts=2)
+
+        self.assertIsNotNone(policy.next_delay(1, 0))
+        self.assertIsNone(policy.next_delay(2, 0))
+        self.assertIsNone(NO_RETRY.next_delay(1, 0))
+
+    def test_deadline(self):
+        """
+        Test no retry is made that would start after the deadline
+        """
+        policy = RetryPolicy(deadline=10, random=lambda: 1)
+
+        self.assertEqual(policy.next_delay(1, 9), 0.5)
+        self.assertIsNone(policy.next_delay(1, 9.5))
+
+    def test_retry_after(self):
+        """
+        Test Retry-After replaces the backoff unless disabled
+        """
+        self.assertEqual(RetryPolicy().next_delay(1, 0, '7'), 7)
+        self.assertEqual(RetryPolicy(respect_retry_after=False, random=lambda: 0).next_delay(1, 0, '7'), 0)
+        self.assertEqual(RetryPolicy(random=lambda: 0).next_delay(1, 0, 'soon'), 0)
+
+    def test_retry_after_capped(self):
+        """
+        Test Retry-After waits no longer than backoff_cap
+        """
+        self.assertEqual(RetryPolicy(backoff_cap=10).next_delay(1, 0, '86400'), 10)
+        later = email.utils.formatdate(time.time() + 3600, usegmt=True)
+        self.assertEqual(RetryPolicy(backoff_cap=10).next_delay(1, 0, later), 10)
+
+    def test_parse_retry_after(self):
+        """
+        Test Retry-After is parsed from seconds or an HTTP date
+        """
+        self.assertIsNone(RetryPolicy.parse_retry_after(None))
+        self.assertEqual(RetryPolicy.parse_retry_after('-3'), 0)
+        self.assertIsNone(RetryPolicy.parse_retry_after('nan'))
+        self.assertIsNone(RetryPolicy.parse_retry_after('inf'))
+        self.assertIsNone(RetryPolicy.parse_retry_after('-inf'))
+        later = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(RetryPolicy.parse_retry_after(later), 60, delta=2)
+
+    def test_is_retryable(self):
+        """
+        Test connection errors and listed statuses are retryable
+        """
+        policy = RetryPolicy()
+
+        self.assertTrue(policy.is_retryable(None))
+        self.assertTrue(policy.is_retryable(429))
+        self.assertFalse(policy.is_retryable(400))
+
+
+class ResourceRetryTests(TestCase):
+
+    def setUp(self):
+        self.TEST_URL = 'https://events.pagerduty.com'
+        self.resource = Resource(retry_policy=RetryPolicy(max_attempts=3, random=lambda: 0))
+
+    def response(self, status_code, headers=None):
+        return Mock(ok=status_code < 400, status_code=status_code, text='', headers=headers or {})
+
+    @patch.object(base.time, 'sleep')
+    @patch.object(requests.Session, 'post')
+    def test_retries_until_success(self, mock_post, mock_sleep):
+        """
+        Test retryable failures are retried, honoring Retry-After
+        """
+        mock_post.side_effect = [
+            self.response(429, {'Retry-After': '2'}),
+            requests.ConnectionError('refused'),
+            self.response(202),
+        ]
+
+        self.resource._post(url=self.TEST_URL)
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list], [2, 0])
+
+    @patch.object(base.time, 'sleep')
+    @patch.object(requests.Session, 'post')
+    def test_gives_up(self, mock_post, mock_sleep):
+        """
+        Test the final exception carries the attempts and timing
+        """
+        mock_post.side_effect = requests.Timeout('read timed out')
+
+        with self.assertRaises(PagerDutyAPIServerException) as cm:
+            self.resource._post(url=self.TEST_URL)
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(cm.exception.attempts, 3)
+        self.assertIsNone(cm.exception.status_code)
+        self.assertGreaterEqual(cm.exception.elapsed, 0)
+
+    @patch.object(base.time, 'sleep')
+    @patch.object(requests.Session, 'post')
+    def test_client_error_not_retried(self, mock_post, mock_sleep):
+        """
+        Test a non retryable status raises straight away
+        """
+        mock_post.return_value = self.response(400)
+
+        with self.assertRaises(PagerDutyAPIServerException) as cm:
+            self.resource._post(url=self.TEST_URL)
+
+        self.assertEqual(cm.exception.status_code, 400)
+        self.assertEqual(cm.exception.attempts, 1)
+        self.assertFalse(mock_sleep.called)
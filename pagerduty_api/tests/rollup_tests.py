@@ -0,0 +1,264 @@
+import json
+from unittest import TestCase
+
+import requests
+from mock import Mock, patch
+
+from pagerduty_api.alerts import Alert
+from pagerduty_api.alerts_v2 import AlertV2
+from pagerduty_api.exceptions import PagerDutyAPIServerException
+from pagerduty_api.rollup import EventRollup
+from pagerduty_api.tests.helpers import FakeClock
+
+
+def sent(mock_post):
+    return [json.loads(call[1]['data']) for call in mock_post.call_args_list]
+
+
+class EventRollupTests(TestCase):
+    """
+    Tests for EventRollup
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.alert = Alert(service_key='4baa5d20cfba466a5e075b02698f455c')
+        self.rollup = EventRollup(self.alert, window=10, threshold=3, max_samples=2, clock=self.clock)
+
+    def storm(self, count, start=0, **kwargs):
+        return [
+            self.rollup.trigger(description='web{0} cannot reach redis'.format(i), incident_key='web{0}'.format(i),
+                                **kwargs)
+            for i in range(start, start + count)
+        ]
+
+    @patch.object(requests.Session, 'post')
+    def test_below_threshold_sent(self, mock_post):
+        """
+        Test triggers are sent as usual until the group reaches the threshold
+        """
+        self.storm(2)
+
+        self.assertEqual([event['incident_key'] for event in sent(mock_post)], ['web0', 'web1'])
+        self.assertEqual(self.rollup.rolled_up, 0)
+
+    @patch.object(requests.Session, 'post')
+    def test_storm_rolled_up(self, mock_post):
+        """
+        Test triggers past the threshold are rolled up into one summary
+        """
+        responses = self.storm(10)
+
+        events = sent(mock_post)
+        self.assertEqual(len(events), 3)
+        summary = events[2]
+        self.assertTrue(summary['incident_key'].startswith('rollup/'))
+        self.assertEqual(summary['description'], '1 related incidents: web2 cannot reach redis')
+        self.assertEqual(summary['details']['rollup']['group'], {'service_key': self.alert.service_key})
+        self.assertEqual(responses[-1]['status'], 'rolled_up')
+        self.assertEqual(responses[-1]['incident_key'], 'web9')
+        self.assertEqual(responses[-1]['rollup_key'], summary['incident_key'])
+        self.assertEqual(self.rollup.rolled_up, 8)
+
+    @patch.object(requests.Session, 'post')
+    def test_summary_refreshed_once_a_window(self, mock_post):
+        """
+        Test the summary's counts are sent again after a window
+        """
+        self.storm(5)
+        self.clock.now = 10
+        self.storm(1, start=5)
+
+        summary = sent(mock_post)[-1]
+        self.assertEqual(len(sent(mock_post)), 4)
+        self.assertEqual(summary['details']['rollup']['count'], 4)
+        self.assertEqual(summary['details']['rollup']['open'], 4)
+        self.assertEqual(summary['details']['rollup']['sample_incident_keys'], ['web2', 'web3'])
+
+    @patch.object(requests.Session, 'post')
+    def test_resolve_members(self, mock_post):
+        """
+        Test members are resolved quietly and the summary once they all are
+        """
+        self.storm(4)
+        summary_key = sent(mock_post)[-1]['incident_key']
+        mock_post.reset_mock()
+
+        self.assertEqual(self.rollup.acknowledge(incident_key='web2')['status'], 'rolled_up')
+        self.rollup.resolve(incident_key='web2')
+        self.assertFalse(mock_post.called)
+
+        response = self.rollup.resolve(incident_key='web3')
+        self.rollup.resolve(incident_key='web0')
+
+        self.assertEqual(response['rollup_key'], summary_key)
+        self.assertEqual([(event['event_type'], event['incident_key']) for event in sent(mock_post)], [
+            ('resolve', summary_key), ('resolve', 'web0'),
+        ])
+
+    @patch.object(requests.Session, 'post')
+    def test_failed_summary_sent_again(self, mock_post):
+        """
+        Test a summary that fails to send is sent again with the next trigger in the group
+        """
+        ok, failed = Mock(ok=True), Mock(ok=False, status_code=500, text='Internal Server Error')
+        mock_post.side_effect = [ok, ok, ok, failed, ok]
+
+        self.rollup.trigger(description='Disk full', incident_key='db0', service_key='other')
+        self.storm(2)
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.storm(1, start=2)
+        response = self.storm(1, start=3)[0]
+
+        events = sent(mock_post)
+        self.assertEqual(response['status'], 'rolled_up')
+        self.assertEqual(events[4]['incident_key'], events[3]['incident_key'])
+        self.assertEqual(events[4]['details']['rollup']['count'], 2)
+        self.assertEqual(self.rollup.summaries, 1)
+
+    @patch.object(requests.Session, 'post')
+    def test_failed_summary_resolve_sent_again(self, mock_post):
+        """
+        Test the summary is resolved when the last member's resolve is retried after the summary's failed
+        """
+        self.rollup.trigger(description='Disk full', incident_key='db0', service_key='other')
+        self.storm(3)
+        summary_key = sent(mock_post)[-1]['incident_key']
+        mock_post.reset_mock()
+        ok, failed = Mock(ok=True), Mock(ok=False, status_code=500, text='Internal Server Error')
+        mock_post.side_effect = [failed, ok]
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.rollup.resolve(incident_key='web2')
+        self.assertEqual(self.rollup._members, {(self.alert.service_key, 'web2'): (self.alert.service_key,)})
+        response = self.rollup.resolve(incident_key='web2')
+
+        self.assertEqual(response['rollup_key'], summary_key)
+        self.assertEqual([(event['event_type'], event['incident_key']) for event in sent(mock_post)], [
+            ('resolve', summary_key), ('resolve', summary_key),
+        ])
+        self.assertEqual(self.rollup._members, {})
+        self.assertIsNone(self.rollup._groups[(self.alert.service_key,)].summary_key)
+
+    @patch.object(requests.Session, 'post')
+    def test_triggers_while_resolving_reopen_summary(self, mock_post):
+        """
+        Test a trigger rolled up while the summary's resolve is being sent triggers the summary again
+        """
+        self.storm(3)
+
+        def post(**kwargs):
+            mock_post.side_effect = None
+            self.storm(1, start=3)
+            return Mock(ok=True)
+        mock_post.side_effect = post
+        self.rollup.resolve(incident_key='web2')
+        self.storm(1, start=4)
+
+        events = sent(mock_post)
+        self.assertEqual([(event['event_type'], event['incident_key']) for event in events[3:]], [
+            ('resolve', events[2]['incident_key']), ('trigger', events[2]['incident_key']),
+        ])
+        self.assertEqual(events[-1]['details']['rollup']['open'], 2)
+
+    @patch.object(requests.Session, 'post')
+    def test_repeated_and_unkeyed_triggers(self, mock_post):
+        """
+        Test a repeated trigger of a rolled up incident stays rolled up, and events
+        without an incident key are always sent
+        """
+        self.storm(3)
+        response = self.storm(1, start=2)[0]
+        self.rollup.submit({'service_key': self.alert.service_key, 'event_type': 'trigger', 'description': 'Hi'})
+
+        self.assertEqual(response['status'], 'rolled_up')
+        self.assertEqual(len(sent(mock_post)), 4)
+        self.assertEqual(self.rollup.rolled_up, 1)
+
+    @patch.object(requests.Session, 'post')
+    def test_quiet_groups_forgotten(self, mock_post):
+        """
+        Test groups without a summary are forgotten once they are quiet for a window
+        """
+        self.rollup.trigger(description='Disk full', incident_key='db0', service_key='other')
+        self.clock.now = 20
+        self.storm(1)
+
+        self.assertEqual(len(self.rollup._groups), 1)
+
+    @patch.object(requests.Session, 'post')
+    def test_quiet_groups_forgotten_behind_open_summary(self, mock_post):
+        """
+        Test quiet groups are forgotten even while an older group's summary is open
+        """
+        self.storm(3)
+        for i in range(5):
+            self.rollup.trigger(description='Disk full', incident_key='db{0}'.format(i), service_key=str(i))
+        self.clock.now = 20
+        self.rollup.trigger(description='Disk full', incident_key='db5', service_key='5')
+
+        self.assertEqual(list(self.rollup._groups), [(self.alert.service_key,), ('5',)])
+
+    @patch.object(requests.Session, 'post')
+    def test_quiet_window(self, mock_post):
+        """
+        Test triggers spread over more than a window aren't rolled up
+        """
+        for i in range(5):
+            self.clock.now = i * 6
+            self.storm(1, start=i)
+
+        self.assertEqual(len(sent(mock_post)), 5)
+
+    @patch.object(requests.Session, 'post')
+    def test_group_by_detail_and_prefix(self, mock_post):
+        """
+        Test events are grouped by detail fields and description prefix
+        """
+        self.rollup = EventRollup(
+            self.alert, fields=('details.dependency',), description_prefix=13, threshold=2, clock=self.clock
+        )
+        for i, (description, dependency) in enumerate([
+            ('Cannot reach redis from web0', 'redis'),
+            ('Cannot reach mysql from web1', 'redis'),
+            ('Cannot reach redis from web2', 'mysql'),
+            ('Cannot reach redis from web3', 'redis'),
+        ]):
+            self.rollup.trigger(description=description, incident_key=str(i), details={'dependency': dependency})
+
+        events = sent(mock_post)
+        self.assertEqual([event['incident_key'] for event in events][::2], ['0', '2'])
+        self.assertEqual(events[1]['details']['rollup']['group'], {
+            'details.dependency': 'redis', 'description': 'Cannot reach ',
+        })
+
+    @patch.object(requests.Session, 'post')
+    def test_custom_key(self, mock_post):
+        """
+        Test a key callable decides the group
+        """
+        self.rollup = EventRollup(self.alert, key=lambda data: 'all', threshold=1, clock=self.clock)
+
+        self.storm(2)
+
+        self.assertEqual(len(sent(mock_post)), 1)
+        self.assertEqual(sent(mock_post)[0]['details']['rollup']['group'], "'all'")
+
+    @patch.object(requests.Session, 'post')
+    def test_alert_v2(self, mock_post):
+        """
+        Test v2 storms are summarized with a v2 trigger
+        """
+        alert = AlertV2(routing_key='R015Z2Y8HHSWQ1MEKHJ8MDU2Q7JKB4D4')
+        rollup = EventRollup(alert, threshold=2, clock=self.clock)
+
+        for i in range(3):
+            rollup.trigger(summary='Disk full', source='web{0}'.format(i), dedup_key='web{0}'.format(i))
+        rollup.resolve(dedup_key='web1')
+        rollup.resolve(dedup_key='web2')
+
+        events = sent(mock_post)
+        self.assertEqual([event['event_action'] for event in events], ['trigger', 'trigger', 'resolve'])
+        self.assertEqual(events[1]['payload']['summary'], '1 related incidents: Disk full')
+        self.assertEqual(events[1]['payload']['custom_details']['rollup']['count'], 1)
+        self.assertEqual(events[2]['dedup_key'], events[1]['dedup_key'])
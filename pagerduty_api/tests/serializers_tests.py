@@ -0,0 +1,98 @@
+import sys
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from pagerduty_api import serializers
+from pagerduty_api.serializers import JSONSerializer, OrjsonSerializer, get_default_serializer
+
+
+class JSONSerializerTests(TestCase):
+
+    serializer_class = JSONSerializer
+
+    def test_skip_none(self):
+        """
+        Test empty fields are left out unless asked for
+        """
+        data = {'description': 'down', 'client': None, 'details': {'a': None}}
+
+        self.assertEqual(self.serializer_class().dumps(data), b'{"description":"down","details":{"a":null}}')
+        self.assertEqual(
+            self.serializer_class(skip_none=False, sort_keys=True).dumps(data),
+            b'{"client":null,"description":"down","details":{"a":null}}'
+        )
+
+    def test_non_str_keys(self):
+        """
+        Test keys that aren't strings are encoded as strings
+        """
+        data = {'details': {404: 3, 500: 1}}
+
+        self.assertEqual(self.serializer_class().dumps(data), b'{"details":{"404":3,"500":1}}')
+        self.assertEqual(self.serializer_class(sort_keys=True).dumps(data), b'{"details":{"404":3,"500":1}}')
+
+    def test_fragment(self):
+        """
+        Test pre-encoded fields lead the payload
+        """
+        serializer = self.serializer_class()
+        fragment = serializer.fragment(service_key='abc')
+
+        self.assertEqual(serializer.dumps({'service_key': 'abc', 'b': 1}, fragment), b'{"service_key":"abc","b":1}')
+        self.assertEqual(serializer.dumps({'service_key': 'abc'}, fragment), b'{"service_key":"abc"}')
+
+    def test_fragment_ignored(self):
+        """
+        Test a fragment isn't used for payloads with other values, or with sorted keys
+        """
+        serializer = self.serializer_class()
+        fragment = serializer.fragment(service_key='abc')
+
+        self.assertEqual(serializer.dumps({'service_key': 'x', 'b': 1}, fragment), b'{"service_key":"x","b":1}')
+        self.assertEqual(serializer.dumps({'b': 1}, fragment), b'{"b":1}')
+        self.assertEqual(
+            self.serializer_class(sort_keys=True).dumps({'service_key': 'abc', 'b': 1}, fragment),
+            b'{"b":1,"service_key":"abc"}'
+        )
+
+
+class OrjsonSerializerTests(JSONSerializerTests):
+
+    serializer_class = OrjsonSerializer
+
+
+class GetDefaultSerializerTests(TestCase):
+
+    def setUp(self):
+        patcher = patch.object(serializers, '_default_serializer', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_prefers_orjson(self):
+        """
+        Test orjson is used when it is installed
+        """
+        self.assertIsInstance(get_default_serializer(), OrjsonSerializer)
+        self.assertIs(get_default_serializer(), get_default_serializer())
+
+    def test_falls_back_to_json(self):
+        """
+        Test the standard library is used without orjson
+        """
+        with patch.dict(sys.modules, {'orjson': None}):
+            serializer = get_default_serializer()
+
+        self.assertIs(type(serializer), JSONSerializer)
+
+    def test_created_once(self):
+        """
+        Test a serializer created by another thread while waiting for the lock is the one returned
+        """
+        serializer = JSONSerializer()
+        lock = Mock()
+        lock.__enter__ = Mock(side_effect=lambda: setattr(serializers, '_default_serializer', serializer))
+        lock.__exit__ = Mock(return_value=False)
+
+        with patch.object(serializers, '_default_serializer_lock', lock):
+            self.assertIs(get_default_serializer(), serializer)
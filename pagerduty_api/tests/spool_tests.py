@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+from mock import Mock, patch
+
+from pagerduty_api.alerts import Alert
+from pagerduty_api.exceptions import PagerDutyAPIServerException, SpoolFullException
+from pagerduty_api.spool import EventSpool, FsyncPolicies
+
+
+def event(incident_key, event_type='trigger'):
+    return {'service_key': 's', 'incident_key': incident_key, 'event_type': event_type}
+
+
+def incident(incident_key):
+    return ('s', incident_key)
+
+
+class EventSpoolTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.spool = EventSpool(self.directory, fsync=FsyncPolicies.ALWAYS)
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data)
+        return {'status': 'success'}
+
+    def test_append_and_replay_in_order(self):
+        """
+        Test spooled events are replayed in order and removed
+        """
+        for key in 'abc':
+            self.spool.append(event(key), incident(key))
+
+        self.assertEqual(len(self.spool), 3)
+        self.assertTrue(self.spool.has_pending(incident('a')))
+
+        self.assertEqual(self.spool.replay(self.send, max_workers=1), 3)
+
+        self.assertEqual([d['incident_key'] for d in self.sent], ['a', 'b', 'c'])
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(self.spool.size, 0)
+        self.assertFalse(self.spool.has_pending(incident('a')))
+        self.assertEqual(self.spool._pending, {})
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_incident_order_kept_in_batches(self):
+        """
+        Test a batch never holds two events for one incident
+        """
+        self.spool.append(event('a'), incident('a'))
+        self.spool.append(event('b'), incident('b'))
+        self.spool.append(event('a', 'resolve'), incident('a'))
+
+        self.spool.replay(self.send, batch_size=10, max_workers=1)
+
+        self.assertEqual([(d['incident_key'], d['event_type']) for d in self.sent], [
+            ('a', 'trigger'), ('b', 'trigger'), ('a', 'resolve'),
+        ])
+        self.assertEqual(self.spool._pending, {})
+
+    def test_replay_stops_at_retryable_failure(self):
+        """
+        Test a retryable failure leaves it and later events spooled
+        """
+        for key in 'abc':
+            self.spool.append(event(key), incident(key))
+        send = Mock(side_effect=[{'status': 'success'}, PagerDutyAPIServerException('down'), {'status': 'success'}])
+
+        self.assertEqual(self.spool.replay(send, batch_size=1), 1)
+        self.assertEqual(len(self.spool), 2)
+
+        self.assertEqual(self.spool.replay(self.send), 2)
+        self.assertEqual([d['incident_key'] for d in self.sent], ['b', 'c'])
+
+    def test_unretryable_events_dropped(self):
+        """
+        Test an event that can never be sent is dropped
+        """
+        self.spool.append(event('a'), incident('a'))
+        send = Mock(side_effect=PagerDutyAPIServerException('bad request'))
+
+        self.assertEqual(self.spool.replay(send, is_retryable=lambda e: False), 0)
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(self.spool._pending, {})
+
+    def test_segments_and_restart(self):
+        """
+        Test segments rotate and spooled events survive reopening the spool
+        """
+        spool = EventSpool(self.directory, fsync=FsyncPolicies.NEVER, segment_size=1)
+        for key in 'abc':
+            spool.append(event(key), incident(key))
+        spool.close()
+
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+        with open(os.path.join(self.directory, sorted(os.listdir(self.directory))[-1]), 'ab') as f:
+            f.write(b'{"torn')
+
+        reopened = EventSpool(self.directory, fsync=FsyncPolicies.INTERVAL)
+        self.assertEqual(len(reopened), 3)
+        reopened.append(event('d'), incident('d'))
+
+        self.assertEqual(reopened.replay(self.send), 4)
+        self.assertEqual([d['incident_key'] for d in self.sent], ['a', 'b', 'c', 'd'])
+
+    def test_replay_stops_across_segments(self):
+        """
+        Test a retryable failure leaves later segments unread, in a directory the spool created
+        """
+        spool = EventSpool(os.path.join(self.directory, 'spool'), segment_size=1)
+        for key in 'abc':
+            spool.append(event(key), incident(key))
+        send = Mock(side_effect=[{'status': 'success'}, PagerDutyAPIServerException('down')])
+
+        self.assertEqual(spool.replay(send, batch_size=1), 1)
+
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(len(spool), 2)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, 'spool'))), 2)
+        spool.close()
+
+    def test_max_size(self):
+        """
+        Test events that don't fit are refused
+        """
+        spool = EventSpool(self.directory, max_size=100)
+
+        self.assertTrue(spool.append(event('a'), incident('a')))
+        self.assertFalse(spool.append(event('b'), incident('b')))
+        self.assertEqual(len(spool), 1)
+
+    def test_unknown_policy(self):
+        """
+        Test an unknown fsync policy is refused
+        """
+        with self.assertRaises(ValueError):
+            EventSpool(self.directory, fsync='sometimes')
+
+
+class AlertSpoolTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.alert = Alert(service_key='4baa5d20cfba466a5e075b02698f455c', spool=EventSpool(directory))
+
+    @patch.object(requests.Session, 'post')
+    def test_unreachable_events_spooled_and_replayed(self, mock_post):
+        """
+        Test events are spooled while PagerDuty is down and replayed in order
+        """
+        mock_post.side_effect = requests.ConnectionError('unreachable')
+        trigger = self.alert.trigger(description='No data received')
+
+        # Events for the incident queue behind the spooled trigger
+        mock_post.side_effect = None
+        resolve = self.alert.resolve()
+
+        self.assertEqual(trigger['status'], 'spooled')
+        self.assertEqual(resolve['status'], 'spooled')
+        self.assertEqual(mock_post.call_count, 1)
+
+        self.assertEqual(self.alert.replay_spool(), 2)
+        self.assertEqual(
+            [c[1]['data'].count(b'"resolve"') for c in mock_post.call_args_list[1:]], [0, 1]
+        )
+        self.assertEqual(len(self.alert.spool), 0)
+
+    @patch.object(requests.Session, 'post')
+    def test_full_spool_keeps_order(self, mock_post):
+        """
+        Test an event that can't be spooled behind its incident's events isn't sent ahead of them
+        """
+        mock_post.side_effect = requests.ConnectionError('unreachable')
+        self.alert.trigger(description='No data received')
+        mock_post.side_effect = None
+        self.alert.spool.max_size = 1
+
+        with self.assertRaises(SpoolFullException):
+            self.alert.resolve()
+
+        self.alert.fallback = Mock(return_value={'status': 'logged'})
+        response = self.alert.resolve()
+
+        self.assertEqual(response, {'status': 'logged'})
+        self.assertEqual(self.alert.fallback.call_args[0][0]['event_type'], 'resolve')
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(len(self.alert.spool), 1)
+
+    @patch.object(requests.Session, 'post')
+    def test_client_errors_raise(self, mock_post):
+        """
+        Test an event PagerDuty refuses is raised, not spooled
+        """
+        mock_post.return_value = Mock(ok=False, status_code=400, text='Bad Request', headers={})
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.alert.trigger(description='No data received')
+        self.assertEqual(len(self.alert.spool), 0)
@@ -0,0 +1,215 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+
+from mock import patch, Mock
+
+from pagerduty_api.exceptions import PagerDutyAPIServerException
+from pagerduty_api.sync import IncidentStore, IncidentSync, to_timestamp
+
+
+def page_response(payload):
+    return Mock(name='response', ok=True, status_code=200, json=Mock(return_value=payload))
+
+
+def incident(id, service='PWEB', status='triggered', created_at='2020-01-01T00:00:00Z', **kwargs):
+    return dict(
+        id=id, type='incident', incident_key='key-' + id, status=status, urgency='high', created_at=created_at,
+        service={'id': service, 'type': 'service_reference'}, **kwargs
+    )
+
+
+def log_entry(id, incident, created_at, type='trigger_log_entry'):
+    return {'id': id, 'type': type, 'created_at': created_at, 'incident': incident}
+
+
+class IncidentStoreTests(TestCase):
+    """
+    Tests for IncidentStore
+    """
+
+    def setUp(self):
+        self.store = IncidentStore(':memory:')
+        self.store.upsert_incidents([
+            incident('P1', created_at='2020-01-01T00:00:00Z'),
+            incident('P2', status='resolved', created_at='2020-01-02T00:00:00Z',
+                     last_status_change_at='2020-01-02T00:10:00Z'),
+            incident('P3', service='PDB', status='resolved', created_at='2020-01-03T00:00:00Z',
+                     resolved_at='2020-01-03T00:30:00Z'),
+        ])
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_incidents_filters(self):
+        """
+        Test incidents are found by service, status, key and creation time, newest first
+        """
+        ids = lambda incidents: [incident['id'] for incident in incidents]  # noqa: E731
+
+        self.assertEqual(ids(self.store.incidents()), ['P3', 'P2', 'P1'])
+        self.assertEqual(ids(self.store.incidents(service_id='PWEB')), ['P2', 'P1'])
+        self.assertEqual(ids(self.store.incidents(status=['triggered', 'acknowledged'])), ['P1'])
+        self.assertEqual(ids(self.store.incidents(incident_key='key-P2')), ['P2'])
+        self.assertEqual(ids(self.store.incidents(since='2020-01-02T00:00:00Z', until='2020-01-03T00:00:00Z')), ['P2'])
+        self.assertEqual(ids(self.store.incidents(limit=1)), ['P3'])
+        self.assertEqual(self.store.get('P1')['incident_key'], 'key-P1')
+        self.assertIsNone(self.store.get('P4'))
+
+    def test_upsert_replaces(self):
+        """
+        Test storing an incident again replaces it
+        """
+        self.store.upsert_incidents([incident('P1', status='acknowledged')])
+
+        self.assertEqual(self.store.get('P1')['status'], 'acknowledged')
+        self.assertEqual(self.store.counts(), {'acknowledged': 1, 'resolved': 2})
+
+    def test_counts_and_mean_time_to_resolve(self):
+        """
+        Test incidents are counted by a column and resolve times averaged
+        """
+        self.assertEqual(self.store.counts('service_id'), {'PWEB': 2, 'PDB': 1})
+        self.assertEqual(self.store.counts(service_id='PWEB'), {'triggered': 1, 'resolved': 1})
+        self.assertEqual(self.store.mean_time_to_resolve(), 1200)
+        self.assertEqual(self.store.mean_time_to_resolve(service_id='PDB'), 1800)
+        self.assertIsNone(self.store.mean_time_to_resolve(since='2020-02-01T00:00:00Z'))
+        with self.assertRaises(ValueError):
+            self.store.counts('title; DROP TABLE incidents')
+
+    def test_log_entries(self):
+        """
+        Test the log entries of an incident are returned oldest first
+        """
+        reference = {'id': 'P1', 'type': 'incident_reference'}
+        self.store.upsert_log_entries([
+            log_entry('L2', reference, '2020-01-01T00:05:00Z', 'acknowledge_log_entry'),
+            log_entry('L1', reference, '2020-01-01T00:00:00Z'),
+        ])
+
+        self.assertEqual([entry['id'] for entry in self.store.log_entries('P1')], ['L1', 'L2'])
+        self.assertEqual(self.store.log_entries('P2'), [])
+
+
+class IncidentSyncTests(TestCase):
+    """
+    Tests for IncidentSync
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'pagerduty.db')
+        self.store = IncidentStore(self.path)
+        self.sync = IncidentSync(self.store, api_key='123', overlap=60, initial_since='2020-01-01T00:00:00Z')
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    @patch.object(requests.Session, 'get')
+    def test_sync_stores_changes(self, mock_get):
+        """
+        Test a sync stores log entries and their included incidents
+        """
+        mock_get.return_value = page_response({'log_entries': [
+            log_entry('L2', incident('P1', status='acknowledged'), '2020-01-01T00:05:00Z', 'acknowledge_log_entry'),
+            log_entry('L1', incident('P1', status='acknowledged'), '2020-01-01T00:00:00Z'),
+        ], 'more': False})
+
+        counts = self.sync.sync()
+
+        params = mock_get.call_args[1]['params']
+        self.assertEqual(mock_get.call_args[1]['url'], 'https://api.pagerduty.com/log_entries')
+        self.assertEqual(params['since'], '2020-01-01T00:00:00Z')
+        self.assertEqual(params['include[]'], ['incidents'])
+        self.assertEqual(counts, {'incidents': 1, 'log_entries': 2, 'high_water_mark': 1577837100.0})
+        self.assertEqual(self.store.get('P1')['status'], 'acknowledged')
+        self.assertEqual(self.store.log_entries('P1')[0]['incident'], {'id': 'P1', 'type': 'incident_reference'})
+
+    @patch.object(requests.Session, 'get')
+    def test_sync_resumes_from_high_water_mark(self, mock_get):
+        """
+        Test the next sync, even from a reopened store, starts at the high-water mark less the overlap
+        """
+        mock_get.return_value = page_response({'log_entries': [
+            log_entry('L1', incident('P1'), '2020-01-01T00:05:00Z'),
+        ], 'more': False})
+        self.sync.sync()
+        self.store.close()
+
+        self.store = IncidentStore(self.path)
+        sync = IncidentSync(self.store, api_key='123', overlap=60)
+        mock_get.return_value = page_response({'log_entries': [], 'more': False})
+        counts = sync.sync()
+
+        self.assertEqual(mock_get.call_args[1]['params']['since'], '2020-01-01T00:04:00Z')
+        self.assertEqual(counts['high_water_mark'], to_timestamp('2020-01-01T00:05:00Z'))
+        self.assertEqual(len(self.store.incidents()), 1)
+
+    @patch.object(requests.Session, 'get')
+    def test_sync_stores_in_batches(self, mock_get):
+        """
+        Test log entries are stored page_size at a time, including ones without an incident
+        """
+        mock_get.return_value = page_response({'log_entries': [
+            log_entry('L1', incident('P1'), '2020-01-01T00:00:00Z'),
+            log_entry('L2', incident('P2'), '2020-01-01T00:01:00Z'),
+            log_entry('L3', None, '2020-01-01T00:02:00Z', 'annotate_log_entry'),
+        ], 'more': False})
+        sync = IncidentSync(self.store, api_key='123', page_size=2)
+
+        with patch.object(self.store, 'upsert_log_entries', wraps=self.store.upsert_log_entries) as upsert:
+            counts = sync.sync()
+
+        self.assertEqual([len(call[0][0]) for call in upsert.call_args_list], [2, 1])
+        self.assertEqual(counts, {'incidents': 2, 'log_entries': 3, 'high_water_mark': 1577836920.0})
+
+    @patch.object(requests.Session, 'get')
+    def test_first_sync_without_changes(self, mock_get):
+        """
+        Test a first sync without initial_since starts at PagerDuty's default and sets no high-water mark
+        """
+        mock_get.return_value = page_response({'log_entries': [], 'more': False})
+        sync = IncidentSync(self.store, api_key='123')
+
+        counts = sync.sync()
+
+        self.assertNotIn('since', mock_get.call_args[1]['params'])
+        self.assertEqual(counts, {'incidents': 0, 'log_entries': 0, 'high_water_mark': None})
+        self.assertIsNone(sync.high_water_mark)
+
+    @patch.object(requests.Session, 'get')
+    def test_sync_fetches_referenced_incidents(self, mock_get):
+        """
+        Test incidents that weren't included in their log entries are fetched
+        """
+        reference = {'id': 'P2', 'type': 'incident_reference'}
+        mock_get.side_effect = [
+            page_response({'log_entries': [log_entry('L1', reference, '2020-01-01T00:00:00Z')], 'more': False}),
+            page_response({'incident': incident('P2')}),
+        ]
+
+        counts = self.sync.sync()
+
+        self.assertEqual(mock_get.call_args[1]['url'], 'https://api.pagerduty.com/incidents/P2')
+        self.assertEqual(counts['incidents'], 1)
+        self.assertEqual(self.store.get('P2')['id'], 'P2')
+
+    @patch.object(requests.Session, 'get')
+    def test_failed_sync_keeps_high_water_mark(self, mock_get):
+        """
+        Test a sync that fails part way doesn't move the high-water mark
+        """
+        mock_get.side_effect = [
+            page_response({'log_entries': [log_entry('L1', incident('P1'), '2020-01-01T00:05:00Z')], 'more': True,
+                           'offset': 0, 'limit': 100}),
+            Mock(ok=False, status_code=500, text='error', headers={}),
+        ]
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.sync.sync()
+
+        self.assertIsNone(self.sync.high_water_mark)
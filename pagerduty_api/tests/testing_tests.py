@@ -0,0 +1,263 @@
+import io
+import runpy
+import socket
+import sys
+import threading
+import warnings
+from unittest import TestCase, skipIf
+
+import requests
+from mock import patch
+
+from pagerduty_api.alerts import Alert
+from pagerduty_api.alerts_v2 import AlertV2
+from pagerduty_api.base import create_session
+from pagerduty_api.cache import ResponseCache
+from pagerduty_api.exceptions import PagerDutyAPIServerException
+from pagerduty_api.rest import EscalationPolicies, Incidents, Services
+from pagerduty_api.retry import RetryPolicy
+from pagerduty_api.testing import EVENTS_V1_PATH, HTTP2_PREFACE, FakePagerDuty, _HTTP2Connection, main
+
+try:
+    import h2.config
+    import h2.connection
+except ImportError:  # pragma: no cover
+    h2 = None
+
+
+class FakePagerDutyTests(TestCase):
+    """
+    Tests for FakePagerDuty, sending real requests to it
+    """
+
+    def setUp(self):
+        self.server = FakePagerDuty().start()
+        self.addCleanup(self.server.stop)
+        self.session = create_session()
+        self.addCleanup(self.session.close)
+        self.alert = self.server.point(Alert(service_key='abc', session=self.session))
+
+    def test_events(self):
+        """
+        Test v1, v2 and change events are answered and recorded
+        """
+        alert_v2 = self.server.point(AlertV2(routing_key='R015Z2Y8HHSWQ1MEKHJ8MDU2Q7JKB4D4', session=self.session))
+
+        response = self.alert.trigger(description='No data received', incident_key='web01')
+        response_v2 = alert_v2.trigger('Disk full', 'web01', dedup_key='disk')
+        alert_v2.change('Deployed')
+
+        self.assertEqual(response, {'status': 'success', 'message': 'Event processed', 'incident_key': 'web01'})
+        self.assertEqual(response_v2['dedup_key'], 'disk')
+        self.assertEqual([event.get('event_action') for event in self.server.events], [None, 'trigger', None])
+        self.assertEqual(self.server.events[0]['description'], 'No data received')
+
+    def test_connections_reused(self):
+        """
+        Test a session keeps its connection alive between events
+        """
+        for _ in range(5):
+            self.alert.trigger(description='No data received')
+
+        self.assertEqual(self.server.requests, 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_throttle(self):
+        """
+        Test a 429 carries Retry-After and is retried
+        """
+        self.server.throttle(2, retry_after=0)
+        self.alert.retry_policy = RetryPolicy(max_attempts=3, backoff_base=0)
+
+        self.alert.trigger(description='No data received')
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(len(self.server.events), 1)
+
+    def test_error_burst(self):
+        """
+        Test a burst of server errors raises once retries run out
+        """
+        self.server.fail(3, status=503)
+        self.alert.retry_policy = RetryPolicy(max_attempts=2, backoff_base=0)
+
+        with self.assertRaises(PagerDutyAPIServerException) as context:
+            self.alert.trigger(description='No data received')
+
+        self.assertEqual(context.exception.status_code, 503)
+        self.alert.trigger(description='No data received')
+        self.assertEqual(self.server.requests, 4)
+
+    def test_drop(self):
+        """
+        Test a dropped connection is a retryable failure
+        """
+        self.server.drop()
+
+        with self.assertRaises(PagerDutyAPIServerException) as context:
+            self.alert.trigger(description='No data received')
+
+        self.assertIsNone(context.exception.status_code)
+        self.alert.trigger(description='No data received')
+        self.assertEqual(len(self.server.events), 1)
+
+    def test_random_faults(self):
+        """
+        Test faults are injected at the configured rates
+        """
+        self.server.error_rate = 1
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.alert.trigger(description='No data received')
+
+        self.server.reset()
+        self.server.error_rate = 0
+        self.alert.trigger(description='No data received')
+        self.assertEqual(self.server.requests, 1)
+
+    def test_random_drops_and_throttles(self):
+        """
+        Test drops and throttles are injected at their rates
+        """
+        self.server.throttle_rate = 1
+        with self.assertRaises(PagerDutyAPIServerException) as context:
+            self.alert.trigger(description='No data received')
+        self.assertEqual(context.exception.status_code, 429)
+
+        self.server.drop_rate = 1
+        with self.assertRaises(PagerDutyAPIServerException) as context:
+            self.alert.trigger(description='No data received')
+        self.assertIsNone(context.exception.status_code)
+
+    def test_invalid_event(self):
+        """
+        Test a body that isn't JSON is refused
+        """
+        response = self.session.post(self.server.url + EVENTS_V1_PATH, data=b'{"torn')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.server.events, [])
+
+    def test_rest(self):
+        """
+        Test REST collections are paginated and objects served with ETags
+        """
+        self.server.add('incidents', [{'id': 'P{0}'.format(i)} for i in range(7)])
+        self.server.add('incidents/P1/log_entries', [{'id': 'L1'}])
+        self.server.add('services', [{'id': 'S1', 'name': 'web'}])
+        self.server.add('escalation_policies', [{'id': 'EP1'}])
+        policies = self.server.point(EscalationPolicies(api_key='123', session=self.session))
+        incidents = self.server.point(Incidents(api_key='123', session=self.session))
+        services = self.server.point(Services(api_key='123', session=self.session, cache=ResponseCache(ttl=0)))
+
+        self.assertEqual(len(list(incidents.list(page_size=2))), 7)
+        self.assertEqual(len(list(incidents.list(page_size=2, workers=3))), 7)
+        self.assertEqual(list(incidents.log_entries('P1')), [{'id': 'L1'}])
+        self.assertEqual(services.get('S1'), {'id': 'S1', 'name': 'web'})
+        self.assertEqual(services.get('S1'), {'id': 'S1', 'name': 'web'})
+        self.assertEqual(services.cache.revalidated, 1)
+        self.assertEqual(policies.get('EP1'), {'id': 'EP1'})
+
+        with self.assertRaises(PagerDutyAPIServerException) as context:
+            services.get('missing')
+        self.assertEqual(context.exception.status_code, 404)
+
+    def test_incident_changes(self):
+        """
+        Test incidents are updated, merged and snoozed in bulk
+        """
+        self.server.add('incidents', [{'id': 'P{0}'.format(i), 'status': 'triggered'} for i in range(4)])
+        incidents = self.server.point(Incidents(api_key='123', from_email='ops@example.com', session=self.session))
+
+        acknowledged = incidents.acknowledge_many(['P0', 'P1', 'P2'])
+        snoozed = incidents.snooze_many(3600, ids=['P0', 'P3'])
+        merged = incidents.merge('P0', ids=['P1', 'P2'])
+        missing = incidents.resolve_many(['P9'])
+
+        self.assertEqual([incident['status'] for incident in acknowledged.incidents], ['acknowledged'] * 3)
+        self.assertEqual(snoozed.succeeded, ['P0'])
+        self.assertEqual(snoozed.failed['P3'].status_code, 400)
+        self.assertEqual(merged.incidents, [{'id': 'P0', 'status': 'acknowledged', 'snoozed_for': 3600}])
+        self.assertEqual([incident['status'] for incident in self.server.collections['incidents']], [
+            'acknowledged', 'resolved', 'resolved', 'triggered',
+        ])
+        self.assertEqual(missing.failed['P9'].status_code, 404)
+        self.assertEqual(incidents.merge('P9', ids=['P1']).failed['P1'].status_code, 404)
+        self.assertEqual(incidents.snooze_many(60, ids=['P9']).failed['P9'].status_code, 404)
+
+    def test_invalid_incident_changes(self):
+        """
+        Test changes without a From header, with a body that isn't JSON, or to
+        an unknown path are refused
+        """
+        url = self.server.url + '/incidents'
+
+        no_from = self.session.put(url, data=b'{"incidents": []}')
+        invalid = self.session.put(url, data=b'{"torn', headers={'From': 'ops@example.com'})
+        unknown = self.session.put(self.server.url + '/services/S1', data=b'{}', headers={'From': 'ops@example.com'})
+
+        self.assertEqual(no_from.status_code, 400)
+        self.assertEqual(no_from.json()['error']['errors'], ['Requester User Not Found'])
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(unknown.status_code, 404)
+
+
+class FakePagerDutyServerTests(TestCase):
+    """
+    Tests for starting and stopping FakePagerDuty, and running it on its own
+    """
+
+    def test_context_manager(self):
+        """
+        Test the server answers within a with block and can be stopped without starting
+        """
+        with FakePagerDuty() as server:
+            response = requests.post(server.url + EVENTS_V1_PATH, data=b'{}')
+
+        self.assertEqual(response.status_code, 200)
+        FakePagerDuty().stop()
+
+    @skipIf(h2 is None, 'needs pip install httpx[http2]')
+    def test_http2_connection_closed(self):
+        """
+        Test an HTTP/2 connection is served until the client closes it
+        """
+        client_socket, server_socket = socket.socketpair()
+        self.addCleanup(client_socket.close)
+        self.addCleanup(server_socket.close)
+        connection = _HTTP2Connection(FakePagerDuty(), server_socket, server_socket.makefile('rb'))
+        thread = threading.Thread(target=connection.serve, daemon=True)
+        thread.start()
+
+        client = h2.connection.H2Connection(h2.config.H2Configuration(client_side=True))
+        client.initiate_connection()
+        client.close_connection()
+        data = client.data_to_send()
+        self.assertTrue(data.startswith(HTTP2_PREFACE))
+        client_socket.sendall(data)
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+
+    def test_main(self):
+        """
+        Test the command line runs a server until interrupted
+        """
+        argv = ['testing', '--port', '0', '--latency', '0.01', '--http2']
+        with patch.object(sys, 'argv', argv), patch('sys.stdout', io.StringIO()) as output, \
+                patch('pagerduty_api.testing.ThreadingHTTPServer.serve_forever', side_effect=KeyboardInterrupt):
+            main()
+
+        self.assertRegex(output.getvalue(), r'^Serving a fake PagerDuty on http://127.0.0.1:\d+\n$')
+
+    def test_module(self):
+        """
+        Test the module runs main()
+        """
+        with patch.object(sys, 'argv', ['testing', '--help']), patch('sys.stdout', io.StringIO()) as output, \
+                warnings.catch_warnings(), self.assertRaises(SystemExit):
+            # runpy warns that the module was already imported
+            warnings.simplefilter('ignore', RuntimeWarning)
+            runpy.run_module('pagerduty_api.testing', run_name='__main__')
+
+        self.assertIn('Runs a local stand-in for PagerDuty', output.getvalue())
@@ -0,0 +1,283 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+from mock import patch
+
+from pagerduty_api.alerts import Alert
+from pagerduty_api.alerts_v2 import AlertV2
+from pagerduty_api.exceptions import ConfigurationException, PagerDutyAPIServerException
+from pagerduty_api.tracker import IncidentStates, IncidentTracker
+
+
+class IncidentTrackerTests(TestCase):
+    """
+    Tests for IncidentTracker
+    """
+
+    def setUp(self):
+        self.tracker = IncidentTracker(max_size=3, clock=lambda: 100.0)
+
+    def test_transitions(self):
+        """
+        Test an incident moves from triggered to acknowledged to forgotten
+        """
+        self.assertEqual(self.tracker.transition('svc', 'a', 'trigger'), (True, None))
+        self.assertEqual(self.tracker.state('svc', 'a'), IncidentStates.TRIGGERED)
+
+        self.assertEqual(self.tracker.transition('svc', 'a', 'acknowledge'), (True, IncidentStates.TRIGGERED))
+        self.assertEqual(self.tracker.state('svc', 'a'), IncidentStates.ACKNOWLEDGED)
+
+        self.assertEqual(self.tracker.transition('svc', 'a', 'trigger'), (True, IncidentStates.ACKNOWLEDGED))
+        self.assertEqual(self.tracker.state('svc', 'a'), IncidentStates.ACKNOWLEDGED)
+
+        self.assertEqual(self.tracker.transition('svc', 'a', 'resolve'), (True, IncidentStates.ACKNOWLEDGED))
+        self.assertIsNone(self.tracker.state('svc', 'a'))
+        self.assertEqual(len(self.tracker), 0)
+
+    def test_redundant_transitions(self):
+        """
+        Test acknowledging or resolving an incident that isn't open is redundant
+        """
+        self.assertEqual(self.tracker.transition('svc', 'a', 'resolve'), (False, None))
+        self.assertEqual(self.tracker.transition('svc', 'a', 'acknowledge'), (False, None))
+
+        self.tracker.transition('svc', 'a', 'trigger')
+        self.tracker.transition('svc', 'a', 'acknowledge')
+        self.assertEqual(self.tracker.transition('svc', 'a', 'acknowledge'), (False, IncidentStates.ACKNOWLEDGED))
+
+        self.assertEqual(self.tracker.redundant, 3)
+
+    def test_other_event_types_allowed(self):
+        """
+        Test events that don't change incidents, such as change events, go through
+        """
+        self.assertEqual(self.tracker.transition('svc', 'a', 'change'), (True, None))
+        self.assertEqual(len(self.tracker), 0)
+
+    def test_rollback(self):
+        """
+        Test a failed event's transition can be undone
+        """
+        self.tracker.transition('svc', 'a', 'trigger')
+        self.tracker.rollback('svc', 'a', None)
+        self.assertIsNone(self.tracker.state('svc', 'a'))
+
+        self.tracker.transition('svc', 'b', 'trigger')
+        self.tracker.transition('svc', 'b', 'resolve')
+        self.tracker.rollback('svc', 'b', IncidentStates.TRIGGERED)
+        self.assertEqual(self.tracker.state('svc', 'b'), IncidentStates.TRIGGERED)
+
+        self.tracker.rollback('missing', 'c', None)
+        self.assertEqual(len(self.tracker), 1)
+
+    def test_bounded_per_service(self):
+        """
+        Test the least recently updated incidents of a service are forgotten once it is full
+        """
+        for key in 'abcd':
+            self.tracker.transition('svc', key, 'trigger')
+        self.tracker.transition('other', 'a', 'trigger')
+
+        self.assertEqual(self.tracker.open_incidents('svc'), ['b', 'c', 'd'])
+        self.assertEqual(self.tracker.open_incidents('other'), ['a'])
+        self.assertEqual(self.tracker.evicted, 1)
+
+    def test_evicted_incidents_are_unknown(self):
+        """
+        Test acknowledges and resolves are sent for incidents a full service may have forgotten
+        """
+        for key in 'abcd':
+            self.tracker.transition('svc', key, 'trigger')
+        self.tracker.transition('svc', 'b', 'acknowledge')
+
+        self.assertEqual(self.tracker.transition('svc', 'a', 'acknowledge'), (True, None))
+        self.assertEqual(self.tracker.transition('svc', 'a', 'resolve'), (True, None))
+        self.assertEqual(self.tracker.transition('svc', 'b', 'acknowledge'), (False, IncidentStates.ACKNOWLEDGED))
+        self.assertEqual(self.tracker.transition('other', 'a', 'resolve'), (False, None))
+
+        self.tracker.clear('svc')
+        self.assertEqual(self.tracker.transition('svc', 'a', 'resolve'), (False, None))
+
+    def test_open_incidents_by_state(self):
+        """
+        Test open incidents can be listed by state
+        """
+        self.tracker.transition('svc', 'a', 'trigger')
+        self.tracker.transition('svc', 'b', 'trigger')
+        self.tracker.transition('svc', 'b', 'acknowledge')
+
+        self.assertEqual(self.tracker.open_incidents('svc', IncidentStates.ACKNOWLEDGED), ['b'])
+        self.assertEqual(self.tracker.open_incidents('missing'), [])
+
+    def test_clear(self):
+        """
+        Test incidents can be forgotten per service or all at once
+        """
+        self.tracker.transition('svc', 'a', 'trigger')
+        self.tracker.transition('other', 'a', 'trigger')
+
+        self.tracker.clear('svc')
+        self.assertEqual(len(self.tracker), 1)
+        self.tracker.clear()
+        self.assertEqual(len(self.tracker), 0)
+
+
+class SnapshotTests(TestCase):
+    """
+    Tests for saving and loading an IncidentTracker
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'incidents.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_snapshot_and_restore(self):
+        """
+        Test open incidents survive a restart
+        """
+        tracker = IncidentTracker()
+        tracker.transition('svc', 'a', 'trigger')
+        tracker.transition('svc', 'b', 'trigger')
+        tracker.transition('svc', 'b', 'acknowledge')
+        tracker.snapshot(self.path)
+
+        restored = IncidentTracker()
+        restored.restore(self.path)
+
+        self.assertEqual(restored.open_incidents('svc'), ['a', 'b'])
+        self.assertEqual(restored.state('svc', 'b'), IncidentStates.ACKNOWLEDGED)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_snapshot_keeps_evicted_services(self):
+        """
+        Test a service that forgot incidents still sends events for unknown ones after a restart
+        """
+        tracker = IncidentTracker(max_size=1)
+        tracker.transition('svc', 'a', 'trigger')
+        tracker.transition('svc', 'b', 'trigger')
+        tracker.snapshot(self.path)
+
+        restored = IncidentTracker(max_size=1)
+        restored.restore(self.path)
+
+        self.assertEqual(restored.transition('svc', 'a', 'resolve'), (True, None))
+
+    def test_restore_missing_file(self):
+        """
+        Test restoring from a file that doesn't exist tracks nothing
+        """
+        tracker = IncidentTracker()
+        tracker.transition('svc', 'a', 'trigger')
+
+        tracker.restore(self.path)
+
+        self.assertEqual(len(tracker), 0)
+
+    def test_restore_unknown_version(self):
+        """
+        Test a file that isn't a snapshot is refused
+        """
+        with open(self.path, 'w') as f:
+            json.dump({'version': 99, 'services': {}}, f)
+
+        with self.assertRaises(ValueError):
+            IncidentTracker().restore(self.path)
+
+
+class AlertTrackingTests(TestCase):
+
+    def setUp(self):
+        self.service_key = '4baa5d20cfba466a5e075b02698f455c'
+        self.tracker = IncidentTracker()
+        self.alert = Alert(service_key=self.service_key, tracker=self.tracker)
+
+    @patch.object(requests.Session, 'post')
+    def test_many_incidents_per_alert(self, mock_post):
+        """
+        Test one alert tracks many incidents and skips redundant events
+        """
+        self.alert.trigger(description='web01 down', incident_key='web01')
+        self.alert.trigger(description='web02 down', incident_key='web02')
+        self.alert.resolve(incident_key='web01')
+        response = self.alert.resolve(incident_key='web01')
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(response['status'], 'redundant')
+        self.assertEqual(response['incident_key'], 'web01')
+        self.assertEqual(self.tracker.open_incidents(self.service_key), ['web02'])
+
+    @patch.object(requests.Session, 'post')
+    def test_resolve_evicted_incident(self, mock_post):
+        """
+        Test an incident forgotten to make room is still resolved in PagerDuty
+        """
+        mock_post.return_value.json.return_value = {'status': 'success'}
+        self.alert.tracker = IncidentTracker(max_size=2)
+        for key in 'abc':
+            self.alert.trigger(description='{0} down'.format(key), incident_key=key)
+
+        response = self.alert.resolve(incident_key='a')
+
+        self.assertEqual(response['status'], 'success')
+        self.assertEqual(mock_post.call_count, 4)
+
+    @patch.object(requests.Session, 'post')
+    def test_failed_event_rolled_back(self, mock_post):
+        """
+        Test an event that failed to send doesn't change the incident's state
+        """
+        mock_post.return_value.ok = False
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.alert.trigger(description='web01 down', incident_key='web01')
+
+        self.assertIsNone(self.tracker.state(self.service_key, 'web01'))
+
+    @patch.object(requests.Session, 'post')
+    def test_resolve_all(self, mock_post):
+        """
+        Test every open incident of the service is resolved
+        """
+        self.alert.trigger(description='web01 down', incident_key='web01')
+        self.alert.trigger(description='web02 down', incident_key='web02')
+        Alert(service_key='other', tracker=self.tracker).trigger(description='db down', incident_key='db')
+        mock_post.reset_mock()
+
+        results = self.alert.resolve_all(description='Deployed a fix')
+
+        self.assertTrue(all(result.ok for result in results))
+        sent = sorted(json.loads(call[1]['data'])['incident_key'] for call in mock_post.call_args_list)
+        self.assertEqual(sent, ['web01', 'web02'])
+        self.assertEqual(self.tracker.open_incidents(self.service_key), [])
+        self.assertEqual(self.tracker.open_incidents('other'), ['db'])
+
+    def test_resolve_all_needs_tracker(self):
+        """
+        Test resolve_all() raises without a tracker
+        """
+        with self.assertRaises(ConfigurationException):
+            Alert(service_key=self.service_key).resolve_all()
+
+    @patch.object(requests.Session, 'post')
+    def test_alert_v2(self, mock_post):
+        """
+        Test v2 events are tracked by routing and dedup key
+        """
+        alert = AlertV2(routing_key='R015Z2Y8HHSWQ1MEKHJ8MDU2Q7JKB4D4', tracker=self.tracker)
+        alert.trigger('Disk full', 'web01', dedup_key='disk')
+        alert.acknowledge('disk')
+
+        response = alert.acknowledge('disk')
+        alert.resolve_all()
+
+        self.assertEqual(response['status'], 'redundant')
+        self.assertEqual(response['dedup_key'], 'disk')
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(len(self.tracker), 0)
@@ -0,0 +1,343 @@
+import http.server
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import TestCase, skipIf
+
+from mock import MagicMock, patch
+
+import pagerduty_api
+from pagerduty_api import transports
+from pagerduty_api.alerts import Alert
+from pagerduty_api.base import Resource
+from pagerduty_api.cache import ResponseCache
+from pagerduty_api.exceptions import ConfigurationException, PagerDutyAPIServerException
+from pagerduty_api.rest import Incidents
+from pagerduty_api.retry import RetryPolicy
+from pagerduty_api.testing import FakePagerDuty
+from pagerduty_api.transports import (
+    HTTP2Transport, HTTPClientTransport, RequestsTransport, Urllib3Transport, get_default_transport, get_transport,
+    set_default_transport,
+)
+
+try:
+    import h2
+    import httpx
+except ImportError:  # pragma: no cover
+    h2 = httpx = None
+
+
+class TransportTestsMixin(object):
+    """
+    Tests every transport runs, sending real requests to a FakePagerDuty
+    """
+    transport_class = None
+    transport_kwargs = {}
+    server_kwargs = {}
+
+    def setUp(self):
+        self.server = FakePagerDuty(**self.server_kwargs).start()
+        self.addCleanup(self.server.stop)
+        self.transport = self.transport_class(**self.transport_kwargs)
+        self.addCleanup(self.transport.close)
+        self.alert = self.server.point(Alert(service_key='abc', transport=self.transport))
+
+    def test_trigger(self):
+        """
+        Test events are sent over one kept-alive connection
+        """
+        for _ in range(3):
+            response = self.alert.trigger(description='No data received', incident_key='web01')
+
+        self.assertEqual(response['incident_key'], 'web01')
+        self.assertEqual(self.server.events[0]['description'], 'No data received')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_params_and_etags(self):
+        """
+        Test query parameters are encoded, and ETags revalidated through a cache
+        """
+        self.server.add('incidents', [{'id': 'P{0}'.format(i), 'status': 'triggered'} for i in range(5)])
+        incidents = self.server.point(Incidents(api_key='123', transport=self.transport, cache=ResponseCache(ttl=0)))
+
+        listed = list(incidents.list(page_size=2, prefetch=False, **{'statuses[]': ['triggered', 'resolved']}))
+        incidents.get('P1')
+        incident = incidents.get('P1')
+
+        self.assertEqual(len(listed), 5)
+        self.assertEqual(incident['id'], 'P1')
+        self.assertEqual(incidents.cache.revalidated, 1)
+
+    def test_server_error(self):
+        """
+        Test error responses raise with their status code
+        """
+        self.server.fail(1, status=503)
+
+        with self.assertRaises(PagerDutyAPIServerException) as context:
+            self.alert.trigger(description='No data received')
+
+        self.assertEqual(context.exception.status_code, 503)
+
+    def test_dropped_connection_retried(self):
+        """
+        Test a dropped connection is a retryable failure without a status code
+        """
+        self.alert.trigger(description='No data received')
+        self.server.drop()
+        self.alert.retry_policy = RetryPolicy(max_attempts=2, backoff_base=0)
+
+        self.alert.trigger(description='No data received')
+
+        self.assertEqual(len(self.server.events), 2)
+
+    def test_unreachable(self):
+        """
+        Test a refused connection raises without a status code
+        """
+        self.alert.URL = 'http://127.0.0.1:1/generic/2010-04-15/create_event.json'
+
+        with self.assertRaises(PagerDutyAPIServerException) as context:
+            self.alert.trigger(description='No data received')
+
+        self.assertIsNone(context.exception.status_code)
+
+
+class HTTPClientTransportTests(TransportTestsMixin, TestCase):
+    transport_class = HTTPClientTransport
+
+    def test_connection_close(self):
+        """
+        Test a connection the server closes isn't kept alive
+        """
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+        self.addCleanup(server.server_close)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+
+        response = self.transport.request('get', 'http://127.0.0.1:{0}/'.format(server.server_port))
+        thread.join()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.transport._pools, {})
+
+    def test_read_timeout_not_resent(self):
+        """
+        Test a read timeout on a kept-alive connection raises instead of sending the event again
+        """
+        self.alert.trigger(description='No data received')
+        self.alert.timeout = (1, 0.05)
+        self.server.latency = 0.2
+
+        with self.assertRaises(PagerDutyAPIServerException):
+            self.alert.trigger(description='No data received')
+
+        self.assertEqual(self.server.connections, 1)
+
+    def test_pool_maxsize(self):
+        """
+        Test connections beyond pool_maxsize are closed instead of kept alive
+        """
+        self.transport.pool_maxsize = 0
+
+        self.alert.trigger(description='No data received')
+        self.alert.trigger(description='No data received')
+
+        self.assertEqual(self.server.connections, 2)
+
+    def test_https(self):
+        """
+        Test HTTPS URLs get TLS connections
+        """
+        import http.client
+
+        connection = self.transport._connect(('https', 'events.pagerduty.com', None), 5)
+
+        self.assertIsInstance(connection, http.client.HTTPSConnection)
+        self.assertEqual(connection.port, 443)
+
+
+class Urllib3TransportTests(TransportTestsMixin, TestCase):
+    transport_class = Urllib3Transport
+
+    def test_single_timeout(self):
+        """
+        Test a single timeout is passed to urllib3 as it is
+        """
+        self.alert.timeout = 5
+        with patch.object(self.transport._pool, 'request', wraps=self.transport._pool.request) as request:
+            self.alert.trigger(description='No data received')
+
+        self.assertEqual(request.call_args[1]['timeout'], 5)
+
+
+class RequestsTransportTests(TransportTestsMixin, TestCase):
+    transport_class = RequestsTransport
+
+    def setUp(self):
+        super(RequestsTransportTests, self).setUp()
+        # Closing the shared session would break other tests
+        self.transport.close = lambda: None
+
+    def test_own_session(self):
+        """
+        Test a transport given a session sends with it and closes it
+        """
+        session = MagicMock()
+        transport = RequestsTransport(session=session)
+
+        transport.request('get', 'https://api.pagerduty.com/incidents', params=None)
+        transport.close()
+
+        session.get.assert_called_once_with(url='https://api.pagerduty.com/incidents')
+        session.close.assert_called_once_with()
+
+
+@skipIf(httpx is None or h2 is None, 'needs pip install httpx[http2]')
+class HTTP2TransportTests(TransportTestsMixin, TestCase):
+    transport_class = HTTP2Transport
+    transport_kwargs = {'prior_knowledge': True}
+    server_kwargs = {'http2': True}
+
+    def test_multiplexed(self):
+        """
+        Test concurrent events are sent as streams over one connection
+        """
+        self.server.latency = 0.1
+        start = time.time()
+        events = [{'event_type': 'trigger', 'description': 'No data received', 'incident_key': str(i)}
+                  for i in range(20)]
+
+        results = self.alert.send_many(events, max_workers=20)
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.transport.versions, {'HTTP/2': 20})
+
+    def test_many_threads(self):
+        """
+        Test threads sharing the connection never send streams out of order
+        """
+        # Switching threads often makes any race between them show up
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        events = [{'event_type': 'trigger', 'description': 'No data received', 'incident_key': str(i)}
+                  for i in range(500)]
+
+        results = self.alert.send_many(events, max_workers=50)
+
+        self.assertEqual([result.exception for result in results if not result.ok], [])
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.transport.versions, {'HTTP/2': 500})
+
+    def test_closed_twice(self):
+        """
+        Test closing the transport again does nothing
+        """
+        self.alert.trigger(description='No data received')
+        self.transport.close()
+        self.transport.close()
+
+        self.assertFalse(self.transport._thread.is_alive())
+
+    def test_stream_limit(self):
+        """
+        Test no more than max_streams requests are in flight at once
+        """
+        transport = HTTP2Transport(max_streams=1, prior_knowledge=True)
+        self.addCleanup(transport.close)
+        alert = self.server.point(Alert(service_key='abc', transport=transport))
+        self.server.latency = 0.05
+        start = time.time()
+
+        alert.send_many([{'event_type': 'trigger', 'description': 'No data received', 'incident_key': str(i)}
+                         for i in range(3)], max_workers=3)
+
+        self.assertGreaterEqual(time.time() - start, 0.15)
+
+    def test_http1_fallback(self):
+        """
+        Test a server that doesn't speak HTTP/2 is sent HTTP/1.1
+        """
+        self.server.http2 = False
+
+        self.alert.trigger(description='No data received')
+        self.alert.trigger(description='No data received')
+
+        self.assertEqual(len(self.server.events), 2)
+        self.assertEqual(self.transport.versions, {'HTTP/1.1': 2})
+
+    def test_single_timeout(self):
+        """
+        Test a single timeout is passed to httpx as it is
+        """
+        self.alert.timeout = 5
+        with patch.object(self.transport, '_send', wraps=self.transport._send) as send:
+            self.alert.trigger(description='No data received')
+
+        self.assertEqual(send.call_args[0][-1]['timeout'], 5)
+
+
+class DefaultTransportTests(TestCase):
+    """
+    Tests for choosing transports
+    """
+
+    def tearDown(self):
+        set_default_transport(None)
+
+    def test_named_transports_are_shared(self):
+        """
+        Test a transport named by resources is shared between them
+        """
+        self.assertIs(Resource(transport='http.client').transport, get_transport('http.client'))
+        with self.assertRaises(ConfigurationException):
+            get_transport('curl')
+
+    def test_named_transport_race(self):
+        """
+        Test a transport created by another thread while waiting for the lock is the one returned
+        """
+        transport = HTTPClientTransport()
+        lock = MagicMock()
+        lock.__enter__.side_effect = lambda: transports._transports.setdefault('urllib3', transport)
+
+        with patch.dict(transports._transports, clear=True), patch.object(transports, '_transports_lock', lock):
+            self.assertIs(get_transport('urllib3'), transport)
+
+    def test_default_transport(self):
+        """
+        Test the default transport comes from set_default_transport, then the environment
+        """
+        self.assertIsInstance(Resource().transport, RequestsTransport)
+        with patch.dict(os.environ, {'PAGERDUTY_API_TRANSPORT': 'urllib3'}):
+            self.assertIsInstance(get_default_transport(), Urllib3Transport)
+
+        set_default_transport('http.client')
+
+        self.assertIsInstance(Resource().transport, HTTPClientTransport)
+
+    def test_requests_not_imported(self):
+        """
+        Test importing the package and building an alert doesn't import requests
+        """
+        script = "import sys, pagerduty_api; pagerduty_api.Alert(service_key='abc'); print('requests' in sys.modules)"
+
+        path = os.path.dirname(os.path.dirname(os.path.abspath(pagerduty_api.__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [path, os.environ.get('PYTHONPATH')])))
+
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=tempfile.gettempdir(), env=env)
+
+        self.assertEqual(output.strip(), b'False')
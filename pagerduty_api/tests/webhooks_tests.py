@@ -0,0 +1,260 @@
+import asyncio
+import importlib.util
+import io
+import json
+import queue
+import sys
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from pagerduty_api.exceptions import WebhookException, WebhookSignatureException
+from pagerduty_api.tracker import IncidentStates, IncidentTracker
+from pagerduty_api.webhooks import WebhookEvent, WebhookReceiver, sign, verify_signature
+
+SECRET = 'ChzhBwFYZVNE8MoNFlYlrXwqLaD1Sbb6wMDoEa3OQT9hBAg9Q1Oo8VBpUp6EB8Cx'
+
+
+def delivery(event_type='incident.triggered', incident_key='web01', service='PWEB', id='01ABC'):
+    return json.dumps({'event': {
+        'id': id,
+        'event_type': event_type,
+        'resource_type': 'incident',
+        'occurred_at': '2020-01-01T00:00:00.000Z',
+        'agent': None,
+        'data': {
+            'id': 'PINC1',
+            'type': 'incident',
+            'status': event_type.split('.')[-1],
+            'incident_key': incident_key,
+            'service': {'id': service, 'type': 'service_reference'},
+        },
+    }}).encode('utf-8')
+
+
+def wsgi_request(app, body, signature=None, method='POST'):
+    environ = {'REQUEST_METHOD': method, 'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body)}
+    if signature is not None:
+        environ['HTTP_X_PAGERDUTY_SIGNATURE'] = signature
+    start_response = Mock()
+    app(environ, start_response)
+    return start_response.call_args[0][0]
+
+
+class SignatureTests(TestCase):
+    """
+    Tests for verify_signature
+    """
+
+    def test_verify_signature(self):
+        """
+        Test a signature from any of the secrets is accepted
+        """
+        body = delivery()
+        header = 'v1=0000, {0}'.format(sign(body, SECRET))
+
+        self.assertTrue(verify_signature(body, header, ['old', SECRET]))
+        self.assertFalse(verify_signature(body, header, ['old']))
+        self.assertFalse(verify_signature(body + b' ', header, [SECRET]))
+        self.assertFalse(verify_signature(body, None, [SECRET]))
+
+
+class WebhookEventTests(TestCase):
+    """
+    Tests for WebhookEvent
+    """
+
+    def test_parse(self):
+        """
+        Test fields are read from the event without copying it
+        """
+        event = WebhookEvent.parse(delivery('incident.acknowledged'))
+
+        self.assertEqual(event.id, '01ABC')
+        self.assertEqual(event.event_type, 'incident.acknowledged')
+        self.assertEqual(event.incident_id, 'PINC1')
+        self.assertEqual(event.incident_key, 'web01')
+        self.assertEqual(event.service_id, 'PWEB')
+        self.assertIs(event.incident, event.raw['data'])
+        self.assertEqual(event.occurred_at, '2020-01-01T00:00:00.000Z')
+        self.assertIsNone(event.agent)
+        self.assertEqual(repr(event), '<WebhookEvent incident.acknowledged 01ABC>')
+
+    def test_parse_without_orjson(self):
+        """
+        Test deliveries are decoded with the standard library when orjson isn't installed
+        """
+        spec = importlib.util.find_spec('pagerduty_api.webhooks')
+        module = importlib.util.module_from_spec(spec)
+        with patch.dict(sys.modules, {'orjson': None}):
+            spec.loader.exec_module(module)
+
+        self.assertIs(module._loads, json.loads)
+        self.assertEqual(module.WebhookEvent.parse(delivery()).incident_key, 'web01')
+
+    def test_parse_sub_resource(self):
+        """
+        Test events about other resources find their incident reference
+        """
+        body = json.dumps({'event': {
+            'event_type': 'incident.annotated', 'resource_type': 'incident_note',
+            'data': {'incident': {'id': 'PINC1', 'type': 'incident_reference'}, 'content': 'Looking'},
+        }})
+
+        event = WebhookEvent.parse(body.encode('utf-8'))
+
+        self.assertEqual(event.incident_id, 'PINC1')
+        self.assertIsNone(event.service_id)
+
+    def test_parse_invalid(self):
+        """
+        Test bodies that aren't webhook payloads raise
+        """
+        for body in (b'not json', b'[]', b'{"event": {}}'):
+            with self.assertRaises(WebhookException):
+                WebhookEvent.parse(body)
+
+
+class WebhookReceiverTests(TestCase):
+    """
+    Tests for WebhookReceiver
+    """
+
+    def setUp(self):
+        self.callback = Mock()
+        self.receiver = WebhookReceiver(secrets=[SECRET], callback=self.callback, batch_size=2, flush_interval=60)
+
+    def tearDown(self):
+        self.receiver.close()
+
+    def test_batches(self):
+        """
+        Test events are handed over in full batches, and the rest on flush
+        """
+        for i in range(3):
+            body = delivery(id=str(i))
+            self.receiver.receive(body, sign(body, SECRET))
+
+        self.assertEqual([[event.id for event in call[0][0]] for call in self.callback.call_args_list], [['0', '1']])
+        self.receiver.flush()
+        self.assertEqual([event.id for event in self.callback.call_args[0][0]], ['2'])
+        self.assertEqual(self.receiver.received, 3)
+
+    def test_flush_interval(self):
+        """
+        Test a partial batch is handed over after the flush interval, onto a queue
+        """
+        batches = queue.Queue()
+        receiver = WebhookReceiver(queue=batches, flush_interval=0.01)
+        receiver.receive(delivery())
+
+        batch = batches.get(timeout=5)
+        receiver.close()
+
+        self.assertEqual([event.incident_key for event in batch], ['web01'])
+
+    def test_bad_signature(self):
+        """
+        Test deliveries without a valid signature are rejected
+        """
+        with self.assertRaises(WebhookSignatureException):
+            self.receiver.receive(delivery(), 'v1=0000')
+
+        self.receiver.flush()
+        self.assertFalse(self.callback.called)
+        self.assertEqual(self.receiver.rejected, 1)
+
+    def test_tracker(self):
+        """
+        Test incident states are kept in sync with the tracker
+        """
+        tracker = IncidentTracker()
+        receiver = WebhookReceiver(tracker=tracker, service_keys={'PWEB': 'service-key'})
+
+        receiver.receive(delivery('incident.triggered'))
+        receiver.receive(delivery('incident.acknowledged'))
+        receiver.receive(delivery('incident.triggered', service='POTHER'))
+        self.assertEqual(tracker.state('service-key', 'web01'), IncidentStates.ACKNOWLEDGED)
+        self.assertEqual(len(tracker), 1)
+
+        receiver.receive(delivery('incident.resolved'))
+        self.assertIsNone(tracker.state('service-key', 'web01'))
+
+    def test_wsgi(self):
+        """
+        Test the WSGI app answers with the status of each delivery
+        """
+        body = delivery()
+
+        self.assertEqual(wsgi_request(self.receiver.wsgi, body, sign(body, SECRET)), '204 No Content')
+        self.assertEqual(wsgi_request(self.receiver.wsgi, body, 'v1=0000'), '401 Unauthorized')
+        self.assertEqual(wsgi_request(self.receiver.wsgi, b'{}', sign(b'{}', SECRET)), '400 Bad Request')
+        self.assertEqual(wsgi_request(self.receiver.wsgi, b'', method='GET'), '405 Method Not Allowed')
+
+    def test_wsgi_invalid_content_length(self):
+        """
+        Test a delivery with an invalid Content-Length is read as empty and refused
+        """
+        environ = {
+            'REQUEST_METHOD': 'POST', 'CONTENT_LENGTH': 'many', 'wsgi.input': io.BytesIO(delivery()),
+            'HTTP_X_PAGERDUTY_SIGNATURE': sign(b'', SECRET),
+        }
+        start_response = Mock()
+
+        self.receiver.wsgi(environ, start_response)
+
+        self.assertEqual(start_response.call_args[0][0], '400 Bad Request')
+
+    def test_callback_errors_logged(self):
+        """
+        Test a failing callback is logged without losing later batches
+        """
+        self.callback.side_effect = [ValueError('Database down'), None]
+
+        with patch('pagerduty_api.webhooks.LOG') as log:
+            for i in range(4):
+                body = delivery(id=str(i))
+                self.receiver.receive(body, sign(body, SECRET))
+
+        self.assertEqual(self.callback.call_count, 2)
+        log.exception.assert_called_once_with('Failed to hand over 2 PagerDuty webhook events')
+
+    def test_asgi_other_requests(self):
+        """
+        Test the ASGI app ignores other scopes and refuses methods other than POST
+        """
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request'}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.receiver.asgi({'type': 'lifespan'}, receive, send))
+        asyncio.run(self.receiver.asgi({'type': 'http', 'method': 'GET'}, receive, send))
+
+        self.assertEqual([message.get('status') for message in sent], [405, None])
+
+    def test_asgi(self):
+        """
+        Test the ASGI app reads a chunked body and answers with the status of the delivery
+        """
+        body = delivery()
+        messages = [
+            {'type': 'http.request', 'body': body[:10], 'more_body': True},
+            {'type': 'http.request', 'body': body[10:]},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'headers': [(b'x-pagerduty-signature', sign(body, SECRET).encode())]}
+        asyncio.run(self.receiver.asgi(scope, receive, send))
+
+        self.assertEqual(sent[0]['status'], 204)
+        self.assertEqual(self.receiver.received, 1)
@@ -0,0 +1,239 @@
+import collections
+import json
+import os
+import threading
+import time
+
+SNAPSHOT_VERSION = 1
+
+
+class IncidentStates(object):
+    TRIGGERED = 'triggered'
+    ACKNOWLEDGED = 'acknowledged'
+
+
+class _Incident(object):
+    """
+    The state of one open incident
+    """
+    __slots__ = ('state', 'triggered_at', 'updated_at')
+
+    def __init__(self, state, triggered_at, updated_at):
+        self.state = state
+        self.triggered_at = triggered_at
+        self.updated_at = updated_at
+
+
+class IncidentTracker(object):
+    """
+    Tracks the state of many open incidents per service, so that one resource
+    can manage them all.
+
+    Only open incidents are kept: an incident is remembered from its trigger
+    until its resolve. An acknowledge or resolve for an incident that isn't open,
+    or an acknowledge for one already acknowledged, is redundant and isn't sent.
+    A trigger always is, and leaves an acknowledged incident acknowledged, as
+    PagerDuty does. Once a service has had incidents evicted, see ``max_size``,
+    acknowledges and resolves for incidents it doesn't know are always sent.
+
+    The tracker is thread-safe and can be shared between resources. Save it with
+    :meth:`snapshot` before a restart and load it back with :meth:`restore`.
+    """
+    def __init__(self, max_size=10000, clock=time.time):
+        """
+        :type max_size: int
+        :param max_size: The most open incidents remembered per service. The
+                least recently updated are forgotten first. A forgotten incident
+                may still be open, so once a service has forgotten one, events for
+                incidents the tracker doesn't know are no longer treated as
+                redundant: they are sent, and only repeats for known incidents
+                are skipped
+
+        :type clock: callable
+        :param clock: Returns the current time in seconds since the epoch
+        """
+        self.max_size = max_size
+        self.clock = clock
+        self.redundant = 0
+        self.evicted = 0
+
+        # service_key -> incident_key -> _Incident, least recently updated first
+        self._services = {}
+        # The services that have had open incidents evicted
+        self._evicted_services = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(incidents) for incidents in self._services.values())
+
+    def state(self, service_key, incident_key):
+        """
+        :rtype: str
+        :return: The :class:`IncidentStates` of an incident, or None if it isn't open
+        """
+        incident = self._services.get(service_key, {}).get(incident_key)
+        return incident.state if incident is not None else None
+
+    def open_incidents(self, service_key, state=None):
+        """
+        :type service_key: str
+        :param service_key: The service (or routing) key
+
+        :type state: str
+        :param state: Only list incidents in this :class:`IncidentStates`
+
+        :rtype: list
+        :return: The incident keys open for the service, least recently updated first
+        """
+        with self._lock:
+            incidents = self._services.get(service_key, {})
+            return [key for key, incident in incidents.items() if state is None or incident.state == state]
+
+    def transition(self, service_key, incident_key, event_type):
+        """
+        Records an event about to be sent
+
+        :type service_key: str
+        :param service_key: The service (or routing) key of the event
+
+        :type incident_key: str
+        :param incident_key: The incident (or dedup) key of the event
+
+        :type event_type: str
+        :param event_type: The type (or action) of the event. Types other than
+                ``trigger``, ``acknowledge`` and ``resolve`` are always allowed
+
+        :rtype: tuple
+        :return: Whether the event should be sent, and the incident's previous
+                state to pass to :meth:`rollback` if it fails
+        """
+        with self._lock:
+            incidents = self._services.get(service_key)
+            incident = incidents.get(incident_key) if incidents is not None else None
+            previous = incident.state if incident is not None else None
+            now = self.clock()
+
+            if event_type == 'trigger':
+                if incidents is None:
+                    incidents = self._services[service_key] = collections.OrderedDict()
+                self._set(service_key, incidents, incident_key, previous or IncidentStates.TRIGGERED, now)
+            elif event_type == 'acknowledge' and previous == IncidentStates.TRIGGERED:
+                self._set(service_key, incidents, incident_key, IncidentStates.ACKNOWLEDGED, now)
+            elif event_type == 'resolve' and previous is not None:
+                self._forget(service_key, incident_key)
+            elif event_type in ('acknowledge', 'resolve') and (
+                previous is not None or service_key not in self._evicted_services
+            ):
+                self.redundant += 1
+                return False, previous
+            return True, previous
+
+    def rollback(self, service_key, incident_key, previous):
+        """
+        Puts an incident back in the state it had before an event that failed
+
+        :type previous: str
+        :param previous: The state returned by :meth:`transition`
+        """
+        self.set_state(service_key, incident_key, previous)
+
+    def set_state(self, service_key, incident_key, state):
+        """
+        Records the state of an incident as PagerDuty reports it, such as in a webhook
+
+        :type state: str
+        :param state: An :class:`IncidentStates`, or None if the incident is resolved
+        """
+        with self._lock:
+            if state is None:
+                self._forget(service_key, incident_key)
+            else:
+                incidents = self._services.setdefault(service_key, collections.OrderedDict())
+                self._set(service_key, incidents, incident_key, state, self.clock())
+
+    def clear(self, service_key=None):
+        """
+        Forgets every open incident, or only those of one service
+        """
+        with self._lock:
+            if service_key is None:
+                self._services.clear()
+                self._evicted_services.clear()
+            else:
+                self._services.pop(service_key, None)
+                self._evicted_services.discard(service_key)
+
+    def snapshot(self, path):
+        """
+        Saves the open incidents to a file. The file is replaced atomically, so a
+        crash while saving leaves the previous snapshot intact
+
+        :type path: str
+        :param path: The file to save to
+        """
+        with self._lock:
+            services = dict(
+                (service_key, [
+                    [incident_key, incident.state, incident.triggered_at, incident.updated_at]
+                    for incident_key, incident in incidents.items()
+                ])
+                for service_key, incidents in self._services.items()
+            )
+            evicted = sorted(self._evicted_services)
+
+        temp_path = '{0}.tmp'.format(path)
+        with open(temp_path, 'w') as f:
+            json.dump(
+                {'version': SNAPSHOT_VERSION, 'services': services, 'evicted': evicted}, f, separators=(',', ':')
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def restore(self, path):
+        """
+        Loads the open incidents saved by :meth:`snapshot`, replacing those tracked
+
+        :type path: str
+        :param path: The file to load from. If it doesn't exist, nothing is tracked
+
+        :raises: A ``ValueError`` if the file isn't a snapshot
+        """
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            snapshot = {'version': SNAPSHOT_VERSION, 'services': {}}
+
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Unknown incident snapshot version {0}'.format(snapshot.get('version')))
+
+        services = {}
+        for service_key, incidents in snapshot['services'].items():
+            services[service_key] = collections.OrderedDict(
+                (incident_key, _Incident(state, triggered_at, updated_at))
+                for incident_key, state, triggered_at, updated_at in incidents
+            )
+        with self._lock:
+            self._services = services
+            self._evicted_services = set(snapshot.get('evicted', []))
+
+    def _set(self, service_key, incidents, incident_key, state, now):
+        incident = incidents.get(incident_key)
+        if incident is None:
+            incidents[incident_key] = _Incident(state, now, now)
+            if len(incidents) > self.max_size:
+                incidents.popitem(last=False)
+                self.evicted += 1
+                self._evicted_services.add(service_key)
+        else:
+            incident.state = state
+            incident.updated_at = now
+            incidents.move_to_end(incident_key)
+
+    def _forget(self, service_key, incident_key):
+        incidents = self._services.get(service_key)
+        if incidents is not None:
+            incidents.pop(incident_key, None)
+            if not incidents:
+                del self._services[service_key]
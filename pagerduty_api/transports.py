@@ -0,0 +1,435 @@
+"""
+Transports send the HTTP requests of resources. ``requests``, ``urllib3`` and
+``httpx`` are only imported when their transport is first used, so scripts that
+pick the ``http.client`` transport never import them.
+
+Pick a transport per resource with ``transport=``, or for the whole process
+with :func:`set_default_transport` or the ``PAGERDUTY_API_TRANSPORT``
+environment variable (``requests``, ``urllib3``, ``http.client`` or ``http2``).
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from .exceptions import ConfigurationException, TransportException
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_TRANSPORT = 'requests'
+DEFAULT_POOL_MAXSIZE = 10
+
+_transports = {}
+_transports_lock = threading.Lock()
+_default_transport = None
+
+
+class Response(object):
+    """
+    A response read in full, with the attributes of a :class:`requests.Response`
+    that resources use
+    """
+    def __init__(self, status_code, headers, content, elapsed):
+        """
+        :type headers: dict
+        :param headers: The response headers. Lookups should ignore case
+
+        :type content: bytes
+        :param content: The response body
+
+        :type elapsed: float
+        :param elapsed: Seconds from sending the request to reading the response headers
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.elapsed = _Elapsed(elapsed)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Elapsed(object):
+    # Stands in for the timedelta of requests, without importing datetime
+    __slots__ = ('seconds',)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def total_seconds(self):
+        return self.seconds
+
+
+class Transport(object):
+    """
+    A base class for transports. Transports are thread-safe and keep their
+    connections alive between requests
+    """
+    def request(self, method, url, data=None, params=None, headers=None, timeout=None):
+        """
+        Sends a request
+
+        :type method: str
+        :param method: The HTTP method, in lower case
+
+        :type data: bytes
+        :param data: The request body
+
+        :type params: dict
+        :param params: Query parameters. List values are sent once per item
+
+        :type timeout: float or tuple
+        :param timeout: A (connect, read) timeout in seconds
+
+        :raises: A :class:`TransportException <pagerduty_api.exceptions.TransportException>`
+                if PagerDuty can't be reached or doesn't answer in time
+
+        :rtype: :class:`Response` or :class:`requests.Response`
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Closes the transport's idle connections
+        """
+
+
+class RequestsTransport(Transport):
+    """
+    Sends requests through a :class:`requests.Session`
+    """
+    def __init__(self, session=None):
+        """
+        :type session: :class:`requests.Session`
+        :param session: The session to send with. If None, the shared session from
+                :func:`get_default_session <pagerduty_api.base.get_default_session>` is used
+        """
+        self._session = session
+
+    @property
+    def session(self):
+        if self._session is not None:
+            return self._session
+        from .base import get_default_session
+        return get_default_session()
+
+    def request(self, method, url, **kwargs):
+        import requests
+
+        kwargs = dict((name, value) for name, value in kwargs.items() if value is not None)
+        try:
+            return getattr(self.session, method)(url=url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TransportException(str(e))
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+class Urllib3Transport(Transport):
+    """
+    Sends requests through a :class:`urllib3.PoolManager`, without the overhead of ``requests``
+    """
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False):
+        """
+        :type pool_maxsize: int
+        :param pool_maxsize: The most connections kept alive per host
+
+        :type pool_block: bool
+        :param pool_block: If True, requests wait for a free connection instead
+                of opening a throwaway one when the pool is exhausted
+        """
+        import urllib3
+
+        self._urllib3 = urllib3
+        self._pool = urllib3.PoolManager(maxsize=pool_maxsize, block=pool_block)
+
+    def request(self, method, url, data=None, params=None, headers=None, timeout=None):
+        urllib3 = self._urllib3
+        if isinstance(timeout, tuple):
+            timeout = urllib3.Timeout(connect=timeout[0], read=timeout[1])
+        if params:
+            url = _with_query(url, params)
+
+        start = time.time()
+        try:
+            response = self._pool.request(
+                method.upper(), url, body=data, headers=headers, timeout=timeout, retries=False, redirect=False
+            )
+        except urllib3.exceptions.HTTPError as e:
+            raise TransportException(str(e))
+        return Response(response.status, response.headers, response.data, time.time() - start)
+
+    def close(self):
+        self._pool.clear()
+
+
+class HTTPClientTransport(Transport):
+    """
+    Sends requests with the standard library's :mod:`http.client`, keeping up
+    to ``pool_maxsize`` idle connections per host. It has no dependencies and
+    the smallest import cost, for short-lived scripts and hooks
+    """
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+        """
+        :type pool_maxsize: int
+        :param pool_maxsize: The most idle connections kept alive per host
+        """
+        self.pool_maxsize = pool_maxsize
+        # (scheme, host, port) -> idle connections, most recently used last
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, data=None, params=None, headers=None, timeout=None):
+        import http.client
+        import socket
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        if params:
+            path = _with_query(path, params)
+        key = (parts.scheme, parts.hostname, parts.port)
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+
+        # A kept-alive connection may have been closed by the server, so one failure on it is retried
+        connection, reused = self._checkout(key, connect_timeout)
+        while True:
+            start = time.time()
+            try:
+                if connection.sock is None:
+                    connection.connect()
+                connection.sock.settimeout(read_timeout)
+                connection.request(method.upper(), path, body=data, headers=headers or {})
+                response = connection.getresponse()
+                elapsed = time.time() - start
+                content = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                # socket.timeout is only a TimeoutError from Python 3.10
+                if reused and not isinstance(e, (TimeoutError, socket.timeout)):
+                    connection, reused = self._connect(key, connect_timeout), False
+                    continue
+                raise TransportException(str(e) or e.__class__.__name__)
+            break
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(key, connection)
+        return Response(response.status, response.headers, content, elapsed)
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for connections in pools.values():
+            for connection in connections:
+                connection.close()
+
+    def _checkout(self, key, timeout):
+        with self._lock:
+            connections = self._pools.get(key)
+            if connections:
+                connection = connections.pop()
+                connection.timeout = timeout
+                return connection, True
+        return self._connect(key, timeout), False
+
+    def _checkin(self, key, connection):
+        with self._lock:
+            connections = self._pools.setdefault(key, [])
+            if len(connections) < self.pool_maxsize:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def _connect(self, key, timeout):
+        import http.client
+
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+class HTTP2Transport(Transport):
+    """
+    Sends requests over HTTP/2 with `httpx`_, so that concurrent requests share
+    one connection as multiplexed streams instead of each needing a connection
+    of their own. Needs ``pip install pagerduty-api[http2]``.
+
+    Over HTTPS the protocol is negotiated, and servers that only speak HTTP/1.1
+    are sent HTTP/1.1. With ``prior_knowledge``, plain HTTP URLs are sent HTTP/2
+    without negotiation; a host that turns out not to speak it is sent
+    HTTP/1.1 from then on.
+
+    httpx's blocking HTTP/2 client can send streams out of order when threads
+    share a connection, which servers answer by closing it. Requests are instead
+    handed to one asynchronous client running in a thread of its own, so threads
+    can share the transport.
+
+    .. _httpx: https://www.python-httpx.org/http2/
+    """
+    def __init__(self, max_streams=100, pool_maxsize=1, prior_knowledge=False):
+        """
+        :type max_streams: int
+        :param max_streams: The most requests in flight at once. Servers may
+                allow fewer streams per connection, in which case requests wait
+
+        :type pool_maxsize: int
+        :param pool_maxsize: The most connections per host. One is usually enough
+
+        :type prior_knowledge: bool
+        :param prior_knowledge: If True, plain HTTP URLs are sent HTTP/2 without
+                negotiating it first
+        """
+        import asyncio
+        import httpx
+
+        self._asyncio = asyncio
+        self._httpx = httpx
+        self.max_streams = max_streams
+        self.prior_knowledge = prior_knowledge
+        limits = httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+        self._client = httpx.AsyncClient(http1=not prior_knowledge, http2=True, limits=limits)
+        self._http1_client = None
+        self._streams = threading.BoundedSemaphore(max_streams)
+        self._lock = threading.Lock()
+        # Hosts known to answer HTTP/2 or known not to, with prior knowledge. Only the loop uses them
+        self._http2_hosts = set()
+        self._http1_hosts = set()
+        # HTTP version -> responses received with it
+        self.versions = {}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='pagerduty-api-http2')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def request(self, method, url, data=None, params=None, headers=None, timeout=None):
+        httpx = self._httpx
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        host = httpx.URL(url).netloc
+        kwargs = dict(content=data, params=params, headers=headers, timeout=timeout)
+
+        start = time.time()
+        with self._streams:
+            try:
+                send = self._send(host, method.upper(), url, kwargs)
+                response = self._asyncio.run_coroutine_threadsafe(send, self._loop).result()
+            except httpx.TransportError as e:
+                raise TransportException(str(e) or e.__class__.__name__)
+
+        with self._lock:
+            self.versions[response.http_version] = self.versions.get(response.http_version, 0) + 1
+        return Response(response.status_code, response.headers, response.content, time.time() - start)
+
+    def close(self):
+        with self._lock:
+            if self._loop.is_closed():
+                return
+            self._asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    async def _close(self):
+        await self._client.aclose()
+        if self._http1_client is not None:
+            await self._http1_client.aclose()
+
+    async def _send(self, host, method, url, kwargs):
+        httpx = self._httpx
+        if host in self._http1_hosts:
+            return await self._get_http1_client().request(method, url, **kwargs)
+        try:
+            response = await self._client.request(method, url, **kwargs)
+        except (httpx.RemoteProtocolError, httpx.ReadError, httpx.WriteError):
+            # Servers that don't speak HTTP/2 answer the preface with an error and hang up
+            if not self.prior_knowledge or host in self._http2_hosts:
+                raise
+            LOG.warning('{0} does not speak HTTP/2, falling back to HTTP/1.1'.format(host.decode('ascii')))
+            self._http1_hosts.add(host)
+            return await self._get_http1_client().request(method, url, **kwargs)
+        self._http2_hosts.add(host)
+        return response
+
+    def _get_http1_client(self):
+        if self._http1_client is None:
+            self._http1_client = self._httpx.AsyncClient(http1=True, http2=False)
+        return self._http1_client
+
+
+def _with_query(url, params):
+    from urllib.parse import urlencode
+
+    return '{0}{1}{2}'.format(url, '&' if '?' in url else '?', urlencode(params, doseq=True))
+
+
+TRANSPORTS = {
+    'requests': RequestsTransport,
+    'urllib3': Urllib3Transport,
+    'http.client': HTTPClientTransport,
+    'http2': HTTP2Transport,
+}
+
+
+def get_transport(name):
+    """
+    Returns the shared transport of a kind, creating it on first use
+
+    :type name: str
+    :param name: ``requests``, ``urllib3``, ``http.client`` or ``http2``
+
+    :raises: A :class:`ConfigurationException <pagerduty_api.exceptions.ConfigurationException>`
+            if there is no such transport
+
+    :rtype: :class:`Transport`
+    """
+    transport = _transports.get(name)
+    if transport is None:
+        if name not in TRANSPORTS:
+            raise ConfigurationException('Unknown transport {0!r}, expected one of {1}'.format(
+                name, ', '.join(sorted(TRANSPORTS))
+            ))
+        with _transports_lock:
+            transport = _transports.get(name)
+            if transport is None:
+                transport = _transports[name] = TRANSPORTS[name]()
+    return transport
+
+
+def get_default_transport():
+    """
+    Returns the transport used by resources that weren't given a transport or a
+    session: the one set with :func:`set_default_transport`, or else the one named
+    by the ``PAGERDUTY_API_TRANSPORT`` environment variable, or ``requests``
+
+    :rtype: :class:`Transport`
+    """
+    if _default_transport is not None:
+        return _default_transport
+    return get_transport(os.environ.get('PAGERDUTY_API_TRANSPORT') or DEFAULT_TRANSPORT)
+
+
+def set_default_transport(transport):
+    """
+    Sets the transport used by resources that weren't given one
+
+    :type transport: :class:`Transport` or str
+    :param transport: A transport, the name of a shared one, or None to go back
+            to the environment variable or ``requests``
+    """
+    global _default_transport
+    _default_transport = get_transport(transport) if isinstance(transport, str) else transport
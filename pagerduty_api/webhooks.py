@@ -0,0 +1,390 @@
+"""
+Receives PagerDuty `v3 webhooks`_, as a WSGI or ASGI app or by passing
+deliveries to :meth:`WebhookReceiver.receive` from any web framework.
+
+.. _v3 webhooks: https://developer.pagerduty.com/docs/webhooks/v3-overview/
+"""
+import hashlib
+import hmac
+import json
+import logging
+import threading
+
+from .exceptions import WebhookException, WebhookSignatureException
+from .tracker import IncidentStates
+
+LOG = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-PagerDuty-Signature'
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+
+class WebhookEventTypes(object):
+    INCIDENT_TRIGGERED = 'incident.triggered'
+    INCIDENT_ACKNOWLEDGED = 'incident.acknowledged'
+    INCIDENT_UNACKNOWLEDGED = 'incident.unacknowledged'
+    INCIDENT_REOPENED = 'incident.reopened'
+    INCIDENT_RESOLVED = 'incident.resolved'
+    INCIDENT_ESCALATED = 'incident.escalated'
+    INCIDENT_REASSIGNED = 'incident.reassigned'
+    INCIDENT_ANNOTATED = 'incident.annotated'
+    INCIDENT_PRIORITY_UPDATED = 'incident.priority_updated'
+    INCIDENT_RESPONDER_ADDED = 'incident.responder.added'
+    INCIDENT_STATUS_UPDATE_PUBLISHED = 'incident.status_update_published'
+    PAGEY_PING = 'pagey.ping'
+
+
+# The state an incident is left in by each event type that changes it. None is resolved
+TRACKED_STATES = {
+    WebhookEventTypes.INCIDENT_TRIGGERED: IncidentStates.TRIGGERED,
+    WebhookEventTypes.INCIDENT_ACKNOWLEDGED: IncidentStates.ACKNOWLEDGED,
+    WebhookEventTypes.INCIDENT_UNACKNOWLEDGED: IncidentStates.TRIGGERED,
+    WebhookEventTypes.INCIDENT_REOPENED: IncidentStates.TRIGGERED,
+    WebhookEventTypes.INCIDENT_RESOLVED: None,
+}
+
+
+def sign(body, secret):
+    """
+    Returns the signature PagerDuty sends with a body, for tests and local tools
+
+    :rtype: str
+    """
+    return 'v1=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, header, secrets):
+    """
+    Checks a delivery was signed with one of the secrets. PagerDuty signs with
+    every active secret while one is being rotated, so the header can hold
+    several signatures
+
+    :type body: bytes
+    :param body: The raw request body
+
+    :type header: str
+    :param header: The ``X-PagerDuty-Signature`` header
+
+    :type secrets: list
+    :param secrets: The signing secrets of the webhook subscriptions
+
+    :rtype: bool
+    """
+    if not header:
+        return False
+    signatures = [signature.strip() for signature in header.split(',')]
+    for secret in secrets:
+        expected = sign(body, secret)
+        for signature in signatures:
+            if hmac.compare_digest(expected, signature):
+                return True
+    return False
+
+
+class WebhookEvent(object):
+    """
+    One webhook event. Fields are read from the decoded payload when they are
+    accessed, so nothing is copied
+    """
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        """
+        :type raw: dict
+        :param raw: The ``event`` object of a delivery
+        """
+        self.raw = raw
+
+    def __repr__(self):
+        return '<WebhookEvent {0} {1}>'.format(self.event_type, self.id)
+
+    @classmethod
+    def parse(cls, body):
+        """
+        Decodes the body of a delivery
+
+        :type body: bytes
+        :param body: The raw request body
+
+        :raises: A :class:`WebhookException <pagerduty_api.exceptions.WebhookException>`
+                if it isn't a webhook payload
+
+        :rtype: :class:`WebhookEvent`
+        """
+        try:
+            payload = _loads(body)
+        except ValueError as e:
+            raise WebhookException('Webhook body is not JSON: {0}'.format(e))
+        event = payload.get('event') if isinstance(payload, dict) else None
+        if not isinstance(event, dict) or 'event_type' not in event:
+            raise WebhookException('Webhook body has no event')
+        return cls(event)
+
+    @property
+    def id(self):
+        return self.raw.get('id')
+
+    @property
+    def event_type(self):
+        """
+        One of the :class:`WebhookEventTypes`
+        """
+        return self.raw['event_type']
+
+    @property
+    def resource_type(self):
+        return self.raw.get('resource_type')
+
+    @property
+    def occurred_at(self):
+        return self.raw.get('occurred_at')
+
+    @property
+    def agent(self):
+        return self.raw.get('agent')
+
+    @property
+    def data(self):
+        """
+        The resource the event is about, such as an incident
+        """
+        return self.raw.get('data') or {}
+
+    @property
+    def incident(self):
+        """
+        The incident, or the reference to the incident, the event is about, or None
+        """
+        data = self.data
+        if self.resource_type == 'incident':
+            return data
+        return data.get('incident')
+
+    @property
+    def incident_id(self):
+        incident = self.incident
+        return incident.get('id') if incident else None
+
+    @property
+    def incident_key(self):
+        incident = self.incident
+        return incident.get('incident_key') if incident else None
+
+    @property
+    def service_id(self):
+        incident = self.incident
+        service = (incident or {}).get('service') or {}
+        return service.get('id')
+
+
+class WebhookReceiver(object):
+    """
+    Verifies, parses and batches webhook deliveries.
+
+    Events are handed to ``callback``, or put on ``queue``, as lists of up to
+    ``batch_size`` events, and at least every ``flush_interval`` seconds. With a
+    ``tracker``, the state of incidents is updated from their events, so alerts
+    sharing it know about incidents acknowledged or resolved in PagerDuty.
+
+    The receiver is thread-safe. Serve :meth:`wsgi` or :meth:`asgi` directly,
+    or call :meth:`receive` from a view:
+
+        ::
+
+            receiver = WebhookReceiver(secrets=['...'], callback=store_events)
+            app = receiver.wsgi  # gunicorn myapp:app
+    """
+    def __init__(self, secrets=None, callback=None, queue=None, batch_size=100, flush_interval=1, tracker=None,
+                 service_keys=None):
+        """
+        :type secrets: list
+        :param secrets: The signing secrets of the webhook subscriptions. If
+                None, signatures aren't checked
+
+        :type callback: callable
+        :param callback: Called with each batch of :class:`WebhookEvent`. It is
+                called from the thread that received the last event of a full
+                batch, or from the flush thread, so it should be quick
+
+        :type queue: :class:`queue.Queue`
+        :param queue: If given, each batch is put on it
+
+        :type batch_size: int
+        :param batch_size: The most events in a batch
+
+        :type flush_interval: float
+        :param flush_interval: The most seconds an event waits for its batch to fill
+
+        :type tracker: :class:`IncidentTracker <pagerduty_api.tracker.IncidentTracker>`
+        :param tracker: If given, kept in sync with the incident events received
+
+        :type service_keys: dict
+        :param service_keys: Maps PagerDuty service IDs to the service (or routing)
+                keys the tracker knows them by. Events of other services aren't
+                tracked. If None, service IDs are used
+        """
+        self.secrets = list(secrets) if secrets is not None else None
+        self.callback = callback
+        self.queue = queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.tracker = tracker
+        self.service_keys = service_keys
+        self.received = 0
+        self.rejected = 0
+
+        self._batch = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def receive(self, body, signature=None):
+        """
+        Handles one delivery
+
+        :type body: bytes
+        :param body: The raw request body
+
+        :type signature: str
+        :param signature: The ``X-PagerDuty-Signature`` header
+
+        :raises: A :class:`WebhookSignatureException <pagerduty_api.exceptions.WebhookSignatureException>`
+                if the receiver has secrets and the delivery isn't signed with one,
+                or a :class:`WebhookException <pagerduty_api.exceptions.WebhookException>`
+                if it isn't a webhook payload
+
+        :rtype: :class:`WebhookEvent`
+        """
+        try:
+            if self.secrets is not None and not verify_signature(body, signature, self.secrets):
+                raise WebhookSignatureException('Webhook signature does not match')
+            event = WebhookEvent.parse(body)
+        except WebhookException:
+            self.rejected += 1
+            raise
+
+        self.received += 1
+        self._track(event)
+        self._add(event)
+        return event
+
+    def flush(self):
+        """
+        Hands over the events waiting for their batch to fill
+        """
+        with self._condition:
+            batch, self._batch = self._batch, []
+        if batch:
+            self._deliver(batch)
+
+    def close(self):
+        """
+        Stops the flush thread and hands over the waiting events
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def wsgi(self, environ, start_response):
+        """
+        A WSGI app that receives deliveries POSTed to any path
+        """
+        if environ['REQUEST_METHOD'] != 'POST':
+            return self._wsgi_response(start_response, '405 Method Not Allowed')
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        body = environ['wsgi.input'].read(length)
+        return self._wsgi_response(start_response, self._handle(body, environ.get('HTTP_X_PAGERDUTY_SIGNATURE')))
+
+    async def asgi(self, scope, receive, send):
+        """
+        An ASGI app that receives deliveries POSTed to any path
+        """
+        if scope['type'] != 'http':
+            return
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        if scope['method'] != 'POST':
+            status = '405 Method Not Allowed'
+        else:
+            headers = dict(scope.get('headers') or ())
+            signature = headers.get(b'x-pagerduty-signature')
+            status = self._handle(b''.join(chunks), signature.decode('latin-1') if signature else None)
+
+        await send({'type': 'http.response.start', 'status': int(status[:3]), 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def _handle(self, body, signature):
+        """
+        Receives a delivery, returning the HTTP status to answer it with
+        """
+        try:
+            self.receive(body, signature)
+        except WebhookSignatureException:
+            return '401 Unauthorized'
+        except WebhookException as e:
+            LOG.warning('Rejected PagerDuty webhook: {0}'.format(e))
+            return '400 Bad Request'
+        return '204 No Content'
+
+    def _wsgi_response(self, start_response, status):
+        start_response(status, [('Content-Length', '0')])
+        return [b'']
+
+    def _track(self, event):
+        event_type = event.event_type
+        if self.tracker is None or event_type not in TRACKED_STATES or event.incident_key is None:
+            return
+        service_id = event.service_id
+        service_key = service_id if self.service_keys is None else self.service_keys.get(service_id)
+        if service_key is not None:
+            self.tracker.set_state(service_key, event.incident_key, TRACKED_STATES[event_type])
+
+    def _add(self, event):
+        if self.callback is None and self.queue is None:
+            return
+        with self._condition:
+            self._batch.append(event)
+            if len(self._batch) < self.batch_size:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._flush_periodically, name='pagerduty-webhooks')
+                    self._thread.daemon = True
+                    self._thread.start()
+                return
+            batch, self._batch = self._batch, []
+        self._deliver(batch)
+
+    def _flush_periodically(self):
+        with self._condition:
+            while not self._closed:
+                self._condition.wait(self.flush_interval)
+                batch, self._batch = self._batch, []
+                if batch:
+                    self._condition.release()
+                    try:
+                        self._deliver(batch)
+                    finally:
+                        self._condition.acquire()
+
+    def _deliver(self, batch):
+        try:
+            if self.callback is not None:
+                self.callback(batch)
+            if self.queue is not None:
+                self.queue.put(batch)
+        except Exception:
+            LOG.exception('Failed to hand over {0} PagerDuty webhook events'.format(len(batch)))
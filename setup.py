@@ -5,12 +5,6 @@ import re
 from setuptools import setup, find_packages
 
 
-import sys
-if 'sdist' in sys.argv and sys.version_info < (2, 7, 9, 'final', 0):
-    import os
-    del os.link
-
-
 def get_version():
     """
     Extracts the version number from the version.py file.
@@ -34,24 +28,36 @@ setup(
     keywords='pagerduty, api, requests',
     packages=find_packages(),
     classifiers=[
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
     ],
     license='MIT',
+    python_requires='>=3.8',
     install_requires=[
         'requests>=2.0.0'
     ],
+    extras_require={
+        'async': ['aiohttp>=3.0'],
+        'fast': ['orjson>=3.0'],
+        'http2': ['httpx[http2]>=0.23'],
+    },
     include_package_data=True,
-    test_suite='nose.collector',
     tests_require=[
+        'aiohttp>=3.0',
         'coverage>=3.7.1',
         'flake8>=2.2.0',
+        'httpx[http2]>=0.23',
         'mock>=1.0.1',
-        'nose>=1.3.0',
+        'orjson>=3.0',
+        'pytest>=6.0',
     ],
     zip_safe=False,
 )